@@ -1,29 +1,91 @@
 #!/usr/bin/env python3
+import time
+# Taken before the heavier imports so --profile can report startup time
+_STARTED_AT = time.perf_counter()
+
 import os
 import click
 import sys
+from click.shell_completion import CompletionItem
 from rich.console import Console
-from rich.markdown import Markdown
 
-from claude_cli.config import load_config, save_config
-from claude_cli.commands.chat import start_chat
-from claude_cli.commands.query import send_query
-from claude_cli.commands.manage import list_conversations, delete_conversation, rename_conversation
+# Command implementations are imported inside each command, so that shell
+# completion (which runs this module for every TAB) doesn't pay for them
+from claude_cli.config import load_config, update_config
+from claude_cli.utils import index as conversation_index
+from claude_cli.utils.profiling import Profiler, phase
+from claude_cli.utils import tracing
 
 console = Console()
+err_console = Console(stderr=True)
+
+def complete_conversation_id(ctx, param, incomplete):
+    """Complete conversation IDs, with titles, from the local index (no network access)."""
+    entries, _ = conversation_index.load_index()
+    conversation_index.refresh_in_background()
+    needle = incomplete.lower()
+    return [
+        CompletionItem(conversation_id, help=title)
+        for conversation_id, title, _ in entries
+        if conversation_id.startswith(needle) or (needle and needle in (title or "").lower())
+    ]
 
 @click.group()
 @click.version_option()
-def cli():
+@click.option("--profile", is_flag=True, help="Profile the command and write pstats and summary reports")
+@click.option("--profile-output", metavar="PREFIX", help="Path prefix for the profile reports")
+@click.option("--record", metavar="CASSETTE", help="Record all HTTP traffic to a cassette file (cookies scrubbed)")
+@click.option("--replay", metavar="CASSETTE", help="Serve all HTTP traffic from a recorded cassette file")
+@click.option("--replay-speed", type=float, default=0, help="Replay pacing: 0 = instant, 1 = as recorded, 2 = twice as fast")
+@click.option("--trace", "trace_path", metavar="FILE",
+              help="Trace requests, retries, parsing and rendering to a Chrome trace-event JSON file")
+@click.option("--trace-buffer", type=click.IntRange(1000), default=tracing.DEFAULT_CAPACITY, show_default=True,
+              help="Trace events kept in memory; older ones are dropped")
+@click.pass_context
+def cli(ctx, profile, profile_output, record, replay, replay_speed, trace_path, trace_buffer):
     """Command-line interface for Claude AI"""
-    pass
+    # Clients pick these up when they build their transport
+    if record:
+        os.environ['CLAUDE_RECORD'] = record
+    if replay:
+        os.environ['CLAUDE_REPLAY'] = replay
+        os.environ['CLAUDE_REPLAY_SPEED'] = str(replay_speed)
+
+    if profile or profile_output:
+        prefix = profile_output or time.strftime("claude-profile-%Y%m%d-%H%M%S")
+        profiler = Profiler(prefix, started_at=_STARTED_AT)
+        profiler.start()
+        ctx.call_on_close(lambda: report_profile(profiler))
+
+    if trace_path:
+        tracer = tracing.Tracer(trace_path, capacity=trace_buffer)
+        tracer.start()
+        command = tracing.span(ctx.invoked_subcommand or "claude", cat="cli")
+        command.__enter__()
+
+        def report_trace():
+            command.__exit__(None, None, None)
+            path, written, dropped = tracer.stop()
+            note = f", {dropped} oldest dropped" if dropped else ""
+            err_console.print(f"[dim]Trace written to {path} ({written} events{note}); "
+                              f"open it in chrome://tracing or ui.perfetto.dev[/]")
+        ctx.call_on_close(report_trace)
+
+def report_profile(profiler):
+    """Write the profile reports and show the phase breakdown on stderr."""
+    summary, pstats_path, summary_path = profiler.stop()
+    err_console.print(summary.split("\n\n")[0], markup=False, highlight=False)
+    err_console.print(f"[dim]Profile written to {pstats_path} and {summary_path}[/]")
 
 @cli.command()
 @click.option("--new", is_flag=True, help="Start a new conversation")
-@click.option("--id", help="Continue an existing conversation by ID")
+@click.option("--id", help="Continue an existing conversation by ID", shell_complete=complete_conversation_id)
+@click.option("--ids", help="Chat with several conversations side by side (comma-separated IDs)")
+@click.option("--split", type=click.IntRange(0, 8), default=0,
+              help="Chat with this many panes side by side, starting new conversations as needed")
 @click.option("--proxy", help="Proxy URL (e.g., socks5://127.0.0.1:1080)")
 @click.option("--debug", is_flag=True, help="Show debug information")
-def chat(new, id, proxy, debug):
+def chat(new, id, ids, split, proxy, debug):
     """Start an interactive chat session with Claude"""
     config = load_config()
     if not config.get('cookie'):
@@ -33,33 +95,79 @@ def chat(new, id, proxy, debug):
     # Use proxy from config if not provided in command
     if not proxy and 'proxy' in config:
         proxy = config.get('proxy')
-        
+
+    if ids or split:
+        from claude_cli.commands.multichat import start_multi_chat
+        conversation_ids = [conversation_id.strip() for conversation_id in (ids or "").split(",")
+                            if conversation_id.strip()]
+        start_multi_chat(config, conversation_ids=conversation_ids, split=split, proxy=proxy, debug=debug)
+        return
+
+    from claude_cli.commands.chat import start_chat
     start_chat(config, new_chat=new, conversation_id=id, proxy=proxy, debug=debug)
 
 @cli.command()
-@click.argument("prompt")
-@click.option("--id", help="Use a specific conversation ID")
-@click.option("--attachment", "-a", help="Path to a file to attach")
+@click.argument("prompt", required=False)
+@click.option("--id", help="Use a specific conversation ID", shell_complete=complete_conversation_id)
+@click.option("--attachment", "-a", "attachments", multiple=True,
+              help="Path to a file to attach (repeat for several files)")
 @click.option("--markdown/--no-markdown", default=True, help="Render output as markdown")
+@click.option("--raw", is_flag=True, help="Stream raw text to stdout as it arrives (status goes to stderr)")
+@click.option("--ndjson", is_flag=True, help="Stream NDJSON events with timing to stdout")
+@click.option("--map-reduce", is_flag=True,
+              help="Split a large text attachment into parts, answer them in parallel and combine the answers")
+@click.option("--chunk-size", default=30000, show_default=True, help="Characters per part with --map-reduce")
+@click.option("--overlap", default=500, show_default=True, help="Characters shared by consecutive parts")
+@click.option("--concurrency", "-c", default=4, show_default=True, help="Parts answered at once")
+@click.option("--keep-conversations", is_flag=True, help="Keep the per-part conversations afterwards")
 @click.option("--proxy", help="Proxy URL (e.g., socks5://127.0.0.1:1080)")
 @click.option("--debug", is_flag=True, help="Show debug information")
-def query(prompt, id, attachment, markdown, proxy, debug):
-    """Send a one-off query to Claude"""
+def query(prompt, id, attachments, markdown, raw, ndjson, map_reduce, chunk_size, overlap, concurrency,
+          keep_conversations, proxy, debug):
+    """Send a one-off query to Claude
+
+    The prompt is read from stdin when PROMPT is omitted or is '-'.
+    """
+    from claude_cli.commands.query import send_query, stream_query, EXIT_USAGE
     config = load_config()
     if not config.get('cookie'):
-        console.print("[bold red]Error:[/] Claude cookie not found. Please run 'claude config' to set it up.")
+        err_console.print("[bold red]Error:[/] Claude cookie not found. Please run 'claude config' to set it up.")
         sys.exit(1)
         
     # Use proxy from config if not provided in command
     if not proxy and 'proxy' in config:
         proxy = config.get('proxy')
-        
-    response = send_query(config, prompt, conversation_id=id, attachment=attachment, proxy=proxy, debug=debug)
-    
-    if markdown:
-        console.print(Markdown(response))
+
+    if prompt is None or prompt == "-":
+        prompt = "" if sys.stdin.isatty() else sys.stdin.read()
+    if not prompt.strip():
+        err_console.print("[bold red]Error:[/] No prompt given. Pass it as an argument or pipe it on stdin.")
+        sys.exit(EXIT_USAGE)
+
+    attachment = attachments[0] if len(attachments) == 1 else [*attachments] or None
+    if map_reduce:
+        from claude_cli.commands.mapreduce import map_reduce_query
+        if len(attachments) != 1:
+            err_console.print("[bold red]Error:[/] --map-reduce needs one text file to split: pass it with --attachment.")
+            sys.exit(EXIT_USAGE)
+        if id or raw or ndjson:
+            err_console.print("[bold red]Error:[/] --map-reduce can't be combined with --id, --raw or --ndjson.")
+            sys.exit(EXIT_USAGE)
+        response = map_reduce_query(config, prompt, attachment, chunk_size=chunk_size, overlap=overlap,
+                                    concurrency=max(1, concurrency), keep_conversations=keep_conversations,
+                                    proxy=proxy, debug=debug)
+    elif raw or ndjson:
+        sys.exit(stream_query(config, prompt, conversation_id=id, attachment=attachment,
+                              proxy=proxy, debug=debug, ndjson=ndjson))
     else:
-        console.print(response)
+        response = send_query(config, prompt, conversation_id=id, attachment=attachment, proxy=proxy, debug=debug)
+    
+    with phase("render"):
+        if markdown:
+            from rich.markdown import Markdown
+            console.print(Markdown(response))
+        else:
+            console.print(response)
 
 @cli.command()
 @click.option("--proxy", help="Proxy URL (e.g., socks5://127.0.0.1:1080)")
@@ -75,10 +183,11 @@ def list(proxy, debug):
     if not proxy and 'proxy' in config:
         proxy = config.get('proxy')
         
+    from claude_cli.commands.manage import list_conversations
     list_conversations(config, proxy=proxy, debug=debug)
 
 @cli.command()
-@click.argument("conversation_id")
+@click.argument("conversation_id", shell_complete=complete_conversation_id)
 @click.option("--proxy", help="Proxy URL (e.g., socks5://127.0.0.1:1080)")
 @click.option("--debug", is_flag=True, help="Show debug information")
 def delete(conversation_id, proxy, debug):
@@ -92,10 +201,11 @@ def delete(conversation_id, proxy, debug):
     if not proxy and 'proxy' in config:
         proxy = config.get('proxy')
         
+    from claude_cli.commands.manage import delete_conversation
     delete_conversation(config, conversation_id, proxy=proxy, debug=debug)
 
 @cli.command()
-@click.argument("conversation_id")
+@click.argument("conversation_id", shell_complete=complete_conversation_id)
 @click.argument("new_title")
 @click.option("--proxy", help="Proxy URL (e.g., socks5://127.0.0.1:1080)")
 @click.option("--debug", is_flag=True, help="Show debug information")
@@ -110,39 +220,188 @@ def rename(conversation_id, new_title, proxy, debug):
     if not proxy and 'proxy' in config:
         proxy = config.get('proxy')
         
+    from claude_cli.commands.manage import rename_conversation
     rename_conversation(config, conversation_id, new_title, proxy=proxy, debug=debug)
 
+@cli.command()
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("--concurrency", "-j", default=4, show_default=True, help="Number of histories to fetch at once")
+@click.option("--proxy", help="Proxy URL (e.g., socks5://127.0.0.1:1080)")
+@click.option("--debug", is_flag=True, help="Show debug information")
+def export(output, concurrency, proxy, debug):
+    """Export all conversations to a JSONL archive (.gz/.xz compressed by extension)"""
+    config = load_config()
+    if not config.get('cookie'):
+        console.print("[bold red]Error:[/] Claude cookie not found. Please run 'claude config' to set it up.")
+        sys.exit(1)
+        
+    # Use proxy from config if not provided in command
+    if not proxy and 'proxy' in config:
+        proxy = config.get('proxy')
+        
+    from claude_cli.commands.export import export_conversations
+    export_conversations(config, output, concurrency=max(1, concurrency), proxy=proxy, debug=debug)
+
+@cli.command()
+@click.argument("prompt")
+@click.argument("files", nargs=-1, required=True, type=click.Path(dir_okay=False))
+@click.option("--id", help="Use a specific conversation ID", shell_complete=complete_conversation_id)
+@click.option("--debounce", default=0.5, show_default=True, help="Seconds the files must be quiet before re-asking")
+@click.option("--interval", default=0.25, show_default=True, help="Seconds between checks for changes")
+@click.option("--max-diff-lines", default=200, show_default=True,
+              help="Send changes as a diff up to this many lines; re-upload the file beyond that")
+@click.option("--proxy", help="Proxy URL (e.g., socks5://127.0.0.1:1080)")
+@click.option("--debug", is_flag=True, help="Show debug information")
+def watch(prompt, files, id, debounce, interval, max_diff_lines, proxy, debug):
+    """Answer PROMPT about FILES, and again every time they change"""
+    config = load_config()
+    if not config.get('cookie'):
+        console.print("[bold red]Error:[/] Claude cookie not found. Please run 'claude config' to set it up.")
+        sys.exit(1)
+
+    if not proxy and 'proxy' in config:
+        proxy = config.get('proxy')
+
+    from claude_cli.commands.watch import watch_files
+    watch_files(config, prompt, files, conversation_id=id, debounce=debounce, interval=interval,
+                max_diff_lines=max_diff_lines, proxy=proxy, debug=debug)
+
+@cli.command()
+@click.option("--since", default="24h", show_default=True, help="Time window, e.g. 30m, 24h, 7d or all")
+@click.option("--by", type=click.Choice(["hour", "day"]), help="Break the numbers down by hour or day")
+def stats(since, by):
+    """Show latency percentiles, throughput and error rates of recent requests"""
+    from claude_cli.commands.stats import show_stats
+    show_stats(since=since, by=by)
+
+@cli.command("refresh-index", hidden=True)
+def refresh_index():
+    """Re-fetch the conversation listing into the shell completion index"""
+    config = load_config()
+    if not config.get('cookie'):
+        return
+    from claude_cli.utils.client import EnhancedClient
+    # Listing conversations saves them to the index
+    EnhancedClient.from_config(config, proxy=config.get('proxy')).list_all_conversations()
+
+@cli.command()
+@click.option("--backend", "backends", multiple=True, type=click.Choice(["curl", "httpx", "requests"]),
+              help="Backend to include (repeatable; default: all)")
+@click.option("--requests", "-n", "total", default=200, show_default=True, help="Requests per backend")
+@click.option("--concurrency", "-c", default=8, show_default=True, help="Concurrent requests")
+@click.option("--conversations", type=int, help="Conversations in the stub listing  [default: 2000, or 50000 "
+              "with --models]")
+@click.option("--events", type=int, help="Events per streamed completion  [default: 200, or 50000 with --json]")
+@click.option("--reads", is_flag=True, help="Compare compressed, streamed reads with uncompressed, buffered ones")
+@click.option("--json", "json_libraries", is_flag=True, help="Compare the JSON libraries on listings, histories "
+              "and completion events")
+@click.option("--models", is_flag=True, help="Compare the memory a listing holds as raw dicts and as models "
+              "(default: 50000 conversations)")
+@click.option("--messages", default=500, show_default=True, help="Messages in each stub history (with --reads or "
+              "--json)")
+@click.option("--threads", is_flag=True, help="Measure how one shared client scales from 1 to 8 threads sending, "
+              "listing and uploading")
+def bench(backends, total, concurrency, conversations, events, reads, json_libraries, models, messages, threads):
+    """Benchmark the HTTP transport backends against a local stub API"""
+    from claude_cli.commands.bench import (benchmark_json, benchmark_models, benchmark_reads, benchmark_threads,
+                                           benchmark_transports)
+    if models:
+        benchmark_models(conversations=conversations or 50000)
+        return
+    conversations = conversations or 2000
+    if json_libraries:
+        benchmark_json(conversations=conversations, messages=messages, events=events or 50000)
+        return
+    if reads:
+        for backend in backends or ("curl", "httpx", "requests"):
+            benchmark_reads(backend, conversations=conversations, messages=messages)
+        return
+    if threads:
+        for backend in backends or ("curl", "httpx", "requests"):
+            benchmark_threads(backend, total=total, conversations=conversations, events=events or 200)
+        return
+    benchmark_transports(backends or None, total=total, concurrency=concurrency,
+                         conversations=conversations, events=events or 200)
+
+@cli.command()
+@click.option("--duration", default="1h", show_default=True, help="How long to run, e.g. 90s, 30m, 8h")
+@click.option("--sample-interval", default=10.0, show_default=True, help="Seconds between resource samples")
+@click.option("--concurrency", "-c", default=4, show_default=True, help="Concurrent workers")
+@click.option("--backend", type=click.Choice(["curl", "httpx", "requests"]), default="curl", show_default=True,
+              help="HTTP backend to soak")
+@click.option("--max-rss-growth", default=20.0, show_default=True, help="Allowed RSS growth in MiB")
+@click.option("--max-fd-growth", default=10, show_default=True, help="Allowed growth in open file descriptors")
+@click.option("--max-thread-growth", default=5, show_default=True, help="Allowed growth in threads")
+@click.option("--max-connection-growth", default=5, show_default=True, help="Allowed growth in open connections")
+@click.option("--max-error-rate", default=1.0, show_default=True, help="Allowed percentage of failed operations")
+@click.option("--csv", "csv_path", type=click.Path(dir_okay=False), help="Write the samples to a CSV file")
+def soak(duration, sample_interval, concurrency, backend, max_rss_growth, max_fd_growth, max_thread_growth,
+         max_connection_growth, max_error_rate, csv_path):
+    """Run the client against a local stub API for a long time and check for leaks"""
+    from claude_cli.commands.soak import soak_test
+    from claude_cli.commands.stats import parse_duration
+    try:
+        seconds = parse_duration(duration)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/] {str(e)}")
+        sys.exit(2)
+    thresholds = {"rss_mib": max_rss_growth, "fds": max_fd_growth, "threads": max_thread_growth,
+                  "connections": max_connection_growth}
+    if not soak_test(duration=seconds or 3600, sample_interval=sample_interval, concurrency=concurrency,
+                     backend=backend, thresholds=thresholds, max_error_rate=max_error_rate / 100,
+                     csv_path=csv_path):
+        sys.exit(1)
+
 @cli.command()
 @click.option("--cookie", help="Claude AI cookie")
 @click.option("--proxy", help="Default proxy URL (e.g., socks5://127.0.0.1:1080)")
-def config(cookie, proxy):
+@click.option("--pool-size", type=int, help="Number of pre-created conversations to keep ready (0 disables)")
+@click.option("--pool-ttl", type=int, help="Seconds before an unused pooled conversation is deleted")
+def config(cookie, proxy, pool_size, pool_ttl):
     """Configure Claude CLI settings"""
     config = load_config()
+    # Settings to change, and None for those to remove; applied under the lock once prompting is done
+    changes = {}
     
     if cookie:
-        config['cookie'] = cookie
+        changes['cookie'] = cookie
     elif not config.get('cookie'):
         cookie_input = click.prompt("Enter your Claude cookie", default=config.get('cookie', ''), hide_input=True)
         if cookie_input:
-            config['cookie'] = cookie_input
+            changes['cookie'] = cookie_input
     
     if proxy:
-        config['proxy'] = proxy
+        changes['proxy'] = proxy
         console.print(f"[green]Default proxy set to: {proxy}[/]")
     elif proxy == "":
         # Empty string means remove proxy
         if 'proxy' in config:
-            del config['proxy']
+            changes['proxy'] = None
             console.print("[green]Default proxy removed[/]")
     elif 'proxy' not in config:
         use_proxy = click.confirm("Do you want to set up a default proxy?", default=False)
         if use_proxy:
             proxy_input = click.prompt("Enter proxy URL (e.g., socks5://127.0.0.1:1080)")
             if proxy_input:
-                config['proxy'] = proxy_input
+                changes['proxy'] = proxy_input
                 console.print(f"[green]Default proxy set to: {proxy_input}[/]")
     
-    save_config(config)
+    if pool_size is not None:
+        changes['pool_size'] = pool_size
+        console.print(f"[green]Conversation pool size set to: {pool_size}[/]")
+    if pool_ttl is not None:
+        changes['pool_ttl'] = pool_ttl
+        console.print(f"[green]Conversation pool TTL set to: {pool_ttl}s[/]")
+    
+    def apply(latest):
+        for key, value in changes.items():
+            if value is None:
+                latest.pop(key, None)
+            else:
+                latest[key] = value
+    
+    # Other claude processes (the conversation pool) save to the same file
+    update_config(apply)
     console.print("[green]Configuration saved successfully![/]")
 
 def main():
@@ -0,0 +1,424 @@
+from claude_cli.utils.stub import STUB_ORGANIZATION_ID, StubServer
+from claude_cli.utils.transport import BACKENDS, RebaseTransport
+from rich.console import Console
+from rich.table import Table
+from rich import box
+from concurrent.futures import ThreadPoolExecutor
+import importlib.util
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+console = Console()
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _peak_rss_mib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1024 if peak < 1 << 32 else peak / 1024 / 1024
+
+
+def _run_backend(backend, base_url, total, concurrency):
+    """Run the workload for one backend; called in a fresh process so memory figures are its own."""
+    transport = RebaseTransport(BACKENDS[backend](), base_url)
+    list_url = "https://claude.ai/api/organizations/bench/chat_conversations"
+    completion_url = f"{list_url}/bench/completion"
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            if i % 2 == 0:
+                response = transport.request("GET", list_url, timeout=30)
+                size = len(response.content)
+                op = "list"
+            else:
+                response = transport.request("POST", completion_url, data="{}", timeout=30, stream=True)
+                size = sum(len(line) for line in response.iter_lines())
+                op = "stream"
+            ok = response.status_code == 200
+        except Exception:
+            op, size, ok = ("list" if i % 2 == 0 else "stream"), 0, False
+        return op, time.perf_counter() - started, size, ok
+
+    # Warm up connections before measuring
+    for i in range(min(concurrency, total)):
+        one(i)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    wall = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    transport.close()
+
+    latencies = {"list": [], "stream": []}
+    for op, latency, _, ok in results:
+        if ok:
+            latencies[op].append(latency)
+    return {
+        "throughput": total / wall,
+        "list_p50": _percentile(latencies["list"], 50),
+        "list_p95": _percentile(latencies["list"], 95),
+        "stream_p50": _percentile(latencies["stream"], 50),
+        "stream_p95": _percentile(latencies["stream"], 95),
+        "bytes": sum(size for _, _, size, _ in results),
+        "errors": sum(1 for *_, ok in results if not ok),
+        "traced_peak_mib": traced_peak / 1024 / 1024,
+        "rss_peak_mib": _peak_rss_mib()
+    }
+
+
+def benchmark_transports(backends=None, total=200, concurrency=8, conversations=2000, events=200):
+    """
+    Compare the HTTP transport backends against a local stub of the API.
+
+    Half the requests fetch a conversation listing and half stream a
+    completion. Each backend runs in its own process so that peak memory is
+    attributable to it.
+    """
+    backends = backends or list(BACKENDS)
+    spawn = multiprocessing.get_context("spawn")
+    results = {}
+
+    with StubServer(conversations=conversations, events=events) as stub:
+        console.print(f"[dim]Stub API at {stub.url}: {conversations} conversations, "
+                      f"{events} events per completion[/]")
+        for backend in backends:
+            console.print(f"[cyan]Benchmarking {backend}...[/]")
+            try:
+                with spawn.Pool(1) as pool:
+                    results[backend] = pool.apply(_run_backend, (backend, stub.url, total, concurrency))
+            except Exception as e:
+                results[backend] = {"error": str(e)}
+
+    table = Table(title=f"Transport benchmark ({total} requests, concurrency {concurrency})", box=box.ROUNDED)
+    table.add_column("Backend", style="cyan")
+    for column in ("req/s", "list p50", "list p95", "stream p50", "stream p95", "Py heap peak", "RSS peak", "Errors"):
+        table.add_column(column, justify="right")
+
+    for backend, r in results.items():
+        if "error" in r:
+            table.add_row(backend, f"[red]unavailable: {r['error']}[/]", *[""] * 7)
+            continue
+        rss = f"{r['rss_peak_mib']:.1f} MiB" if r["rss_peak_mib"] is not None else "n/a"
+        table.add_row(
+            backend,
+            f"{r['throughput']:.1f}",
+            f"{r['list_p50'] * 1000:.1f} ms",
+            f"{r['list_p95'] * 1000:.1f} ms",
+            f"{r['stream_p50'] * 1000:.1f} ms",
+            f"{r['stream_p95'] * 1000:.1f} ms",
+            f"{r['traced_peak_mib']:.1f} MiB",
+            rss,
+            str(r["errors"])
+        )
+    console.print(table)
+    return results
+
+
+THREAD_OPERATIONS = ("send", "list", "upload")
+
+
+def _run_threads(backend, base_url, home, thread_counts, total):
+    """
+    Drive one shared client from a growing number of threads, each cycling
+    through sending a message, listing conversations and uploading an
+    attachment. Runs in a fresh process with its own HOME.
+    """
+    os.environ["HOME"] = home
+    # Imported after HOME is set, so the client's state files go there
+    from claude_cli.utils.client import EnhancedClient
+
+    claude = EnhancedClient("sessionKey=bench", transport=RebaseTransport(BACKENDS[backend](), base_url),
+                            organization_id=STUB_ORGANIZATION_ID, metrics=False)
+    attachment = os.path.join(home, "attachment.pdf")
+    with open(attachment, "wb") as f:
+        f.write(os.urandom(64 * 1024))
+    conversation_ids = [conv.uuid for conv in claude.list_all_conversations()]
+
+    def one(i):
+        op = THREAD_OPERATIONS[i % len(THREAD_OPERATIONS)]
+        started = time.perf_counter()
+        try:
+            if op == "send":
+                response = claude.send_message("bench", conversation_ids[i % len(conversation_ids)])
+                ok = isinstance(response, dict) and not response["meta"].get("error")
+            elif op == "list":
+                ok = bool(claude.list_all_conversations())
+            else:
+                ok = bool(claude.upload_attachment(attachment))
+        except Exception:
+            ok = False
+        return op, time.perf_counter() - started, ok
+
+    results = {}
+    for threads in thread_counts:
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="bench") as executor:
+            # Warm up every worker's connections before measuring
+            list(executor.map(one, range(threads * len(THREAD_OPERATIONS))))
+            started = time.perf_counter()
+            outcomes = list(executor.map(one, range(total)))
+            wall = time.perf_counter() - started
+        latencies = {op: [latency for name, latency, ok in outcomes if name == op and ok]
+                     for op in THREAD_OPERATIONS}
+        results[threads] = {
+            "throughput": total / wall,
+            "p50": {op: _percentile(values, 50) for op, values in latencies.items()},
+            "errors": sum(1 for *_, ok in outcomes if not ok)
+        }
+    claude.close()
+    return results
+
+
+def benchmark_threads(backend="curl", thread_counts=(1, 2, 4, 8), total=200, conversations=2000, events=200):
+    """
+    Measure how one EnhancedClient shared between threads scales: requests
+    per second for a mix of sends, listings and uploads at each thread count.
+    """
+    spawn = multiprocessing.get_context("spawn")
+    with StubServer(conversations=conversations, events=events) as stub, \
+            tempfile.TemporaryDirectory(prefix="claude-bench-") as home:
+        console.print(f"[dim]Stub API at {stub.url}: {conversations} conversations, "
+                      f"{events} events per completion[/]")
+        console.print(f"[cyan]Benchmarking a shared {backend} client at {', '.join(map(str, thread_counts))} "
+                      f"threads...[/]")
+        with spawn.Pool(1) as pool:
+            results = pool.apply(_run_threads, (backend, stub.url, home, thread_counts, total))
+
+    baseline = results[thread_counts[0]]["throughput"]
+    table = Table(title=f"Thread scaling ({backend}, one shared client, {total} requests each)", box=box.ROUNDED)
+    table.add_column("Threads", style="cyan", justify="right")
+    for column in ("req/s", "Scaling", "send p50", "list p50", "upload p50", "Errors"):
+        table.add_column(column, justify="right")
+    for threads, r in results.items():
+        table.add_row(
+            str(threads),
+            f"{r['throughput']:.1f}",
+            f"{r['throughput'] / baseline:.2f}x",
+            *[f"{r['p50'][op] * 1000:.1f} ms" for op in THREAD_OPERATIONS],
+            str(r["errors"])
+        )
+    console.print(table)
+    return results
+
+
+def _run_reads(mode, backend, base_url, home, repeat):
+    """
+    Time and measure a conversation listing and a history, either read the
+    way the client reads them ("streamed": compressed, decoded with fastjson,
+    as the body arrives when that is the standard library) or the way it
+    used to ("buffered": uncompressed, json.loads of the whole text). Runs in
+    a fresh process with its own HOME.
+    """
+    os.environ["HOME"] = home
+    # Imported after HOME is set, so the client's state files go there
+    from claude_cli.utils import fastjson
+    from claude_cli.utils.client import EnhancedClient
+    from claude_cli.utils.models import Conversation
+
+    claude = EnhancedClient("sessionKey=bench", transport=RebaseTransport(BACKENDS[backend](), base_url),
+                            organization_id=STUB_ORGANIZATION_ID, metrics=False)
+    list_url = f"https://claude.ai/api/organizations/{STUB_ORGANIZATION_ID}/chat_conversations"
+    history_url = f"{list_url}/{claude.list_all_conversations()[0].uuid}"
+    headers = {"Cookie": claude.cookie}
+
+    def read(url, stream_parse, convert):
+        if mode == "streamed":
+            return claude._get_json(url, headers, "bench", stream_parse)[1]
+        response = claude._make_request("GET", url, headers=dict(headers, **{"Accept-Encoding": "identity"}))
+        return convert(json.loads(response.text))
+
+    reads = {
+        "list": lambda: read(list_url, fastjson.read_conversations,
+                             lambda data: [Conversation.from_dict(conv) for conv in data]),
+        "history": lambda: read(history_url, fastjson.read_conversation, Conversation.from_dict)
+    }
+
+    results = {}
+    for name, run in reads.items():
+        run()
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - started)
+        tracemalloc.start()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {"p50": _percentile(times, 50), "peak_mib": peak / 1024 / 1024}
+    claude.transport.close()
+    return results
+
+
+def benchmark_reads(backend="curl", conversations=5000, messages=500, repeat=10):
+    """
+    Compare compressed, incrementally decoded reads against the old
+    uncompressed, fully buffered ones on a large listing and history.
+    """
+    spawn = multiprocessing.get_context("spawn")
+    results = {}
+    with StubServer(conversations=conversations, messages=messages) as stub, \
+            tempfile.TemporaryDirectory(prefix="claude-bench-") as home:
+        console.print(f"[dim]Stub API at {stub.url}: {conversations} conversations, "
+                      f"{messages} messages per history[/]")
+        for mode in ("buffered", "streamed"):
+            console.print(f"[cyan]Benchmarking {mode} reads over {backend}...[/]")
+            before = stub.bytes_sent
+            with spawn.Pool(1) as pool:
+                results[mode] = pool.apply(_run_reads, (mode, backend, stub.url, home, repeat))
+            # Everything each mode transferred, including warm-up and traced reads
+            results[mode]["wire_mib"] = (stub.bytes_sent - before) / 1024 / 1024
+
+    table = Table(title=f"Read benchmark ({backend}, {repeat} reads each)", box=box.ROUNDED)
+    table.add_column("Mode", style="cyan")
+    for column in ("list p50", "list peak", "history p50", "history peak", "Bytes on wire"):
+        table.add_column(column, justify="right")
+    for mode, r in results.items():
+        table.add_row(
+            mode,
+            f"{r['list']['p50'] * 1000:.1f} ms",
+            f"{r['list']['peak_mib']:.1f} MiB",
+            f"{r['history']['p50'] * 1000:.1f} ms",
+            f"{r['history']['peak_mib']:.1f} MiB",
+            f"{r['wire_mib']:.1f} MiB"
+        )
+    console.print(table)
+    return results
+
+
+def _run_json(library, home, listing, history, lines, repeat):
+    """
+    Time decoding a listing, a history and a completion stream with one JSON
+    library. Runs in a fresh process with its own HOME, so only that library
+    is imported.
+    """
+    os.environ["HOME"] = home
+    from claude_cli.utils import fastjson
+    from claude_cli.utils.client import EnhancedClient
+
+    fastjson.use(library)
+
+    # Never sends a request; it is only here for its event parser
+    claude = EnhancedClient("sessionKey=bench", transport=RebaseTransport(BACKENDS["requests"](), "http://127.0.0.1:9"),
+                            organization_id=STUB_ORGANIZATION_ID, metrics=False)
+    # Bodies arrive in chunks of about this size
+    chunk = 64 * 1024
+    tasks = {
+        "list": lambda: fastjson.read_conversations(listing[i:i + chunk] for i in range(0, len(listing), chunk)),
+        "history": lambda: fastjson.read_conversation(history[i:i + chunk] for i in range(0, len(history), chunk)),
+        "events": lambda: [claude._parse_event_line(line) for line in lines]
+    }
+    results = {}
+    for name, task in tasks.items():
+        task()
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            task()
+            times.append(time.perf_counter() - started)
+        results[name] = _percentile(times, 50)
+    claude.transport.close()
+    return results
+
+
+def benchmark_json(conversations=5000, messages=500, events=50000, repeat=10):
+    """
+    Compare the JSON libraries the client can use on a large listing, a long
+    history and a completion stream of many events: time to decode them
+    into models (or text deltas), on the CPU only.
+    """
+    libraries = [name for name in ("msgspec", "orjson") if importlib.util.find_spec(name) is not None] + ["json"]
+    with StubServer(conversations=conversations, messages=messages) as stub:
+        listing = stub.listing
+        history = json.dumps(stub.history(STUB_ORGANIZATION_ID)).encode("utf-8")
+    # Completion events as claude.ai sends them, with the blank lines between them
+    event = {"type": "completion", "completion": " lorem", "stop_reason": None, "model": "claude-2.1",
+             "stop": None, "log_id": "0" * 64, "messageLimit": {"type": "within_limit"}}
+    lines = [f"data: {json.dumps(event)}" if i % 2 == 0 else "" for i in range(events * 2)]
+    console.print(f"[dim]{conversations} conversations ({len(listing) / 1024 / 1024:.1f} MiB), "
+                  f"{messages} messages ({len(history) / 1024:.0f} KiB), {events} events[/]")
+
+    spawn = multiprocessing.get_context("spawn")
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="claude-bench-") as home:
+        for library in libraries:
+            console.print(f"[cyan]Benchmarking {library}...[/]")
+            with spawn.Pool(1) as pool:
+                results[library] = pool.apply(_run_json, (library, home, listing, history, lines, repeat))
+
+    baseline = results["json"]
+    table = Table(title=f"JSON decoding ({repeat} runs each, p50)", caption="Speed-up over json: listing / events",
+                  box=box.ROUNDED)
+    table.add_column("Library", style="cyan")
+    for column in ("Listing", "History", "Events", "Per event", "Speed-up"):
+        table.add_column(column, justify="right")
+    for library, r in results.items():
+        table.add_row(
+            library,
+            f"{r['list'] * 1000:.1f} ms",
+            f"{r['history'] * 1000:.1f} ms",
+            f"{r['events'] * 1000:.1f} ms",
+            f"{r['events'] / events * 1e6:.2f} µs",
+            f"{baseline['list'] / r['list']:.1f}x / {baseline['events'] / r['events']:.1f}x"
+        )
+    console.print(table)
+    return results
+
+
+def _run_models(listing, keep):
+    """
+    Measure the memory a decoded listing keeps alive, either as the raw API
+    dicts or as Conversation models. Runs in a fresh process.
+    """
+    from claude_cli.utils.models import Conversation
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    conversations = json.loads(listing)
+    if keep == "models":
+        conversations = [Conversation.from_dict(conv) for conv in conversations]
+    seconds = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"retained_mib": retained / 1024 / 1024, "peak_mib": peak / 1024 / 1024, "seconds": seconds,
+            "count": len(conversations)}
+
+
+def benchmark_models(conversations=50000):
+    """Compare the memory held by a large conversation listing as raw dicts and as models."""
+    with StubServer(conversations=conversations) as stub:
+        listing = stub.listing
+    console.print(f"[dim]{conversations} conversations, {len(listing) / 1024 / 1024:.1f} MiB of JSON[/]")
+    spawn = multiprocessing.get_context("spawn")
+    results = {}
+    for keep in ("dicts", "models"):
+        with spawn.Pool(1) as pool:
+            results[keep] = pool.apply(_run_models, (listing, keep))
+
+    table = Table(title=f"Listing memory ({conversations} conversations)", box=box.ROUNDED)
+    for column in ("Kept as", "Retained", "Peak", "Decode time"):
+        table.add_column(column, justify="left" if column == "Kept as" else "right")
+    for keep, r in results.items():
+        table.add_row(keep, f"{r['retained_mib']:.1f} MiB", f"{r['peak_mib']:.1f} MiB", f"{r['seconds'] * 1000:.0f} ms")
+    console.print(table)
+    return results
@@ -1,235 +1,413 @@
 import os
 import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
 from rich.markdown import Markdown
 from rich.panel import Panel
-from claude_cli.utils.client import EnhancedClient
+from claude_cli.utils.client import CancelToken, EnhancedClient
+from claude_cli.utils.models import Conversation
+from claude_cli.utils.pool import ConversationPool
+from claude_cli.utils.profiling import phase
+
+try:
+    import readline
+except ImportError:  # Windows
+    readline = None
 
 console = Console()
 
 def start_chat(config, new_chat=False, conversation_id=None, proxy=None, debug=False):
     """Start an interactive chat session with Claude."""
-    cookie = config.get('cookie')
-    claude = EnhancedClient(cookie, proxy=proxy, debug=debug)
+    started = time.perf_counter()
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
+    pool = ConversationPool(config, debug=debug)
+    screen = PromptScreen("[bold green]You:[/] ")
+    # Verifying the conversation and loading its history are independent reads
+    startup = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-startup")
+    history = None
     
     # Handle conversation ID
     if not conversation_id and not new_chat:
         # Check if there's a default conversation
         if 'default_conversation_id' in config and not new_chat:
             conversation_id = config.get('default_conversation_id')
+            history = startup.submit(claude.chat_conversation_history, conversation_id)
             console.print(f"[cyan]Using default conversation: {conversation_id}[/]")
         else:
             # Start a new conversation
-            conversation = claude.create_new_chat()
-            conversation_id = conversation['uuid']
+            conversation_id = new_conversation_id(claude, pool)
             console.print(f"[green]Created new conversation: {conversation_id}[/]")
     elif new_chat:
         # Force a new conversation
-        conversation = claude.create_new_chat()
-        conversation_id = conversation['uuid']
+        conversation_id = new_conversation_id(claude, pool)
         console.print(f"[green]Created new conversation: {conversation_id}[/]")
     else:
-        # Verify the conversation exists
-        conversations = claude.list_all_conversations()
-        ids = [conv['uuid'] for conv in conversations]
+        # Verify the conversation exists while its history loads
+        history = startup.submit(claude.chat_conversation_history, conversation_id)
+        conversations = startup.submit(claude.list_all_conversations).result()
+        ids = [conv.uuid for conv in conversations]
         if conversation_id not in ids:
             console.print(f"[bold red]Error:[/] Conversation ID '{conversation_id}' not found.")
+            startup.shutdown(wait=False)
             sys.exit(1)
         console.print(f"[cyan]Continuing conversation: {conversation_id}[/]")
+    startup.shutdown(wait=False)
     
     console.print("[bold]Welcome to Claude Chat![/]")
     console.print("Type 'exit' or press Ctrl+C to quit, 'help' for commands")
     
-    # Load any existing conversation history
-    try:
-        history = claude.chat_conversation_history(conversation_id)
-        if history and 'chat_messages' in history and len(history['chat_messages']) > 0:
-            console.print("[cyan]--- Previous messages ---[/]")
-            # Print last few messages for context
-            for message in history['chat_messages'][-6:]:  # Show last 6 messages
-                role = "You" if message['sender'] == 'human' else "Claude"
-                content = message['message']['content'][0]['text']
-                console.print(f"[bold]{role}:[/] {content[:100]}{'...' if len(content) > 100 else ''}")
-            console.print("[cyan]--- New conversation ---[/]")
-    except Exception as e:
-        # If we can't load history, just continue
-        if debug:
-            console.print(f"[yellow]Warning:[/] Couldn't load history: {str(e)}")
+    # Show the history now if it's already here, otherwise above the prompt once it arrives
+    if history is not None:
+        if history.done():
+            show_history(screen, history, debug)
+        else:
+            history.add_done_callback(lambda future: show_history(screen, future, debug, started))
+    
+    if debug:
+        console.print(f"[dim]Time to interactive: {time.perf_counter() - started:.2f}s"
+                      f"{' (history still loading)' if history is not None and not history.done() else ''}[/]")
+    
+    # Replies are sent and shown by a background worker, so the next message
+    # can be typed (and queued) while Claude is still answering
+    sender = SendQueue(claude, conversation_id, screen, debug=debug)
     
     # Main chat loop
     try:
         while True:
-            user_input = console.input("[bold green]You:[/] ")
+            try:
+                user_input = screen.input()
+            except EOFError:
+                user_input = 'exit'
+            except KeyboardInterrupt:
+                if not sender.busy:
+                    raise
+                # Ctrl+C while a reply is streaming cancels just that reply
+                console.print("\n[yellow]Cancelling response...[/]")
+                sender.cancel_current()
+                continue
+            command = user_input.strip().lower()
             
             # Handle built-in commands
-            if user_input.lower() == 'exit':
+            if command == 'exit':
+                if sender.busy:
+                    console.print(f"[cyan]Waiting for {sender.outstanding} message(s) to finish "
+                                  "(Ctrl+C to abandon)...[/]")
+                    sender.wait()
                 break
-            elif user_input.lower() == 'help':
+            elif command == 'help':
                 show_help()
                 continue
-            elif user_input.lower() == 'clear':
+            elif command == 'clear':
                 os.system('cls' if os.name == 'nt' else 'clear')
                 continue
-            elif user_input.lower().startswith('attach '):
+            elif command == 'queue':
+                show_queue(sender)
+                continue
+            elif command == 'cancel' or command.startswith('cancel '):
+                cancel_queued(sender, command[7:].strip())
+                continue
+            elif command.startswith('attach '):
                 # Extract file path
-                file_path = user_input[7:].strip()
+                file_path = user_input.strip()[7:].strip()
                 if not os.path.exists(file_path):
                     console.print(f"[bold red]Error:[/] File '{file_path}' not found.")
                     continue
                 
                 # Ask for a message to send with the attachment
-                message = console.input("[bold green]Message with attachment:[/] ")
-                
-                console.print("[cyan]Sending message with attachment...[/]")
-                try:
-                    response = send_message_safely(claude, message, conversation_id, attachment=file_path)
-                    console.print("[bold purple]Claude:[/]")
-                    
-                    # Check if we got the new format with meta info
-                    if isinstance(response, dict) and "text" in response:
-                        console.print(Markdown(response["text"]))
-                        
-                        # Show response time if available
-                        if "meta" in response and "response_time_seconds" in response["meta"]:
-                            response_time = response["meta"]["response_time_seconds"]
-                            console.print(f"[dim](Response time: {response_time:.2f}s)[/dim]")
-                    else:
-                        # Legacy format
-                        console.print(Markdown(response))
-                except Exception as e:
-                    console.print(f"[bold red]Error sending attachment:[/] {str(e)}")
+                message = screen.input("[bold green]Message with attachment:[/] ")
+                submit(sender, message, attachment=file_path)
+                continue
+            elif not user_input.strip():
                 continue
                 
             # Regular message
-            console.print("[cyan]Thinking...[/]")
-            try:
-                response = send_message_safely(claude, user_input, conversation_id)
-                console.print("[bold purple]Claude:[/]")
-                
-                # Check if we got the new format with meta info
-                if isinstance(response, dict) and "text" in response:
-                    console.print(Markdown(response["text"]))
-                    
-                    # Show response time if available
-                    if "meta" in response and "response_time_seconds" in response["meta"]:
-                        response_time = response["meta"]["response_time_seconds"]
-                        model = response["meta"].get("model", "unknown")
-                        
-                        if debug:
-                            console.print(Panel(f"Response time: {response_time:.2f}s\nModel: {model}", 
-                                              title="Response Info", 
-                                              expand=False))
-                        else:
-                            console.print(f"[dim](Response time: {response_time:.2f}s)[/dim]")
-                else:
-                    # Legacy format
-                    console.print(Markdown(response))
-            except Exception as e:
-                console.print(f"[bold red]Error:[/] {str(e)}")
+            submit(sender, user_input)
     
     except KeyboardInterrupt:
+        sender.close()
         console.print("\n[bold]Exiting chat. Goodbye![/]")
         sys.exit(0)
+    sender.close()
 
-def send_message_safely(claude, prompt, conversation_id, attachment=None):
-    """Send a message with error handling for JSON parsing issues."""
+class PromptScreen:
+    """
+    The chat prompt, plus a way to print things that arrive while the user is
+    typing at it: the prompt line is cleared, the output printed, and the
+    prompt redrawn with whatever had been typed so far.
+    """
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.submitted = 0
+        self._lock = threading.Lock()
+        self._waiting = False
+
+    def input(self, prompt=None):
+        with self._lock:
+            self._waiting = True
+        try:
+            return console.input(prompt or self.prompt)
+        finally:
+            with self._lock:
+                self._waiting = False
+                self.submitted += 1
+
+    def print(self, *objects):
+        with self._lock:
+            redraw = self._waiting and console.is_terminal
+            if redraw:
+                console.file.write("\r\x1b[2K")
+            for obj in objects:
+                console.print(obj)
+            if redraw:
+                console.print(self.prompt, end="")
+                if readline is not None:
+                    console.file.write(readline.get_line_buffer())
+                console.file.flush()
+
+def show_history(screen, history, debug=False, started=None):
+    """Preview the last messages of a conversation from a history future."""
     try:
-        return claude.send_message(prompt, conversation_id, attachment=attachment)
-    except json.JSONDecodeError as e:
-        # Handle JSON parsing errors
-        console.print(f"[yellow]Warning: JSON parsing error: {str(e)}[/]")
-        console.print("[yellow]Attempting to fix the response...[/]")
-        
-        # Patch the claude_api's send_message method with a more robust implementation
-        # This is a temporary fix during this session
-        def patched_send_message(self, prompt, conversation_id, attachment=None, timeout=500):
-            import re
-            import json
-            
-            url = "https://claude.ai/api/append_message"
-            
-            # Upload attachment if provided
-            attachments = []
-            if attachment:
-                attachment_response = self.upload_attachment(attachment)
-                if attachment_response:
-                    attachments = [attachment_response]
-                else:
-                    return {"Error: Invalid file format. Please try again."}
-            
-            # Ensure attachments is an empty list when no attachment is provided
-            if not attachment:
-                attachments = []
-            
-            payload = json.dumps({
-                "completion": {
-                    "prompt": f"{prompt}",
-                    "timezone": "Asia/Kolkata",
-                    "model": "claude-2"
-                },
-                "organization_uuid": f"{self.organization_id}",
-                "conversation_uuid": f"{conversation_id}",
-                "text": f"{prompt}",
-                "attachments": attachments
-            })
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0',
-                'Accept': 'text/event-stream, text/event-stream',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://claude.ai/chats',
-                'Content-Type': 'application/json',
-                'Origin': 'https://claude.ai',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Cookie': f'{self.cookie}',
-                'Sec-Fetch-Dest': 'empty',
-                'Sec-Fetch-Mode': 'cors',
-                'Sec-Fetch-Site': 'same-origin',
-                'TE': 'trailers'
-            }
-            
-            from curl_cffi import requests
-            response = requests.post(url, headers=headers, data=payload, impersonate="chrome110", timeout=timeout)
-            decoded_data = response.content.decode("utf-8")
-            
-            # More robust parsing
-            completions = []
-            for line in decoded_data.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                # Handle the server-sent event format
-                if line.startswith('data: '):
-                    try:
-                        json_str = line[6:].strip()
-                        data = json.loads(json_str)
-                        if 'completion' in data:
-                            completions.append(data['completion'])
-                    except json.JSONDecodeError:
-                        # Skip malformed JSON
-                        console.print(f"[yellow]Skipping malformed data: {line[:30]}...[/]")
-                        continue
-            
-            answer = ''.join(completions)
-            if not answer and decoded_data:
-                # Fallback: try to extract text between quotes if JSON parsing failed
-                import re
-                matches = re.findall(r'"completion"\s*:\s*"([^"]+)"', decoded_data)
-                if matches:
-                    answer = ''.join(matches)
-                else:
-                    answer = "Sorry, I couldn't process the response. Please try again."
-            
-            return answer
-        
-        # Apply the patch
-        import types
-        claude.send_message = types.MethodType(patched_send_message, claude)
+        conversation = history.result()
+    except Exception as e:
+        # If we can't load history, just continue
+        if debug:
+            screen.print(f"[yellow]Warning:[/] Couldn't load history: {str(e)}")
+        return
+    # Once the user has sent something the old messages would only get in the way
+    if screen.submitted or not isinstance(conversation, Conversation) or conversation.message_count == 0:
+        return
+    
+    lines = ["[cyan]--- Previous messages ---[/]"]
+    # Print last few messages for context
+    for message in conversation.chat_messages[-6:]:  # Show last 6 messages
+        role = "You" if message.is_human else "Claude"
+        content = message.text
+        lines.append(f"[bold]{role}:[/] {content[:100]}{'...' if len(content) > 100 else ''}")
+    lines.append("[cyan]--- New conversation ---[/]")
+    if debug and started is not None:
+        lines.append(f"[dim]History loaded after {time.perf_counter() - started:.2f}s[/]")
+    screen.print(*lines)
+
+def new_conversation_id(claude, pool):
+    """Take a conversation from the pool, falling back to creating one."""
+    conversation_id = pool.take(claude.organization_id)
+    if not conversation_id:
+        conversation = claude.create_new_chat()
+        if 'error' in conversation:
+            # The client picks the UUID, so a conversation that failed to report back may still exist
+            console.print(f"[yellow]Warning:[/] {conversation['error']}")
+        conversation_id = conversation['uuid']
+    pool.refill_in_background(claude)
+    return conversation_id
+
+def submit(sender, prompt, attachment=None):
+    """Queue a message, telling the user when it has to wait its turn."""
+    ahead = sender.outstanding
+    number = sender.submit(prompt, attachment=attachment)
+    if ahead:
+        console.print(f"[dim](Queued as #{number}, {ahead} ahead of it; 'queue' to view, "
+                      f"'cancel {number}' to drop it)[/dim]")
+
+def show_queue(sender):
+    """List the message being answered and those waiting behind it."""
+    current, queued = sender.snapshot()
+    if current is None and not queued:
+        console.print("[dim]Nothing queued.[/dim]")
+        return
+    if current is not None:
+        console.print(f"[cyan]#{current.number} (answering):[/] {preview(current)}")
+    for item in queued:
+        console.print(f"[cyan]#{item.number}:[/] {preview(item)}")
+
+def cancel_queued(sender, which):
+    """Handle 'cancel' (current reply), 'cancel N' and 'cancel all'."""
+    if not which:
+        if sender.cancel_current():
+            console.print("[yellow]Cancelling response...[/]")
+        else:
+            console.print("[dim]No reply in progress.[/dim]")
+    elif which == 'all':
+        dropped = sender.cancel_queued()
+        console.print(f"[yellow]Dropped {len(dropped)} queued message(s).[/]")
+    elif which.lstrip('#').isdigit():
+        number = int(which.lstrip('#'))
+        if sender.cancel_queued(number):
+            console.print(f"[yellow]Dropped queued message #{number}.[/]")
+        else:
+            console.print(f"[bold red]Error:[/] No queued message #{number}.")
+    else:
+        console.print("[bold red]Error:[/] Usage: cancel [N|all]")
+
+def preview(item):
+    text = item.prompt.replace("\n", " ")
+    text = f"{text[:60]}{'...' if len(text) > 60 else ''}"
+    if item.attachment:
+        text += f" [dim](+ {os.path.basename(item.attachment)})[/dim]"
+    return text
+
+class QueuedMessage:
+    __slots__ = ("number", "prompt", "attachment", "waited")
+
+    def __init__(self, number, prompt, attachment=None, waited=False):
+        self.number = number
+        self.prompt = prompt
+        self.attachment = attachment
+        # Whether it had to queue behind another message
+        self.waited = waited
+
+class SendQueue:
+    """
+    Sends one conversation's messages on a background thread, strictly in the
+    order they were typed, and prints each reply above the prompt.
+
+    A message waits until the reply to the previous one is complete, so the
+    conversation stays in order on the server too.
+    """
+
+    def __init__(self, claude, conversation_id, screen, debug=False):
+        self.claude = claude
+        self.conversation_id = conversation_id
+        self.screen = screen
+        self.debug = debug
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._current = None
+        self._cancel = None
+        self._next_number = 1
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="chat-send", daemon=True)
+        self._worker.start()
+
+    @property
+    def outstanding(self):
+        """Messages queued or being answered."""
+        with self._cond:
+            return len(self._queue) + (self._current is not None)
+
+    @property
+    def busy(self):
+        return self.outstanding > 0
+
+    def submit(self, prompt, attachment=None):
+        """Queue a message and return its number."""
+        with self._cond:
+            waited = bool(self._queue) or self._current is not None
+            item = QueuedMessage(self._next_number, prompt, attachment, waited)
+            self._next_number += 1
+            self._queue.append(item)
+            self._cond.notify_all()
+            return item.number
+
+    def snapshot(self):
+        """The message being answered (or None) and a list of those queued."""
+        with self._cond:
+            return self._current, list(self._queue)
+
+    def cancel_current(self):
+        """Cancel the reply in progress; returns False if there is none."""
+        with self._cond:
+            if self._current is None:
+                return False
+            self._cancel.cancel()
+            return True
+
+    def cancel_queued(self, number=None):
+        """Drop queued message number (or all of them); returns what was dropped."""
+        with self._cond:
+            dropped = [item for item in self._queue if number is None or item.number == number]
+            for item in dropped:
+                self._queue.remove(item)
+            self._cond.notify_all()
+            return dropped
+
+    def wait(self):
+        """Block until every queued message has been answered."""
+        with self._cond:
+            while self._queue or self._current is not None:
+                self._cond.wait(0.1)
+
+    def close(self):
+        """Stop after the current reply, dropping anything still queued."""
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            if self._cancel is not None:
+                self._cancel.cancel()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                item = self._current = self._queue.popleft()
+                cancel = self._cancel = CancelToken()
+
+            label = f" #{item.number}" if item.waited else ""
+            if item.attachment:
+                self.screen.print(f"[cyan]Sending message{label} with attachment...[/]")
+            elif item.waited:
+                self.screen.print(f"[cyan]Sending queued message{label}...[/]")
+            else:
+                self.screen.print("[cyan]Thinking...[/]")
+            try:
+                response = send_message_safely(self.claude, item.prompt, self.conversation_id,
+                                               attachment=item.attachment, cancel=cancel)
+                show_response(self.screen, response, self.debug)
+            except Exception as e:
+                self.screen.print(f"[bold red]Error:[/] {str(e)}")
+            finally:
+                with self._cond:
+                    self._current = self._cancel = None
+                    self._cond.notify_all()
+
+def show_response(screen, response, debug=False):
+    """Print a reply (and its timing) above the prompt."""
+    # Check if we got the new format with meta info
+    if not (isinstance(response, dict) and "text" in response):
+        # Legacy format
+        screen.print("[bold purple]Claude:[/]", Markdown(response))
+        return
+    
+    output = ["[bold purple]Claude:[/]"]
+    with phase("render"):
+        output.append(Markdown(response["text"]))
+    meta = response.get("meta", {})
+    if meta.get("cancelled"):
+        output.append("[yellow](Response cancelled)[/]")
+    
+    # Show response time if available
+    if "response_time_seconds" in meta:
+        response_time = meta["response_time_seconds"]
+        model = meta.get("model", "unknown")
         
-        # Try again with the patched method
-        return claude.send_message(prompt, conversation_id, attachment=attachment)
+        if debug:
+            output.append(Panel(f"Response time: {response_time:.2f}s\nModel: {model}",
+                                title="Response Info",
+                                expand=False))
+        else:
+            output.append(f"[dim](Response time: {response_time:.2f}s)[/dim]")
+    screen.print(*output)
+
+def send_message_safely(claude, prompt, conversation_id, attachment=None, cancel=None):
+    """
+    Send a message, turning unexpected client failures into an error reply.
+
+    Falling back to other endpoint/payload formats is handled by the client's
+    strategy registry, which remembers which format last worked.
+    """
+    try:
+        return claude.send_message(prompt, conversation_id, attachment=attachment, cancel=cancel)
+    except ValueError as e:
+        # json.JSONDecodeError is a ValueError
+        console.print(f"[yellow]Warning: Could not parse the response: {str(e)}[/]")
+        return {"text": "Sorry, I couldn't process the response. Please try again.", "meta": {"error": True}}
 
 def show_help():
     """Show help for chat commands"""
@@ -239,4 +417,11 @@ def show_help():
 - [cyan]help[/]: Show this help message
 - [cyan]clear[/]: Clear the screen
 - [cyan]attach [file][/]: Attach a file to your next message
+- [cyan]queue[/]: Show messages waiting to be sent
+- [cyan]cancel[/]: Cancel the reply in progress
+- [cyan]cancel [N|all][/]: Drop queued message N, or all of them
+- Press [cyan]Ctrl+C[/] while Claude is replying to cancel just that reply
+
+You can keep typing while Claude replies: new messages are queued and sent
+in order as soon as the previous reply is complete.
 """)
\ No newline at end of file
@@ -0,0 +1,293 @@
+from claude_cli.utils import fastjson
+from claude_cli.utils.client import EnhancedClient
+from claude_cli.utils.models import Conversation
+from rich.console import Console
+from rich.progress import Progress
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import gzip
+import json
+import lzma
+import os
+import shutil
+import sys
+import time
+import zlib
+
+console = Console()
+
+
+# A segment of the archive is closed, synced and checkpointed once this many
+# bytes (before compression) have been written to it, or after this many seconds
+SEGMENT_SIZE = 4 * 1024 * 1024
+SEGMENT_SECONDS = 30
+
+# Bytes read at a time when scanning an archive
+READ_SIZE = 64 * 1024
+
+_DECOMPRESSORS = {
+    '.gz': lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+    '.xz': lambda: lzma.LZMADecompressor(),
+}
+
+
+class ArchiveWriter:
+    """
+    Appends conversations to an export archive in segments: a complete gzip
+    member or xz stream each (concatenated ones read back as one file), or
+    a run of lines in a plain archive. A segment is finished and synced to
+    disk before its conversations are added to the checkpoint, so the
+    checkpoint never gets ahead of what the archive durably holds.
+    """
+
+    def __init__(self, path, checkpoint):
+        self.path = path
+        self.checkpoint = checkpoint
+        self._file = open(path, 'ab')
+        self._segment = None
+        self._ids = []
+        self._size = 0
+        self._started = 0.0
+
+    def write(self, conversation_id, line):
+        if self._segment is None:
+            if self.path.endswith('.gz'):
+                self._segment = gzip.GzipFile(fileobj=self._file, mode='wb')
+            elif self.path.endswith('.xz'):
+                self._segment = lzma.LZMAFile(self._file, 'wb')
+            else:
+                self._segment = self._file
+            self._started = time.monotonic()
+        data = line.encode('utf-8')
+        self._segment.write(data)
+        self._size += len(data)
+        self._ids.append(conversation_id)
+        if self._size >= SEGMENT_SIZE or time.monotonic() - self._started >= SEGMENT_SECONDS:
+            self.commit()
+
+    def commit(self):
+        """Finish the current segment, sync it, then checkpoint its conversations."""
+        if self._segment is None:
+            return
+        if self._segment is not self._file:
+            # Writes the member/stream trailer; the archive file itself stays open
+            self._segment.close()
+        self._segment = None
+        _sync(self._file)
+        self.checkpoint.write("".join(conversation_id + "\n" for conversation_id in self._ids))
+        _sync(self.checkpoint)
+        self._ids = []
+        self._size = 0
+
+    def close(self):
+        try:
+            self.commit()
+        finally:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def load_checkpoint(path):
+    """Return the conversation IDs recorded in the checkpoint, in the order they were written."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def _read_archive(f, path):
+    """
+    Read a raw archive file and yield ("line", text) for each complete line
+    and ("end", offset) after each complete segment (a gzip member, an xz
+    stream, or a line of a plain archive). Stops quietly at data that is
+    damaged or was cut off by an interruption.
+    """
+    new_decompressor = _DECOMPRESSORS.get(os.path.splitext(path)[1])
+    if new_decompressor is None:
+        offset = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            offset += len(line)
+            yield "line", line.decode('utf-8', errors='replace')
+            yield "end", offset
+        return
+
+    decompressor = new_decompressor()
+    # Where the current segment starts, and how much of it has been decompressed
+    start = fed = 0
+    pending = data = b""
+    while True:
+        data = data or f.read(READ_SIZE)
+        if not data:
+            return
+        try:
+            output = decompressor.decompress(data)
+        except (EOFError, zlib.error, lzma.LZMAError):
+            return
+        *lines, pending = (pending + output).split(b"\n")
+        for line in lines:
+            yield "line", (line + b"\n").decode('utf-8', errors='replace')
+        if decompressor.eof:
+            unused = decompressor.unused_data
+            start += fed + len(data) - len(unused)
+            fed = 0
+            yield "end", start
+            decompressor = new_decompressor()
+            data = unused
+        else:
+            fed += len(data)
+            data = b""
+
+
+def _line_id(line):
+    try:
+        return fastjson.loads(line).get('uuid')
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+
+def repair_archive(path, checkpoint_path):
+    """
+    Make an interrupted export's archive and checkpoint consistent again and
+    return the IDs of the conversations the archive holds.
+
+    The archive is cut back to its last complete segment; complete lines
+    that can still be read from an unfinished segment after it are written
+    again as a new segment. The checkpoint is brought in line with the
+    archive, which it can trail by a segment (or, for archives written by
+    older versions, run ahead of).
+    """
+    recorded = load_checkpoint(checkpoint_path)
+    if not os.path.exists(path):
+        if recorded:
+            _write_checkpoint(checkpoint_path, [])
+        return []
+
+    ids, unfinished, end = [], [], 0
+    with open(path, 'rb') as f:
+        for kind, value in _read_archive(f, path):
+            if kind == "line":
+                unfinished.append(_line_id(value))
+            else:
+                ids.extend(conversation_id for conversation_id in unfinished if conversation_id)
+                unfinished = []
+                end = value
+
+    if ids != recorded:
+        if ids[:len(recorded)] == recorded:
+            with open(checkpoint_path, 'a') as checkpoint:
+                checkpoint.write("".join(conversation_id + "\n" for conversation_id in ids[len(recorded):]))
+                _sync(checkpoint)
+        else:
+            _write_checkpoint(checkpoint_path, ids)
+
+    if end == os.path.getsize(path):
+        return ids
+
+    # Keep the unfinished tail aside, cut the archive back, and salvage what the tail still holds
+    tail_path = f"{path}.tail"
+    with open(path, 'rb') as f, open(tail_path, 'wb') as tail:
+        f.seek(end)
+        shutil.copyfileobj(f, tail)
+    os.truncate(path, end)
+    with open(tail_path, 'rb') as tail, open(checkpoint_path, 'a') as checkpoint, \
+            ArchiveWriter(path, checkpoint) as archive:
+        for kind, value in _read_archive(tail, path):
+            conversation_id = _line_id(value) if kind == "line" else None
+            if conversation_id:
+                archive.write(conversation_id, value)
+                ids.append(conversation_id)
+    os.remove(tail_path)
+    return ids
+
+
+def _write_checkpoint(path, ids):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write("".join(conversation_id + "\n" for conversation_id in ids))
+        _sync(f)
+    os.replace(tmp_path, path)
+
+
+def export_conversations(config, output, concurrency=4, proxy=None, debug=False):
+    """
+    Export every conversation with its full history into a JSONL archive.
+
+    Histories are fetched with bounded concurrency and written one line at a
+    time, so memory stays flat however large the account is. Conversations
+    are recorded in a checkpoint file next to the archive once the segment
+    holding them is on disk, and re-running the same export skips
+    everything already written.
+    """
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
+    checkpoint_path = f"{output}.checkpoint"
+    try:
+        done = set(repair_archive(output, checkpoint_path))
+    except OSError as e:
+        console.print(f"[bold red]Error:[/] Could not check '{output}' before resuming: {str(e)}")
+        sys.exit(1)
+
+    try:
+        conversations = claude.list_all_conversations()
+    except Exception as e:
+        console.print(f"[bold red]Error:[/] {str(e)}")
+        sys.exit(1)
+
+    pending = [conv.uuid for conv in conversations if conv.uuid not in done]
+    if done:
+        console.print(f"[cyan]Resuming export: {len(done)} already exported, {len(pending)} remaining[/]")
+    if not pending:
+        console.print(f"[green]Nothing to export; {output} is up to date.[/]")
+        return
+
+    failed = []
+    with open(checkpoint_path, 'a') as checkpoint, ArchiveWriter(output, checkpoint) as archive, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor, Progress(console=console) as progress:
+        task = progress.add_task("Exporting", total=len(pending))
+        ids = iter(pending)
+        in_flight = {}
+
+        def submit_next():
+            conversation_id = next(ids, None)
+            if conversation_id is not None:
+                future = executor.submit(claude.chat_conversation_history, conversation_id)
+                in_flight[future] = conversation_id
+
+        # Only keep a bounded number of histories in memory at once
+        for _ in range(concurrency * 2):
+            submit_next()
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                conversation_id = in_flight.pop(future)
+                try:
+                    history = future.result()
+                except Exception as e:
+                    history = {"error": str(e)}
+
+                if isinstance(history, Conversation):
+                    archive.write(conversation_id, fastjson.dumps(history.to_dict()) + "\n")
+                else:
+                    failed.append(conversation_id)
+                    if debug:
+                        console.print(f"[yellow]Failed to export {conversation_id}: {history.get('error')}[/]")
+
+                progress.advance(task)
+                submit_next()
+
+    exported = len(pending) - len(failed)
+    console.print(f"[green]Exported {exported} conversation(s) to {output}[/]")
+    if failed:
+        console.print(f"[yellow]{len(failed)} conversation(s) failed; run the same command again to retry them.[/]")
+        sys.exit(1)
@@ -1,4 +1,6 @@
 from claude_cli.utils.client import EnhancedClient
+from claude_cli.utils.models import Conversation
+from claude_cli.utils.profiling import phase
 from rich.console import Console
 from rich.table import Table
 from rich import box
@@ -9,8 +11,7 @@ console = Console()
 
 def list_conversations(config, proxy=None, debug=False):
     """List all available conversations."""
-    cookie = config.get('cookie')
-    claude = EnhancedClient(cookie, proxy=proxy, debug=debug)
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
     
     try:
         conversations = claude.list_all_conversations()
@@ -25,12 +26,12 @@ def list_conversations(config, proxy=None, debug=False):
         table.add_column("Created", style="magenta")
         table.add_column("Messages", style="blue", justify="right")
         
-        for conv in sorted(conversations, key=lambda x: x.get('created_at', ''), reverse=True):
-            conv_id = conv.get('uuid', 'Unknown')
-            name = conv.get('name', 'Untitled') or 'Untitled'
+        for conv in sorted(conversations, key=lambda x: x.created_at, reverse=True):
+            conv_id = conv.uuid or 'Unknown'
+            name = conv.title
             
             # Format the creation date
-            created_at = conv.get('created_at', '')
+            created_at = conv.created_at
             if created_at:
                 try:
                     # Parse the timestamp and format it
@@ -42,19 +43,19 @@ def list_conversations(config, proxy=None, debug=False):
                 created_str = 'Unknown'
             
             # Get message count
-            message_count = len(conv.get('chat_messages', []))
+            message_count = conv.message_count
             
             table.add_row(conv_id, name, created_str, str(message_count))
         
-        console.print(table)
+        with phase("render"):
+            console.print(table)
     except Exception as e:
         console.print(f"[bold red]Error:[/] {str(e)}")
         sys.exit(1)
 
 def delete_conversation(config, conversation_id, proxy=None, debug=False):
     """Delete a specific conversation."""
-    cookie = config.get('cookie')
-    claude = EnhancedClient(cookie, proxy=proxy, debug=debug)
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
     
     try:
         # Confirm before deleting
@@ -74,8 +75,7 @@ def delete_conversation(config, conversation_id, proxy=None, debug=False):
 
 def rename_conversation(config, conversation_id, new_title, proxy=None, debug=False):
     """Rename a specific conversation."""
-    cookie = config.get('cookie')
-    claude = EnhancedClient(cookie, proxy=proxy, debug=debug)
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
     
     try:
         success = claude.rename_chat(new_title, conversation_id)
@@ -89,22 +89,21 @@ def rename_conversation(config, conversation_id, new_title, proxy=None, debug=Fa
 
 def view_conversation_history(config, conversation_id, proxy=None, debug=False):
     """View the message history of a specific conversation."""
-    cookie = config.get('cookie')
-    claude = EnhancedClient(cookie, proxy=proxy, debug=debug)
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
     
     try:
         history = claude.chat_conversation_history(conversation_id)
         
-        if not history or 'chat_messages' not in history or not history['chat_messages']:
+        if not isinstance(history, Conversation) or not history.message_count:
             console.print("[yellow]This conversation doesn't have any messages.[/]")
             return
         
-        name = history.get('name', 'Untitled') or 'Untitled'
+        name = history.title
         console.print(f"[bold]Conversation:[/] {name} ({conversation_id})")
         
-        for i, message in enumerate(history['chat_messages']):
-            role = "You" if message['sender'] == 'human' else "Claude"
-            content = message['message']['content'][0]['text']
+        for i, message in enumerate(history.chat_messages):
+            role = "You" if message.is_human else "Claude"
+            content = message.text
             
             if i > 0:  # Add separator between messages
                 console.print("─" * 50)
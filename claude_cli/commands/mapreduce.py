@@ -0,0 +1,190 @@
+from claude_cli.utils.chunking import split_into_chunks
+from claude_cli.utils.client import EnhancedClient
+from claude_cli.utils.pool import ConversationPool
+from rich.console import Console
+from rich.panel import Panel
+from rich.progress import Progress
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import sys
+import time
+
+# Progress and diagnostics go to stderr so the answer can be piped
+console = Console(stderr=True)
+
+MAP_PROMPT = """{prompt}
+
+The document is too long to send at once, so you are seeing part {index} of {total}. \
+Consecutive parts overlap slightly. Answer using only this part; if it contains nothing \
+relevant, say so in one sentence.
+
+<document part="{index}/{total}">
+{chunk}
+</document>"""
+
+REDUCE_PROMPT = """{prompt}
+
+The document was too long to read at once, so it was split into parts and the request \
+above was answered for each part separately. Combine these partial answers into one \
+final answer, removing duplicates caused by the overlap between parts and ignoring parts \
+that found nothing relevant.
+
+{answers}"""
+
+
+class _Part:
+    __slots__ = ("index", "text", "answer", "error", "seconds")
+
+    def __init__(self, index, text):
+        self.index = index
+        self.text = text
+        self.answer = None
+        self.error = None
+        self.seconds = 0.0
+
+
+def map_reduce_query(config, prompt, path, chunk_size=30000, overlap=500, concurrency=4,
+                     keep_conversations=False, proxy=None, debug=False):
+    """
+    Answer a prompt about a file too large for one message.
+
+    The file is split into overlapping chunks at paragraph or line
+    boundaries. Each chunk is sent with the prompt to its own conversation,
+    at most `concurrency` at a time, and the partial answers are then
+    combined by a reduce step (itself split up again if the partial answers
+    are too long). Returns the final answer text.
+    """
+    started = time.perf_counter()
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read()
+    except OSError as e:
+        console.print(f"[bold red]Error:[/] Could not read '{path}': {str(e)}")
+        sys.exit(1)
+
+    chunks = split_into_chunks(text, size=chunk_size, overlap=overlap)
+    if not chunks:
+        console.print(f"[bold red]Error:[/] '{path}' is empty.")
+        sys.exit(1)
+
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
+    pool = ConversationPool(config, debug=debug)
+    conversations = []
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        try:
+            parts = [_Part(i + 1, chunk) for i, chunk in enumerate(chunks)]
+            console.print(f"[cyan]Split {len(text):,} characters into {len(parts)} part(s); "
+                          f"answering {min(len(parts), concurrency)} at a time[/]")
+            if len(parts) == 1:
+                messages = [f"{prompt}\n\n{parts[0].text}"]
+            else:
+                messages = [MAP_PROMPT.format(prompt=prompt, index=part.index, total=len(parts), chunk=part.text)
+                            for part in parts]
+            _run_parts(claude, pool, executor, parts, messages, conversations, "Reading parts", debug)
+
+            answered = [part for part in parts if part.answer]
+            if not answered:
+                console.print(f"[bold red]Error:[/] No part could be answered: {parts[0].error}")
+                sys.exit(1)
+            for part in parts:
+                if part.error:
+                    console.print(f"[yellow]Warning:[/] Part {part.index} failed: {part.error}")
+
+            answer = _reduce(claude, pool, executor, prompt, answered, conversations, chunk_size, debug)
+        finally:
+            if not keep_conversations:
+                for conversation_id in conversations:
+                    executor.submit(claude.delete_conversation, conversation_id)
+
+    if debug:
+        slowest = max(parts, key=lambda part: part.seconds)
+        console.print(Panel(
+            f"Parts: {len(parts)} ({sum(1 for part in parts if part.error)} failed)\n"
+            f"Slowest part: {slowest.seconds:.2f}s (part {slowest.index})\n"
+            f"Sum of part times: {sum(part.seconds for part in parts):.2f}s\n"
+            f"Total wall time: {time.perf_counter() - started:.2f}s",
+            title="Map-reduce",
+            expand=False
+        ))
+    return answer
+
+
+def _run_parts(claude, pool, executor, parts, messages, conversations, description, debug):
+    """Send each part's message in parallel, each to a conversation of its own."""
+    # Create every conversation before sending anything: send_message checks
+    # the conversation listing, which must already include all of them
+    ids = list(executor.map(lambda _: _new_conversation(claude, pool), parts))
+    conversations.extend(conversation_id for conversation_id in ids if conversation_id)
+
+    with Progress(console=console, transient=True) as progress:
+        task = progress.add_task(description, total=len(parts))
+        futures = [executor.submit(_answer_part, claude, conversation_id, message, part)
+                   for conversation_id, message, part in zip(ids, messages, parts)]
+        for future in as_completed(futures):
+            part = future.result()
+            progress.advance(task)
+            if debug:
+                status = "failed" if part.error else f"{len(part.answer)} chars"
+                console.print(f"[dim]Part {part.index}: {status} in {part.seconds:.2f}s[/]")
+
+
+def _new_conversation(claude, pool):
+    conversation_id = pool.take(claude.organization_id)
+    if conversation_id:
+        return conversation_id
+    conversation = claude.create_new_chat()
+    if 'error' in conversation:
+        return None
+    return conversation.uuid
+
+
+def _answer_part(claude, conversation_id, message, part):
+    started = time.perf_counter()
+    try:
+        if conversation_id is None:
+            raise Exception("Could not create a conversation")
+        response = claude.send_message(message, conversation_id)
+        if not isinstance(response, dict) or "text" not in response:
+            raise Exception(str(response))
+        if response["meta"].get("error") or response["meta"].get("timed_out"):
+            raise Exception(response["text"])
+        part.answer = response["text"]
+    except Exception as e:
+        part.error = str(e)
+    part.seconds = time.perf_counter() - started
+    return part
+
+
+def _reduce(claude, pool, executor, prompt, answered, conversations, chunk_size, debug):
+    """Combine partial answers, in several rounds if they don't fit in one message."""
+    answers = [part.answer for part in answered]
+    if len(answers) == 1:
+        return answers[0]
+
+    round_number = 1
+    while True:
+        combined = "\n\n".join(f"<partial_answer part=\"{i + 1}\">\n{answer}\n</partial_answer>"
+                               for i, answer in enumerate(answers))
+        groups = split_into_chunks(combined, size=chunk_size, overlap=0)
+        if len(groups) == 1:
+            part = _Part(1, combined)
+            _run_reduce(claude, pool, executor, prompt, [part], conversations, round_number, debug)
+            if part.error:
+                console.print(f"[bold red]Error:[/] Could not combine the partial answers: {part.error}")
+                sys.exit(1)
+            return part.answer
+
+        # Too long for one message: combine groups of answers first
+        parts = [_Part(i + 1, group) for i, group in enumerate(groups)]
+        _run_reduce(claude, pool, executor, prompt, parts, conversations, round_number, debug)
+        answers = [part.answer for part in parts if part.answer]
+        if not answers:
+            console.print(f"[bold red]Error:[/] Could not combine the partial answers: {parts[0].error}")
+            sys.exit(1)
+        round_number += 1
+
+
+def _run_reduce(claude, pool, executor, prompt, parts, conversations, round_number, debug):
+    messages = [REDUCE_PROMPT.format(prompt=prompt, answers=part.text) for part in parts]
+    _run_parts(claude, pool, executor, parts, messages, conversations,
+               f"Combining answers (round {round_number})", debug)
@@ -0,0 +1,265 @@
+from claude_cli.commands.chat import new_conversation_id
+from claude_cli.utils.client import CancelToken, EnhancedClient
+from claude_cli.utils.pool import ConversationPool
+from claude_cli.utils.profiling import phase
+from claude_cli.utils import tracing
+from rich.console import Console
+from rich.live import Live
+from rich.markdown import Markdown
+from rich.panel import Panel
+from rich.table import Table
+from rich.text import Text
+import asyncio
+import re
+import signal
+import sys
+import time
+
+console = Console()
+
+_TARGET_RE = re.compile(r"^@([\d,\s]+|all)\s+(.*)$", re.DOTALL)
+
+# How often the panes are redrawn while replies stream
+REFRESH_PER_SECOND = 12
+
+
+class Pane:
+    """One conversation in the split view and the exchange currently shown in it."""
+
+    def __init__(self, number, conversation_id, title):
+        self.number = number
+        self.conversation_id = conversation_id
+        self.title = title
+        self.prompt = None
+        self.chunks = []
+        self.status = "idle"
+        self.started = None
+        self.seconds = None
+        self.cancel = None
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    def begin(self, prompt):
+        self.prompt = prompt
+        self.chunks = []
+        self.status = "streaming"
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.cancel = CancelToken()
+
+    def finish(self, response):
+        self.seconds = time.perf_counter() - self.started
+        meta = response.get("meta", {}) if isinstance(response, dict) else {}
+        # The full text replaces the deltas: non-streaming fallbacks only return it at the end
+        text = response.get("text", "") if isinstance(response, dict) else str(response)
+        self.chunks = [text]
+        if meta.get("cancelled"):
+            self.status = "cancelled"
+        elif meta.get("error") or not isinstance(response, dict):
+            self.status = "error"
+        else:
+            self.status = "done"
+
+    def fail(self, error):
+        self.seconds = time.perf_counter() - self.started
+        self.chunks = [str(error)]
+        self.status = "error"
+
+    def render(self, max_lines=None):
+        """A panel showing the prompt and reply; while streaming, only the last max_lines lines."""
+        style = {"streaming": "cyan", "done": "green", "cancelled": "yellow", "error": "red"}.get(self.status, "dim")
+        subtitle = self.status
+        if self.seconds is not None:
+            subtitle += f" in {self.seconds:.2f}s"
+        elif self.status == "streaming":
+            subtitle += f" {time.perf_counter() - self.started:.1f}s"
+
+        if self.prompt is None:
+            body = Text("(nothing sent yet)", style="dim")
+        elif self.status == "streaming" or max_lines is not None:
+            lines = self.text.splitlines()
+            if max_lines is not None and len(lines) > max_lines:
+                lines = ["..."] + lines[-max_lines:]
+            body = Text.assemble(("You: ", "bold green"), self.prompt.strip().splitlines()[0][:80], "\n\n",
+                                 "\n".join(lines))
+        else:
+            body = Markdown(self.text)
+        return Panel(body, title=f"[{style}]{self.number}[/] {self.title}", subtitle=subtitle,
+                     border_style=style)
+
+
+def _grid(panes, max_lines=None):
+    grid = Table.grid(expand=True, padding=(0, 1))
+    for _ in panes:
+        grid.add_column(ratio=1)
+    grid.add_row(*[pane.render(max_lines) for pane in panes])
+    return grid
+
+
+def parse_targets(user_input, panes):
+    """
+    Split '@1,3 message' into the addressed panes and the message; input
+    without an @ prefix (or '@all') goes to every pane. Returns (panes, message),
+    or (None, error) if a pane number doesn't exist.
+    """
+    match = _TARGET_RE.match(user_input.strip())
+    if not match:
+        return panes, user_input
+    which, message = match.groups()
+    if which == "all":
+        return panes, message
+    numbers = [int(n) for n in re.split(r"[,\s]+", which.strip()) if n]
+    missing = [n for n in numbers if not 1 <= n <= len(panes)]
+    if missing:
+        return None, f"No pane {', '.join(map(str, missing))} (there are {len(panes)})"
+    return [panes[n - 1] for n in dict.fromkeys(numbers)], message
+
+
+def start_multi_chat(config, conversation_ids=None, split=0, proxy=None, debug=False):
+    """
+    Chat with several conversations side by side.
+
+    Each prompt goes to every pane, or to the panes named with an '@1,3'
+    prefix, and the replies stream into their panes concurrently. The
+    network calls run on worker threads while one asyncio event loop owns
+    all pane state and the display.
+    """
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
+    pool = ConversationPool(config, debug=debug)
+    # Not asyncio.run: its Ctrl+C handler would stop Ctrl+C from interrupting the prompt
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(_main(claude, pool, conversation_ids or [], split, debug))
+    except (KeyboardInterrupt, EOFError):
+        console.print("\n[bold]Exiting chat. Goodbye![/]")
+    finally:
+        loop.close()
+
+
+async def _main(claude, pool, conversation_ids, split, debug):
+    try:
+        panes = await _open_panes(claude, pool, conversation_ids, split)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/] {str(e)}")
+        sys.exit(1)
+
+    console.print(f"[bold]Welcome to Claude Chat![/] {len(panes)} panes:")
+    for pane in panes:
+        console.print(f"  [cyan]{pane.number}[/] {pane.title} [dim]({pane.conversation_id})[/]")
+    console.print("Messages go to every pane; prefix with [cyan]@2[/] or [cyan]@1,3[/] to pick panes. "
+                  "'help' for commands.")
+    await _session(claude, panes, debug)
+
+
+async def _open_panes(claude, pool, conversation_ids, split):
+    """One pane per existing conversation ID, plus new conversations up to split panes."""
+    loop = asyncio.get_running_loop()
+    panes = []
+    if conversation_ids:
+        conversations = await loop.run_in_executor(None, claude.list_all_conversations)
+        known = {conv.uuid: conv for conv in conversations}
+        missing = [conversation_id for conversation_id in conversation_ids if conversation_id not in known]
+        if missing:
+            raise ValueError(f"Conversation ID(s) not found: {', '.join(missing)}")
+        panes = [Pane(i + 1, conversation_id, known[conversation_id].title)
+                 for i, conversation_id in enumerate(conversation_ids)]
+
+    # New conversations are created concurrently rather than one after another
+    extra = max(0, split - len(panes))
+    created = await asyncio.gather(*[loop.run_in_executor(None, new_conversation_id, claude, pool)
+                                     for _ in range(extra)])
+    for conversation_id in created:
+        panes.append(Pane(len(panes) + 1, conversation_id, "New conversation"))
+    return panes
+
+
+async def _session(claude, panes, debug):
+    while True:
+        # Nothing is streaming between rounds, so blocking the loop on input is fine
+        user_input = console.input("[bold green]You:[/] ")
+        command = user_input.strip().lower()
+        if command == 'exit':
+            return
+        if command == 'help':
+            _show_help()
+            continue
+        if command == 'panes':
+            console.print(_grid(panes))
+            continue
+        if not command:
+            continue
+
+        targets, message = parse_targets(user_input, panes)
+        if targets is None:
+            console.print(f"[bold red]Error:[/] {message}")
+            continue
+        await _round(claude, panes, targets, message, debug)
+
+
+async def _round(claude, panes, targets, message, debug):
+    """Send message to the target panes and stream all replies until they finish."""
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+
+    def deliver(pane):
+        # Runs on a worker thread; hands each delta to the event loop
+        def on_text(text):
+            loop.call_soon_threadsafe(pane.chunks.append, text)
+        return claude.send_message(message, pane.conversation_id, on_text=on_text, cancel=pane.cancel)
+
+    async def send(pane):
+        pane.begin(message)
+        try:
+            pane.finish(await loop.run_in_executor(None, deliver, pane))
+        except Exception as e:
+            pane.fail(e)
+
+    def interrupt():
+        console.print("[yellow]Cancelling replies...[/]")
+        for pane in targets:
+            if pane.cancel is not None:
+                pane.cancel.cancel()
+
+    # Ctrl+C cancels the replies in flight rather than leaving the chat
+    try:
+        loop.add_signal_handler(signal.SIGINT, interrupt)
+        handles_interrupt = True
+    except (NotImplementedError, RuntimeError):  # Windows
+        handles_interrupt = False
+
+    tasks = [asyncio.ensure_future(send(pane)) for pane in targets]
+    shown = [pane for pane in panes if pane in targets or pane.prompt is not None]
+    max_lines = max(3, console.height - 8)
+    try:
+        with tracing.span("round", cat="chat", panes=len(targets)), \
+                Live(_grid(shown, max_lines), console=console, transient=True,
+                     refresh_per_second=REFRESH_PER_SECOND) as live:
+            while not all(task.done() for task in tasks):
+                await asyncio.wait(tasks, timeout=1 / REFRESH_PER_SECOND)
+                with phase("render"):
+                    live.update(_grid(shown, max_lines))
+    finally:
+        if handles_interrupt:
+            loop.remove_signal_handler(signal.SIGINT)
+
+    # Leave the finished replies in the scrollback in full
+    with phase("render"):
+        console.print(_grid(targets))
+    if debug:
+        slowest = max(pane.seconds or 0 for pane in targets)
+        console.print(f"[dim]{len(targets)} replies in {time.perf_counter() - started:.2f}s "
+                      f"(slowest {slowest:.2f}s)[/]")
+
+
+def _show_help():
+    console.print("""
+[bold]Available Commands:[/]
+- [cyan]exit[/]: Exit the chat
+- [cyan]help[/]: Show this help message
+- [cyan]panes[/]: Show the last exchange in every pane
+- [cyan]@N message[/]: Send to pane N only; [cyan]@1,3 message[/] sends to panes 1 and 3
+- Anything else is sent to every pane
+- Press [cyan]Ctrl+C[/] while replies are streaming to cancel them
+""")
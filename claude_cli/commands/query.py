@@ -1,29 +1,42 @@
+from claude_cli.utils import fastjson
 from claude_cli.utils.client import EnhancedClient
+from claude_cli.utils.pool import ConversationPool
 from rich.console import Console
 from rich.panel import Panel
+import contextlib
 import sys
+import time
 
 console = Console()
 
+# Exit codes for the streaming mode
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
 def send_query(config, prompt, conversation_id=None, attachment=None, proxy=None, debug=False):
     """Send a one-off query to Claude and return the response."""
-    cookie = config.get('cookie')
-    claude = EnhancedClient(cookie, proxy=proxy, debug=debug)
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
     
-    # Create a new conversation if needed
+    # Take a pre-created conversation from the pool, or create a new one if needed
     if not conversation_id:
-        conversation = claude.create_new_chat()
-        if 'error' in conversation:
-            console.print(f"[bold red]Error creating conversation:[/] {conversation['error']}")
-            sys.exit(1)
-        conversation_id = conversation['uuid']
-        if debug:
-            console.print(f"[dim]Created new conversation: {conversation_id}[/]")
+        pool = ConversationPool(config, debug=debug)
+        conversation_id = pool.take(claude.organization_id)
+        if not conversation_id:
+            conversation = claude.create_new_chat()
+            if 'error' in conversation:
+                console.print(f"[bold red]Error creating conversation:[/] {conversation['error']}")
+                sys.exit(1)
+            conversation_id = conversation.uuid
+            if debug:
+                console.print(f"[dim]Created new conversation: {conversation_id}[/]")
+        pool.refill_in_background(claude)
     else:
         # Verify the conversation exists
         try:
             conversations = claude.list_all_conversations()
-            ids = [conv['uuid'] for conv in conversations]
+            ids = [conv.uuid for conv in conversations]
             if conversation_id not in ids:
                 console.print(f"[bold red]Error:[/] Conversation ID '{conversation_id}' not found.")
                 sys.exit(1)
@@ -41,7 +54,8 @@ def send_query(config, prompt, conversation_id=None, attachment=None, proxy=None
         
         if attachment:
             if debug:
-                console.print(f"[dim]With attachment: {attachment}[/]")
+                names = attachment if isinstance(attachment, str) else ", ".join(attachment)
+                console.print(f"[dim]With attachment: {names}[/]")
             response = claude.send_message(prompt, conversation_id, attachment=attachment)
         else:
             response = claude.send_message(prompt, conversation_id)
@@ -60,12 +74,21 @@ def send_query(config, prompt, conversation_id=None, attachment=None, proxy=None
                 model = response["meta"].get("model", "unknown")
                 endpoint = response["meta"].get("endpoint", "unknown")
                 chars = response["meta"].get("characters", 0)
+                reads = claude.coalescing_stats
+                hedges = claude.hedge_stats
+                hedge_info = ""
+                if hedges is not None:
+                    hedge_info = (f"\nHedging: {hedges['hedged']} of {hedges['requests']} reads hedged, "
+                                  f"{hedges['hedge_wins']} won by the hedge")
                 
                 console.print(Panel(
                     f"Response time: {response_time:.2f}s\n"
                     f"Model: {model}\n"
                     f"Endpoint: {endpoint}\n"
-                    f"Characters: {chars}",
+                    f"Characters: {chars}\n"
+                    f"Reads: {reads['calls']} calls, {reads['upstream']} upstream, "
+                    f"{reads['coalesced']} coalesced, {reads['cache_hits']} cached"
+                    f"{hedge_info}",
                     title="Response Info", 
                     expand=False
                 ))
@@ -76,4 +99,86 @@ def send_query(config, prompt, conversation_id=None, attachment=None, proxy=None
             return response
     except Exception as e:
         console.print(f"[bold red]Error:[/] {str(e)}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
+
+def stream_query(config, prompt, conversation_id=None, attachment=None, proxy=None, debug=False, ndjson=False):
+    """
+    Stream a one-off query straight to stdout for use in shell pipelines.
+
+    Text deltas (or NDJSON events when ndjson is set) go to stdout as they
+    arrive; all status output goes to stderr. Returns the process exit code.
+    """
+    out = sys.stdout
+    status = Console(stderr=True)
+    start_time = time.time()
+    first_token = []
+
+    def emit(event):
+        event["t"] = round(time.time() - start_time, 4)
+        out.write(fastjson.dumps(event) + "\n")
+        out.flush()
+
+    def on_text(text):
+        if not first_token:
+            first_token.append(time.time() - start_time)
+        if ndjson:
+            emit({"type": "delta", "text": text})
+        else:
+            out.write(text)
+            out.flush()
+
+    def fail(message):
+        if ndjson:
+            emit({"type": "error", "message": message})
+        status.print(f"[bold red]Error:[/] {message}")
+        return EXIT_ERROR
+
+    # Keep the client's debug output away from the data on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
+
+            if not conversation_id:
+                pool = ConversationPool(config, debug=debug)
+                conversation_id = pool.take(claude.organization_id)
+                if not conversation_id:
+                    conversation = claude.create_new_chat()
+                    if 'error' in conversation:
+                        return fail(f"Error creating conversation: {conversation['error']}")
+                    conversation_id = conversation.uuid
+                pool.refill_in_background(claude)
+            if debug:
+                status.print(f"[dim]Using conversation: {conversation_id}[/]")
+            if ndjson:
+                emit({"type": "start", "conversation_id": conversation_id})
+
+            response = claude.send_message(prompt, conversation_id, attachment=attachment, on_text=on_text)
+        except KeyboardInterrupt:
+            status.print("[yellow]Interrupted[/]")
+            return EXIT_INTERRUPTED
+        except Exception as e:
+            return fail(str(e))
+
+    if isinstance(response, str):
+        # The client's error strings carry their own "Error: " prefix
+        return fail(response[len("Error: "):] if response.startswith("Error: ") else response)
+    if response["meta"].get("error"):
+        return fail(response["text"])
+
+    meta = response["meta"]
+    if ndjson:
+        emit({
+            "type": "done",
+            "conversation_id": conversation_id,
+            "characters": meta.get("characters", 0),
+            "first_token_seconds": round(first_token[0], 4) if first_token else None,
+            "response_time_seconds": meta.get("response_time_seconds")
+        })
+    elif not response["text"].endswith("\n"):
+        out.write("\n")
+        out.flush()
+
+    if debug:
+        status.print(f"[dim]Response time: {meta.get('response_time_seconds', 0):.2f}s, "
+                     f"{meta.get('characters', 0)} characters[/]")
+    return EXIT_OK
@@ -0,0 +1,243 @@
+from claude_cli.utils.stub import STUB_ORGANIZATION_ID, StubServer
+from claude_cli.utils.transport import BACKENDS
+from rich.console import Console
+from rich.table import Table
+from rich import box
+import contextlib
+import csv
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+console = Console()
+
+OPERATIONS = ("send_message", "upload_attachment", "list", "history")
+
+# Growth between the first and last quarter of the run that counts as a leak
+DEFAULT_THRESHOLDS = {"rss_mib": 20.0, "fds": 10, "threads": 5, "connections": 5}
+# A run fails when more than this fraction of its operations failed
+DEFAULT_MAX_ERROR_RATE = 0.01
+
+_TCP_ESTABLISHED = "01"
+
+
+def _workload(base_url, backend, concurrency, deadline, cache_ttl, counters):
+    """
+    Run the client workload until deadline; runs in a child process so that
+    the parent can measure it from the outside.
+    """
+    # Imported here so the client's state files resolve under the child's HOME
+    from claude_cli.utils.client import EnhancedClient
+    from claude_cli.utils.transport import RebaseTransport
+    from concurrent.futures import ThreadPoolExecutor
+
+    claude = EnhancedClient("sessionKey=soak", transport=RebaseTransport(BACKENDS[backend](), base_url),
+                            organization_id=STUB_ORGANIZATION_ID, cache_ttl=cache_ttl, metrics=False)
+    # Inside the temporary HOME, which the parent removes however this process ends
+    attachment = os.path.join(os.path.expanduser("~"), "attachment.pdf")
+    with open(attachment, "wb") as f:
+        f.write(os.urandom(64 * 1024))
+    conversation_ids = [conv.uuid for conv in claude.list_all_conversations()]
+
+    def run(worker):
+        # Each worker cycles through every operation, starting at a different one
+        i = worker
+        while time.time() < deadline:
+            op = i % len(OPERATIONS)
+            conversation_id = conversation_ids[(i * 7 + worker) % len(conversation_ids)]
+            try:
+                if op == 0:
+                    response = claude.send_message("soak", conversation_id)
+                    ok = isinstance(response, dict) and not response["meta"].get("error")
+                elif op == 1:
+                    ok = bool(claude.upload_attachment(attachment))
+                elif op == 2:
+                    ok = bool(claude.list_all_conversations())
+                else:
+                    ok = "error" not in claude.chat_conversation_history(conversation_id)
+            except Exception:
+                ok = False
+            with counters.get_lock():
+                counters[op] += 1
+                if not ok:
+                    counters[len(OPERATIONS)] += 1
+            i += 1
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="soak") as executor:
+        list(executor.map(run, range(concurrency)))
+    claude.transport.close()
+
+
+def _socket_inodes(pid):
+    """Count open file descriptors and collect the inodes of the sockets among them."""
+    fd_dir = f"/proc/{pid}/fd"
+    fds = 0
+    inodes = set()
+    for fd in os.listdir(fd_dir):
+        try:
+            target = os.readlink(os.path.join(fd_dir, fd))
+        except OSError:
+            continue
+        fds += 1
+        if target.startswith("socket:["):
+            inodes.add(target[8:-1])
+    return fds, inodes
+
+
+def _connections(inodes, port):
+    """How many of the given sockets are established TCP connections to port."""
+    count = 0
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    remote_port = int(fields[2].rsplit(":", 1)[1], 16)
+                    if remote_port == port and fields[3] == _TCP_ESTABLISHED and fields[9] in inodes:
+                        count += 1
+        except OSError:
+            pass
+    return count
+
+
+def sample_process(pid, port):
+    """Measure a live process through /proc: RSS, open FDs, threads and connections to port."""
+    rss_kib = threads = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss_kib = int(line.split()[1])
+            elif line.startswith("Threads:"):
+                threads = int(line.split()[1])
+    fds, inodes = _socket_inodes(pid)
+    return {"rss_mib": rss_kib / 1024, "fds": fds, "threads": threads, "connections": _connections(inodes, port)}
+
+
+def find_leaks(samples, thresholds, warmup=0.1):
+    """
+    Compare the first and last quarter of the samples taken after warmup
+    (a fraction of the run). A metric leaks when the medians of the four
+    quarters never go down and the last exceeds the first by more than its
+    threshold. Returns {metric: (first median, last median, leaked)}.
+    """
+    samples = samples[int(len(samples) * warmup):]
+    results = {}
+    if len(samples) < 4:
+        return results
+    quarter = len(samples) // 4
+    for metric, threshold in thresholds.items():
+        medians = [statistics.median(sample[metric] for sample in samples[i * quarter:(i + 1) * quarter])
+                   for i in range(4)]
+        monotonic = all(later >= earlier for earlier, later in zip(medians, medians[1:]))
+        results[metric] = (medians[0], medians[-1], monotonic and medians[-1] - medians[0] > threshold)
+    return results
+
+
+@contextlib.contextmanager
+def _home(path):
+    """Point HOME at path while a child process is started, so it gets its own config directory."""
+    saved = os.environ.get("HOME")
+    os.environ["HOME"] = path
+    try:
+        yield
+    finally:
+        if saved is None:
+            del os.environ["HOME"]
+        else:
+            os.environ["HOME"] = saved
+
+
+def soak_test(duration=3600, sample_interval=10, concurrency=4, backend="curl", cache_ttl=1, events=50,
+              event_delay=0.002, thresholds=None, max_error_rate=DEFAULT_MAX_ERROR_RATE, csv_path=None):
+    """
+    Run send/upload/list/history calls against a local stub for duration
+    seconds and watch the client process for resource leaks.
+
+    The workload runs in a child process with its own HOME, so the user's
+    config, index and metrics are untouched, and it is measured from the
+    outside through /proc (Linux only). Returns True when no leak was found
+    and at most max_error_rate of the operations failed.
+    """
+    if not os.path.isdir("/proc/self/fd"):
+        console.print("[bold red]Error:[/] The soak test samples processes through /proc, which needs Linux.")
+        return False
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    spawn = multiprocessing.get_context("spawn")
+    counters = spawn.Array("q", len(OPERATIONS) + 1)
+    samples = []
+
+    with StubServer(conversations=50, events=events, event_delay=event_delay) as stub, \
+            tempfile.TemporaryDirectory(prefix="claude-soak-home-") as home:
+        port = int(stub.url.rsplit(":", 1)[1])
+        deadline = time.time() + duration
+        child = spawn.Process(target=_workload, name="claude-soak",
+                              args=(stub.url, backend, concurrency, deadline, cache_ttl, counters))
+        with _home(home):
+            child.start()
+        console.print(f"[bold]Soaking {backend} client (pid {child.pid}) for {duration:.0f}s "
+                      f"with {concurrency} workers[/] [dim](Ctrl+C to stop early)[/]")
+        console.print(f"[dim]{'elapsed':>8} {'RSS MiB':>8} {'FDs':>5} {'threads':>7} {'conns':>5} "
+                      f"{'ops':>8} {'errors':>6}[/]")
+        started = time.time()
+        try:
+            while child.is_alive():
+                child.join(sample_interval)
+                if not child.is_alive():
+                    break
+                try:
+                    sample = sample_process(child.pid, port)
+                except OSError:
+                    break
+                sample["elapsed"] = time.time() - started
+                with counters.get_lock():
+                    sample["ops"] = sum(counters[:len(OPERATIONS)])
+                    sample["errors"] = counters[len(OPERATIONS)]
+                samples.append(sample)
+                console.print(f"{sample['elapsed']:8.0f} {sample['rss_mib']:8.1f} {sample['fds']:5} "
+                              f"{sample['threads']:7} {sample['connections']:5} {sample['ops']:8} "
+                              f"{sample['errors']:6}", highlight=False)
+        except KeyboardInterrupt:
+            console.print("[yellow]Stopping early...[/]")
+            child.terminate()
+        child.join()
+
+    if csv_path and samples:
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[*samples[0]])
+            writer.writeheader()
+            writer.writerows(samples)
+
+    return _report(samples, thresholds, max_error_rate, counters, child.exitcode)
+
+
+def _report(samples, thresholds, max_error_rate, counters, exitcode):
+    leaks = find_leaks(samples, thresholds)
+    table = Table(title="Soak test", box=box.ROUNDED)
+    for column in ("Metric", "Start", "End", "Allowed growth", "Result"):
+        table.add_column(column, justify="left" if column == "Metric" else "right")
+    for metric, (first, last, leaked) in leaks.items():
+        table.add_row(metric, f"{first:.1f}", f"{last:.1f}", f"{thresholds[metric]}",
+                      "[bold red]LEAK[/]" if leaked else "[green]ok[/]")
+    console.print(table)
+
+    counts = ", ".join(f"{counters[i]} {op}" for i, op in enumerate(OPERATIONS))
+    operations = sum(counters[:len(OPERATIONS)])
+    errors = counters[len(OPERATIONS)]
+    error_rate = errors / operations if operations else 0.0
+    console.print(f"Operations: {counts}; {errors} errors ({error_rate:.2%})")
+    if not operations:
+        console.print("[bold red]No operation completed.[/]")
+        return False
+    if error_rate > max_error_rate:
+        console.print(f"[bold red]{error_rate:.2%} of operations failed (allowed: {max_error_rate:.2%}).[/]")
+        return False
+    if not leaks:
+        console.print("[yellow]Too few samples to judge; run longer or sample more often.[/]")
+        return False
+    if exitcode not in (0, None, -15):
+        console.print(f"[bold red]The workload process exited with code {exitcode}.[/]")
+        return False
+    return not any(leaked for _, _, leaked in leaks.values())
@@ -0,0 +1,89 @@
+from claude_cli.utils.metrics import MetricsStore, percentile
+from rich.console import Console
+from rich.table import Table
+from rich import box
+import datetime
+import re
+import sys
+import time
+
+console = Console()
+
+_DURATION_RE = re.compile(r"^(\d+)([smhdw])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+PERIODS = {"hour": 3600, "day": 86400}
+
+
+def parse_duration(text):
+    """Turn '90s', '30m', '24h', '7d' or '2w' into seconds; 'all' gives None."""
+    if text == "all":
+        return None
+    match = _DURATION_RE.match(text.strip().lower())
+    if not match:
+        raise ValueError(f"Invalid duration '{text}'. Use e.g. 90s, 30m, 24h, 7d, 2w or all.")
+    return int(match.group(1)) * _UNITS[match.group(2)]
+
+
+def _format_seconds(seconds):
+    if seconds is None:
+        return "-"
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    return f"{seconds:.2f} s"
+
+
+def _format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def show_stats(since="24h", by=None):
+    """Print latency percentiles, throughput and error rates per operation."""
+    try:
+        window = parse_duration(since)
+    except ValueError as e:
+        console.print(f"[bold red]Error:[/] {str(e)}")
+        sys.exit(2)
+
+    period = PERIODS.get(by)
+    summary = MetricsStore().summarize(since=time.time() - window if window else None, period=period)
+    if not summary:
+        console.print(f"[yellow]No requests recorded {'in the last ' + since if window else 'yet'}.[/]")
+        return
+
+    title = f"Request metrics ({'last ' + since if window else 'all time'})"
+    table = Table(title=title, box=box.ROUNDED)
+    if period:
+        table.add_column("Period (UTC)", style="dim")
+    table.add_column("Operation", style="cyan")
+    for column in ("Requests", "Errors", "Retries", "p50", "p90", "p99", "First text p50", "Chars/s", "Data"):
+        table.add_column(column, justify="right")
+
+    for (start, op), slot in sorted(summary.items(), key=lambda item: (item[0][0] or 0, item[0][1])):
+        count = slot.get("count", 0)
+        errors = slot.get("errors", 0)
+        latency = slot.get("latency", {})
+        first_byte = slot.get("first_byte", {})
+        busy = slot.get("busy_seconds", 0)
+        row = []
+        if period:
+            moment = datetime.datetime.fromtimestamp(start, datetime.timezone.utc)
+            row.append(moment.strftime("%Y-%m-%d %H:00" if by == "hour" else "%Y-%m-%d"))
+        row += [
+            op,
+            str(count),
+            f"{100 * errors / count:.1f}%" if count else "-",
+            str(slot.get("retries", 0)),
+            _format_seconds(percentile(latency, 50)),
+            _format_seconds(percentile(latency, 90)),
+            _format_seconds(percentile(latency, 99)),
+            _format_seconds(percentile(first_byte, 50)),
+            f"{slot.get('chars', 0) / busy:.0f}" if busy else "-",
+            _format_bytes(slot.get("bytes", 0))
+        ]
+        table.add_row(*row)
+
+    console.print(table)
+    console.print("[dim]Percentiles come from fixed histogram buckets and are accurate to about 12%.[/]")
@@ -0,0 +1,269 @@
+from claude_cli.commands.chat import new_conversation_id
+from claude_cli.utils.client import CancelToken, EnhancedClient
+from claude_cli.utils.pool import ConversationPool
+from rich.console import Console
+import difflib
+import hashlib
+import os
+import sys
+import threading
+import time
+
+console = Console()
+
+DIFF_PROMPT = """The file {name} has changed since my last message. Here are the changes as a unified diff:
+
+```diff
+{diff}```"""
+
+UPLOAD_PROMPT = "I've attached the new version of {names}."
+
+FOLLOW_UP_PROMPT = "Taking the changes into account, answer again: {prompt}"
+
+
+class WatchedFile:
+    """One attachment, with what was last seen on disk and what was last sent."""
+
+    __slots__ = ("path", "signature", "digest", "text", "sending")
+
+    def __init__(self, path):
+        self.path = path
+        self.signature = _signature(path)
+        # Content of the version the conversation has seen, None while that isn't known
+        self.digest = None
+        self.text = None
+        # (digest, text) of the version the current reply is sending, until it is known to have arrived
+        self.sending = None
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+
+def _signature(path):
+    """Cheap change check: (inode, size, mtime), or None while the file is missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def _read(path):
+    """Return (sha256 digest, text or None for binary files)."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    try:
+        text = data.decode('utf-8')
+    except UnicodeDecodeError:
+        text = None
+    return hashlib.sha256(data).hexdigest(), text
+
+
+def make_diff(watched, new_text, max_diff_lines):
+    """A unified diff from the sent version to new_text, or None if it is too big to be worth sending."""
+    if watched.text is None or new_text is None:
+        return None
+    diff = [*difflib.unified_diff(watched.text.splitlines(True), new_text.splitlines(True),
+                                  fromfile=f"a/{watched.name}", tofile=f"b/{watched.name}")]
+    if len(diff) > max_diff_lines:
+        return None
+    diff = "".join(line if line.endswith("\n") else line + "\n" for line in diff)
+    # Past half the file's size, the new version is cheaper to read than the diff
+    if len(diff) > len(new_text) / 2:
+        return None
+    return diff
+
+
+class Reply:
+    """A streaming reply running on a worker thread, which can be superseded."""
+
+    def __init__(self, claude, prompt, conversation_id, attachment, debug, sending):
+        self.cancel = CancelToken()
+        self.response = None
+        # The files whose content the message carries
+        self.sending = sending
+        for watched, digest, text in sending:
+            watched.sending = digest, text
+        self._started = time.perf_counter()
+        self._debug = debug
+        self._thread = threading.Thread(target=self._run, args=(claude, prompt, conversation_id, attachment),
+                                        name="watch-reply", daemon=True)
+        self._thread.start()
+
+    def _run(self, claude, prompt, conversation_id, attachment):
+        def on_text(text):
+            if not self.cancel.cancelled:
+                console.print(text, end="", markup=False, highlight=False, soft_wrap=True)
+
+        try:
+            self.response = claude.send_message(prompt, conversation_id, attachment=attachment,
+                                                on_text=on_text, cancel=self.cancel)
+        except Exception as e:
+            self.response = f"Error: {str(e)}"
+        self._report()
+
+    def _report(self):
+        response = self.response
+        if isinstance(response, str):
+            console.print(f"\n[bold red]{response}[/]")
+            return
+        meta = response.get("meta", {})
+        if meta.get("cancelled"):
+            console.print("\n[yellow](Superseded by a newer change)[/]")
+            return
+        if meta.get("error"):
+            console.print(f"\n[bold red]Error:[/] {response['text']}")
+        else:
+            console.print()
+            if self._debug:
+                console.print(f"[dim]Answered in {time.perf_counter() - self._started:.2f}s, "
+                              f"{meta.get('characters', 0)} characters[/]")
+        console.print("[dim]Watching for changes...[/]")
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    @property
+    def delivered(self):
+        """Whether the message is known to have reached the conversation."""
+        response = self.response
+        return isinstance(response, dict) and bool(response.get("meta", {}).get("delivered"))
+
+    def settle(self):
+        """
+        Once the reply has finished, mark the files it sent as seen if the
+        message was delivered, or as unknown (so they are re-uploaded whole)
+        if it may not have been. Returns whether it was delivered.
+        """
+        for watched, digest, text in self.sending:
+            if self.delivered:
+                watched.digest, watched.text = digest, text
+            else:
+                watched.digest = watched.text = None
+            watched.sending = None
+        self.sending = []
+        return self.delivered
+
+    def supersede(self):
+        """Cancel the reply (if it is still streaming) and wait for its thread."""
+        self.cancel.cancel()
+        self._thread.join()
+
+
+def watch_files(config, prompt, paths, conversation_id=None, debounce=0.5, interval=0.25, max_diff_lines=200,
+                proxy=None, debug=False):
+    """
+    Answer prompt about the given files, then answer again whenever they change.
+
+    Files are polled with os.stat every interval seconds; a burst of saves
+    is handled once the files have been quiet for debounce seconds. Files
+    whose content hash hasn't changed are skipped. Small changes to text
+    files are sent as a diff into the same conversation, anything else is
+    re-uploaded. A newer change cancels a reply that is still streaming.
+    """
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        console.print(f"[bold red]Error:[/] File(s) not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    claude = EnhancedClient.from_config(config, proxy=proxy, debug=debug)
+    if conversation_id:
+        if conversation_id not in [conv.uuid for conv in claude.list_all_conversations()]:
+            console.print(f"[bold red]Error:[/] Conversation ID '{conversation_id}' not found.")
+            sys.exit(1)
+    else:
+        conversation_id = new_conversation_id(claude, ConversationPool(config, debug=debug))
+    if debug:
+        console.print(f"[dim]Using conversation: {conversation_id}[/]")
+
+    files = [WatchedFile(path) for path in paths]
+    names = ", ".join(watched.name for watched in files)
+    console.print(f"[bold]Watching {names}[/] [dim](Ctrl+C to stop)[/]")
+    reply = Reply(claude, prompt, conversation_id, [watched.path for watched in files], debug,
+                  [(watched, *_read(watched.path)) for watched in files])
+    # Whether a message carrying the prompt has been delivered yet
+    asked = False
+
+    pending = set()
+    last_change = 0
+    try:
+        while True:
+            time.sleep(interval)
+            if not reply.running and reply.settle():
+                asked = True
+            now = time.monotonic()
+            for watched in files:
+                signature = _signature(watched.path)
+                if signature != watched.signature:
+                    watched.signature = signature
+                    pending.add(watched)
+                    last_change = now
+            if not pending or now - last_change < debounce:
+                continue
+
+            changed = _collect_changes(pending, debug)
+            pending.clear()
+            if not changed:
+                continue
+            if reply.running:
+                reply.supersede()
+            if reply.settle():
+                asked = True
+            message, uploads, sending = _follow_up(prompt, files, asked, max_diff_lines)
+            if not sending:
+                continue
+            console.rule(f"[cyan]{', '.join(watched.name for watched in changed)} changed[/]")
+            reply = Reply(claude, message, conversation_id, uploads or None, debug, sending)
+    except KeyboardInterrupt:
+        reply.cancel.cancel()
+        console.print("\n[bold]Stopped watching.[/]")
+
+
+def _collect_changes(pending, debug):
+    """Return the pending files whose content differs from the version last sent."""
+    changed = []
+    for watched in sorted(pending, key=lambda watched: watched.path):
+        try:
+            digest, _ = _read(watched.path)
+        except OSError:
+            console.print(f"[yellow]{watched.name} disappeared; waiting for it to come back[/]")
+            continue
+        if digest == (watched.sending[0] if watched.sending else watched.digest):
+            if debug:
+                console.print(f"[dim]{watched.name} was saved without changes; skipped[/]")
+            continue
+        changed.append(watched)
+    return changed
+
+
+def _follow_up(prompt, files, asked, max_diff_lines):
+    """
+    Build the next message: every file the conversation hasn't seen the
+    current version of, as a diff or a re-upload. Until the prompt itself
+    has been delivered, it is asked again with all the files attached.
+    Returns (message, paths to upload, (file, digest, text) for each file sent).
+    """
+    sections = []
+    uploads = []
+    sending = []
+    for watched in files:
+        try:
+            digest, text = _read(watched.path)
+        except OSError:
+            continue
+        if digest == watched.digest:
+            continue
+        diff = make_diff(watched, text, max_diff_lines) if asked else None
+        if diff is not None:
+            sections.append(DIFF_PROMPT.format(name=watched.name, diff=diff))
+        else:
+            uploads.append(watched.path)
+        sending.append((watched, digest, text))
+    if not asked:
+        return prompt, uploads, sending
+    if uploads:
+        sections.append(UPLOAD_PROMPT.format(names=", ".join(os.path.basename(path) for path in uploads)))
+    sections.append(FOLLOW_UP_PROMPT.format(prompt=prompt))
+    return "\n\n".join(sections), uploads, sending
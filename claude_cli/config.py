@@ -1,9 +1,15 @@
 import os
-import yaml
+from contextlib import contextmanager
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 CONFIG_DIR = os.path.expanduser("~/.config/claude-cli")
 CONFIG_PATH = os.path.join(CONFIG_DIR, "config.yaml")
+LOCK_PATH = os.path.join(CONFIG_DIR, "config.lock")
 
 def ensure_config_dir():
     """Ensure the config directory exists"""
@@ -16,6 +22,8 @@ def load_config():
     if not os.path.exists(CONFIG_PATH):
         return {}
     
+    # Imported here so that shell completion, which never reads the config, starts fast
+    import yaml
     try:
         with open(CONFIG_PATH, 'r') as f:
             return yaml.safe_load(f) or {}
@@ -24,10 +32,35 @@ def load_config():
 
 def save_config(config):
     """Save configuration to file"""
+    import yaml
     ensure_config_dir()
     
-    with open(CONFIG_PATH, 'w') as f:
+    # Write a copy and swap it in, so a reader never sees a half-written file
+    tmp_path = f"{CONFIG_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
         yaml.dump(config, f)
+    os.replace(tmp_path, CONFIG_PATH)
+
+@contextmanager
+def config_lock(path=LOCK_PATH):
+    """Hold an exclusive lock shared by all claude processes (no-op where flock is unavailable)"""
+    ensure_config_dir()
+    with open(path, 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def update_config(func):
+    """Apply func to the latest saved config under the config lock and save it"""
+    with config_lock():
+        config = load_config()
+        result = func(config)
+        save_config(config)
+    return result
 
 def get_cookie():
     """Get the Claude cookie from config or environment variable"""
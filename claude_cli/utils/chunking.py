@@ -0,0 +1,71 @@
+"""
+Splitting large texts into overlapping chunks along natural boundaries
+"""
+import re
+
+_PARAGRAPH_RE = re.compile(r"(?<=\n)[ \t]*\n")
+
+
+def _units(text, size):
+    """
+    Break text into pieces no longer than size: paragraphs where possible,
+    then lines, then hard cuts for lines that are longer than size on their own.
+    """
+    for paragraph in _split_keep(text, _PARAGRAPH_RE):
+        if len(paragraph) <= size:
+            yield paragraph
+            continue
+        for line in paragraph.splitlines(keepends=True):
+            if len(line) <= size:
+                yield line
+                continue
+            for start in range(0, len(line), size):
+                yield line[start:start + size]
+
+
+def _split_keep(text, pattern):
+    """Split text after each match of pattern, keeping the separators."""
+    start = 0
+    for match in pattern.finditer(text):
+        yield text[start:match.end()]
+        start = match.end()
+    if start < len(text):
+        yield text[start:]
+
+
+def split_into_chunks(text, size=30000, overlap=500):
+    """
+    Split text into chunks of at most size characters, breaking at paragraph
+    or line boundaries, each starting with up to overlap characters from the
+    end of the previous chunk so nothing is lost at a cut.
+    """
+    if size <= 0:
+        raise ValueError("Chunk size must be positive")
+    overlap = max(0, min(overlap, size // 2))
+
+    chunks = []
+    current, length = [], 0
+    for unit in _units(text, size):
+        if current and length + len(unit) > size:
+            chunks.append("".join(current))
+            # Carry trailing units over as the overlap
+            carried, carried_length = [], 0
+            for previous in reversed(current):
+                if carried_length + len(previous) > overlap:
+                    # Too long to carry whole (a long paragraph): carry its last lines instead
+                    for line in reversed(previous.splitlines(keepends=True)):
+                        if carried_length + len(line) > overlap:
+                            break
+                        carried.insert(0, line)
+                        carried_length += len(line)
+                    break
+                carried.insert(0, previous)
+                carried_length += len(previous)
+            if carried_length + len(unit) > size:
+                carried, carried_length = [], 0
+            current, length = carried, carried_length
+        current.append(unit)
+        length += len(unit)
+    if current:
+        chunks.append("".join(current))
+    return chunks
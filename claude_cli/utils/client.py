@@ -1,21 +1,79 @@
 """
 Enhanced Claude Client with proxy support and improved error handling
 """
+import hashlib
 import json
 import os
+import queue
 import uuid
 import re
-from curl_cffi import requests
-import requests as req
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from claude_cli.config import update_config
+from claude_cli.utils.hedge import HedgedTransport, _discard
+from claude_cli.utils import images
+from claude_cli.utils import index as conversation_index
+from claude_cli.utils import fastjson
+from claude_cli.utils import tracing
+from claude_cli.utils.metrics import MetricsStore
+from claude_cli.utils.models import Attachment, Conversation
+from claude_cli.utils.profiling import phase
+from claude_cli.utils.ratelimit import RateLimiter
+from claude_cli.utils.singleflight import SingleFlight
+from claude_cli.utils.strategy import FAILURE_STATUSES, StrategyRegistry
+from claude_cli.utils.transport import ReplayTransport, build_transport, recorded
+
+# Default connect, first-byte and inter-chunk idle timeouts for completions (seconds)
+DEFAULT_TIMEOUTS = {"connect": 10, "first_byte": 120, "idle": 60}
+
+_END_OF_STREAM = object()
+
+# Returned by _cancellable when the call was abandoned
+_CANCELLED = object()
+
+# Bytes handed to the JSON decoder at a time when reading listings and histories
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class CancelToken:
+    """Handle for aborting an in-progress completion from another thread."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+
+def cookie_fingerprint(cookie):
+    """Short digest identifying a cookie without storing it twice."""
+    return hashlib.sha256((cookie or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _names_conversation(message, conversation_id):
+    """Whether a not_found_error message is about the conversation rather than the endpoint."""
+    message = str(message or "")
+    return conversation_id in message or "conversation" in message.lower()
 
 
 class EnhancedClient:
     """
     An enhanced version of the Claude API client with proxy support
     and more robust error handling.
+
+    A single client may be shared between threads: each thread gets its own
+    HTTP sessions (connection pools), and shared state is updated under a lock.
     """
 
-    def __init__(self, cookie, proxy=None, debug=False):
+    def __init__(self, cookie, proxy=None, debug=False, cache_ttl=0, rate_limits=None, timeouts=None,
+                 transport=None, hedging=None, hedge_proxies=None, organization_id=None, image_options=None,
+                 metrics=True):
         """
         Initialize the client with cookie and optional proxy.
         
@@ -23,14 +81,128 @@ class EnhancedClient:
             cookie (str): Claude AI cookie
             proxy (str, optional): Proxy URL (e.g., "socks5://127.0.0.1:1080")
             debug (bool, optional): Whether to output debug information
+            cache_ttl (float, optional): Seconds to reuse results of identical reads
+            rate_limits (dict, optional): Token-bucket limits per operation class,
+                e.g. {"completion": {"rate": 0.5, "burst": 2}}
+            timeouts (dict, optional): Completion timeouts in seconds, keyed by
+                "connect", "first_byte" and "idle"
+            transport (Transport or str, optional): HTTP transport instance or
+                backend name ("curl", "httpx", "requests"); defaults to curl_cffi,
+                or a record/replay cassette when CLAUDE_RECORD/CLAUDE_REPLAY is set
+            hedging (dict or bool, optional): Re-send slow reads and take the first
+                answer; True for the defaults or HedgedTransport options, e.g.
+                {"percentile": 95, "budget": 0.1}
+            hedge_proxies (list, optional): Proxy URLs to send hedged reads through
+            organization_id (str, optional): Known organization ID for this cookie,
+                which saves fetching it
+            image_options (dict or bool, optional): Downscale and recompress images
+                before upload; True for the defaults or prepare_image options, e.g.
+                {"max_dimension": 1568, "quality": 85, "max_bytes": 1000000}
+            metrics (MetricsStore or bool, optional): Where to record request
+                latencies for `claude stats`; False to record nothing
         """
         self.cookie = cookie
         self.proxy = proxy
         self.debug = debug
-        self.organization_id = self.get_organization_id()
+        # Identical concurrent reads share one upstream request
+        self._flight = SingleFlight(ttl=cache_ttl)
+        self._limiter = RateLimiter(rate_limits) if rate_limits else None
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.image_options = image_options
+        if metrics is True:
+            metrics = MetricsStore()
+        self.metrics = metrics or None
+        self._strategies = StrategyRegistry()
+        backend = transport if isinstance(transport, str) else None
+        hedged = bool(hedging or hedge_proxies)
+        built = transport is None or isinstance(transport, str)
+        if built:
+            # A hedged transport is recorded as a whole, so a hedged read is recorded once, not per copy
+            transport = build_transport(proxy, backend=backend, record=not hedged)
+        self._hedge = None
+        # Replays must stay deterministic, so they are never hedged
+        if hedged and not isinstance(transport, ReplayTransport):
+            options = hedging if isinstance(hedging, dict) else {}
+            alternates = [build_transport(hedge_proxy, backend=backend, record=False)
+                          for hedge_proxy in hedge_proxies or []]
+            transport = self._hedge = HedgedTransport(transport, alternates=alternates, **options)
+            if built:
+                transport = recorded(transport)
+        self.transport = transport
+        self._lock = threading.RLock()
+        # Workers for calls that can be abandoned on cancel, created on first use
+        self._waiter = None
+        if not organization_id:
+            with phase("client init"):
+                organization_id = self.get_organization_id()
+        with self._lock:
+            self.organization_id = organization_id
+
+    @classmethod
+    def from_config(cls, config, proxy=None, debug=False):
+        """
+        Create a client using the cookie and tuning options from the CLI config.
+
+        The organization ID is cached in the config, tied to the cookie it was
+        looked up with, so most commands skip that request.
+        """
+        cookie = config.get('cookie')
+        fingerprint = cookie_fingerprint(cookie)
+        cached_organization_id = None
+        if config.get('organization_cookie') == fingerprint:
+            cached_organization_id = config.get('organization_id')
+
+        client = cls(
+            cookie,
+            proxy=proxy,
+            debug=debug,
+            cache_ttl=config.get('read_cache_ttl', 0),
+            rate_limits=config.get('rate_limits'),
+            timeouts=config.get('timeouts'),
+            transport=config.get('transport'),
+            hedging=config.get('hedging'),
+            hedge_proxies=config.get('hedge_proxies'),
+            organization_id=cached_organization_id,
+            image_options=config.get('image_preprocessing'),
+            metrics=config.get('metrics', True)
+        )
+
+        if client.organization_id and client.organization_id != cached_organization_id:
+            def remember(saved):
+                if saved.get('cookie') != cookie:
+                    return
+                saved['organization_id'] = client.organization_id
+                saved['organization_cookie'] = fingerprint
+            try:
+                update_config(remember)
+            except OSError:
+                pass
+        return client
+
+    def close(self):
+        """Close the HTTP sessions of every thread that used this client."""
+        if self._waiter is not None:
+            self._waiter.shutdown(wait=False)
+        self.transport.close()
+
+    @property
+    def coalescing_stats(self):
+        """Counters for read calls, upstream requests, coalesced calls and cache hits."""
+        return dict(self._flight.stats)
+
+    @property
+    def hedge_stats(self):
+        """Counters for hedgeable reads, hedges sent and hedges that won, or None when hedging is off."""
+        if self._hedge is not None:
+            with self._hedge._lock:
+                return dict(self._hedge.stats)
+        return None
 
     def get_organization_id(self):
         """Get the organization ID using the provided cookie."""
+        return self._flight.do(("organization_id",), self._fetch_organization_id)
+
+    def _fetch_organization_id(self):
         url = "https://claude.ai/api/organizations"
 
         headers = {
@@ -47,28 +219,19 @@ class EnhancedClient:
         }
 
         try:
-            if self.debug:
-                print(f"Fetching organization ID from: {url}")
+            self._note("organization", f"Fetching organization ID from: {url}")
                 
-            response = self._make_request("GET", url, headers=headers)
+            status, res = self._get_json(url, headers, "organization",
+                                         lambda chunks: fastjson.loads(b"".join(chunks)))
             
-            if response.status_code != 200:
-                error_msg = f"Failed to get organization ID: HTTP {response.status_code}"
-                try:
-                    error_data = json.loads(response.content)
-                    if 'error' in error_data:
-                        error_msg += f" - {error_data['error'].get('message', '')}"
-                except:
-                    pass
-                raise Exception(error_msg)
-                
-            res = json.loads(response.text)
+            if status != 200:
+                raise Exception(f"Failed to get organization ID: HTTP {status}{res}")
+
             if not res or len(res) == 0:
                 raise Exception("No organizations found. Your cookie may be invalid or expired.")
             uuid = res[0]['uuid']
             
-            if self.debug:
-                print(f"Successfully retrieved organization ID: {uuid}")
+            self._note("organization_ok", f"Successfully retrieved organization ID: {uuid}")
                 
             return uuid
         except json.JSONDecodeError:
@@ -101,7 +264,10 @@ class EnhancedClient:
             return 'application/octet-stream'
 
     def list_all_conversations(self):
-        """List all conversations from Claude AI."""
+        """List all conversations from Claude AI as Conversation objects."""
+        return list(self._flight.do(("conversations",), self._fetch_conversations))
+
+    def _fetch_conversations(self):
         url = f"https://claude.ai/api/organizations/{self.organization_id}/chat_conversations"
 
         headers = {
@@ -118,19 +284,13 @@ class EnhancedClient:
         }
 
         try:
-            response = self._make_request("GET", url, headers=headers)
-            
-            if response.status_code != 200:
-                error_msg = f"Failed to list conversations: HTTP {response.status_code}"
-                try:
-                    error_data = json.loads(response.content)
-                    if 'error' in error_data:
-                        error_msg += f" - {error_data['error'].get('message', '')}"
-                except:
-                    pass
-                raise Exception(error_msg)
-            
-            return json.loads(response.text)
+            status, conversations = self._get_json(url, headers, "list", fastjson.read_conversations)
+
+            if status != 200:
+                raise Exception(f"Failed to list conversations: HTTP {status}{conversations}")
+            # Keeps shell completion of conversation IDs current without network access
+            conversation_index.save_index(conversations)
+            return conversations
         except json.JSONDecodeError:
             return []
         except Exception as e:
@@ -138,214 +298,266 @@ class EnhancedClient:
                 raise  # Re-raise connection errors directly
             raise Exception(f"Failed to list conversations: {str(e)}")
 
-    def send_message(self, prompt, conversation_id, attachment=None, timeout=500):
-        """Send a message to Claude with robust error handling."""
-        # Try different API endpoints - Claude periodically changes these
-        api_endpoints = [
-            f"https://claude.ai/api/organizations/{self.organization_id}/chat_conversations/{conversation_id}/completion"
-        ]
-        
+    def send_message(self, prompt, conversation_id, attachment=None, timeout=None, on_text=None, cancel=None,
+                     connect_timeout=None, first_byte_timeout=None, idle_timeout=None):
+        """
+        Send a message to Claude with robust error handling.
+
+        If on_text is given, it is called with each text delta as soon as it
+        arrives. The connection must be made within connect_timeout, the first
+        data must arrive within first_byte_timeout (timeout is accepted as an
+        alias), and the stream may then go quiet for at most idle_timeout.
+
+        If cancel (a CancelToken) is cancelled at any point (verifying the
+        conversation, uploading, waiting for the reply or while it streams),
+        the text received so far is returned with meta["cancelled"] set.
+        A timeout of 0 means no limit.
+        meta["delivered"] is set once the server has accepted the message.
+        """
+        stream_stats = {"attempts": 0, "bytes": 0}
+        started = time.perf_counter()
+        with tracing.span("send_message", conversation=conversation_id) as traced:
+            result = self._send_message(prompt, conversation_id, attachment, timeout, on_text, cancel,
+                                        connect_timeout, first_byte_timeout, idle_timeout, stream_stats)
+            meta = result.get("meta", {}) if isinstance(result, dict) else {}
+            traced.set(attempts=stream_stats["attempts"], bytes=stream_stats["bytes"],
+                       characters=meta.get("characters", 0), error=not isinstance(result, dict) or bool(meta.get("error")),
+                       cancelled=bool(meta.get("cancelled")))
+        if self.metrics is not None:
+            first_byte = stream_stats.get("first_byte")
+            self.metrics.record(
+                "completion",
+                latency=time.perf_counter() - started,
+                first_byte=first_byte - started if first_byte else None,
+                bytes=stream_stats["bytes"],
+                chars=meta.get("characters", 0),
+                error=not isinstance(result, dict) or bool(meta.get("error")),
+                retries=max(0, stream_stats["attempts"] - 1),
+                cancelled=bool(meta.get("cancelled"))
+            )
+        return result
+
+    def _send_message(self, prompt, conversation_id, attachment, timeout, on_text, cancel,
+                      connect_timeout, first_byte_timeout, idle_timeout, stream_stats):
+        if connect_timeout is None:
+            connect_timeout = self.timeouts["connect"]
+        if first_byte_timeout is None:
+            first_byte_timeout = self.timeouts["first_byte"] if timeout is None else timeout
+        if idle_timeout is None:
+            idle_timeout = self.timeouts["idle"]
+
         # Verify conversation exists before trying to send message
         try:
-            conversations = self.list_all_conversations()
-            conv_ids = [conv['uuid'] for conv in conversations]
+            conversations = self._cancellable(cancel, self.list_all_conversations)
+            if conversations is _CANCELLED:
+                return self._partial_result("", time.time(), None, None, cancelled=True)
+            conv_ids = [conv.uuid for conv in conversations]
             if conversation_id not in conv_ids:
                 return f"Error: Conversation ID '{conversation_id}' does not exist in your account. Please check the ID or create a new conversation."
         except Exception as e:
-            if self.debug:
-                print(f"Warning: Could not verify conversation ID: {str(e)}")
+            self._note("verify_failed", f"Warning: Could not verify conversation ID: {str(e)}")
             # Continue anyway as the ID might still be valid
 
-        # Upload attachment if provided
+        # Upload attachments if provided
         attachments = []
         if attachment:
-            attachment_response = self.upload_attachment(attachment)
-            if attachment_response:
-                attachments = [attachment_response]
-            else:
+            paths = [attachment] if isinstance(attachment, str) else attachment
+            uploaded = self._cancellable(cancel, self.upload_attachments, paths)
+            if uploaded is _CANCELLED:
+                return self._partial_result("", time.time(), None, None, cancelled=True)
+            if not all(uploaded):
                 return "Error: Invalid file format or upload failed. Please try again."
+            attachments = [attachment_response.to_dict() for attachment_response in uploaded]
 
-        # Ensure attachments is an empty list when no attachment is provided
-        if not attachment:
-            attachments = []
-
-        # Try different models if one fails - newer model names first
-        models_to_try = ["claude"]
+        # Try the endpoint/payload variant that worked last time first,
+        # skipping variants that keep failing until they are due for a probe
+        strategies = self._completion_strategies(prompt, conversation_id, attachments)
+        ordered = self._strategies.order(list(strategies))
         
         # Start the timer for response time tracking
-        import time
         start_time = time.time()
         
-        for endpoint in api_endpoints:
-            if self.debug:
-                print(f"Trying endpoint: {endpoint}")
-            for model in models_to_try:
-                # Try different payload formats
-                payloads = [
-                    # Simplified format
-                    json.dumps({
-                        "prompt": f"{prompt}",
-                        "attachments": attachments
-                    })
-                ]
-                
-                for payload_idx, payload in enumerate(payloads):
-
-                    # Freshen headers with each attempt
-                    headers = {
-                        'User-Agent':
-                        'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0',
-                        'Accept': 'text/event-stream, text/event-stream',
-                        'Accept-Language': 'en-US,en;q=0.5',
-                        'Referer': 'https://claude.ai/chats',
-                        'Content-Type': 'application/json',
-                        'Origin': 'https://claude.ai',
-                        'DNT': '1',
-                        'Connection': 'keep-alive',
-                        'Cookie': f'{self.cookie}',
-                        'Sec-Fetch-Dest': 'empty',
-                        'Sec-Fetch-Mode': 'cors',
-                        'Sec-Fetch-Site': 'same-origin',
-                        'TE': 'trailers'
-                    }
+        # Strategies that answered 400/404 to this message
+        rejected = []
+        for attempt, name in enumerate(ordered):
+            endpoint, model, payload = strategies[name]
+            is_last_attempt = attempt == len(ordered) - 1
 
-                    try:
-                        if self.debug:
-                            print(f"Trying model: {model}, payload format: {payload_idx+1}")
-                        response = self._make_request("POST", endpoint, headers=headers, data=payload, timeout=timeout)
-                        
-                        # Check for error responses first
-                        if response.status_code != 200:
-                            error_msg = f"Error from Claude API: HTTP {response.status_code}"
-                            try:
-                                error_data = json.loads(response.content)
-                                if isinstance(error_data, dict) and 'error' in error_data:
-                                    error_msg += f" - {error_data['error'].get('message', 'Unknown error')}"
-                                    
-                                    # Specific error handling
-                                    if error_data['error'].get('type') == 'not_found_error':
-                                        error_msg += "\n\nThis could mean:\n- The conversation ID doesn't exist\n- Your cookie has expired\n- The API endpoints have changed"
-                                    
-                            except Exception:
-                                pass
+            # Freshen headers with each attempt
+            headers = {
+                'User-Agent':
+                'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0',
+                'Accept': 'text/event-stream, text/event-stream',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Referer': 'https://claude.ai/chats',
+                'Content-Type': 'application/json',
+                'Origin': 'https://claude.ai',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Cookie': f'{self.cookie}',
+                'Sec-Fetch-Dest': 'empty',
+                'Sec-Fetch-Mode': 'cors',
+                'Sec-Fetch-Site': 'same-origin',
+                'TE': 'trailers'
+            }
+
+            if cancel is not None and cancel.cancelled:
+                return self._partial_result("", start_time, model, endpoint, cancelled=True)
+
+            attempt_start = time.time()
+            stream_stats["attempts"] += 1
+            with tracing.span("attempt", strategy=name, attempt=attempt + 1) as traced:
+                try:
+                    self._note("strategy", f"Trying strategy: {name} ({endpoint})", strategy=name)
+                    # curl's read timeout bounds the wait for the response headers (None: no limit)
+                    response = self._cancellable(cancel, self._make_request, "POST", endpoint, headers=headers,
+                                                 data=payload, timeout=(connect_timeout or None,
+                                                                        first_byte_timeout or None),
+                                                 stream=True, op="completion")
+                    if response is _CANCELLED:
+                        # The message may or may not have arrived, so it isn't reported as delivered
+                        self._note("cancelled", "Completion cancelled while waiting for the response")
+                        traced.set(outcome="cancelled")
+                        return self._partial_result("", start_time, model, endpoint, cancelled=True)
+                    traced.set(status=response.status_code)
+                
+                    # Check for error responses first
+                    if response.status_code != 200:
+                        error_msg = f"Error from Claude API: HTTP {response.status_code}"
+                        missing_conversation = False
+                        try:
+                            error_data = fastjson.loads(b''.join(response.iter_content()))
+                            if isinstance(error_data, dict) and 'error' in error_data:
+                                error_msg += f" - {error_data['error'].get('message', 'Unknown error')}"
                             
-                            # Continue to next payload format or model or endpoint
+                                # Specific error handling
+                                if error_data['error'].get('type') == 'not_found_error':
+                                    missing_conversation = _names_conversation(
+                                        error_data['error'].get('message'), conversation_id)
+                                    error_msg += "\n\nThis could mean:\n- The conversation ID doesn't exist\n- Your cookie has expired\n- The API endpoints have changed"
+                            
+                        except Exception:
+                            pass
+                    
+                        self._note("strategy_failed", error_msg, strategy=name, status=response.status_code)
+                        traced.set(outcome="http_error")
+                        if response.status_code in FAILURE_STATUSES and not missing_conversation:
+                            # Could be the caller's mistake rather than the strategy's: only held
+                            # against the strategy if another one then works for this message
+                            rejected.append(name)
                             continue
+                        # Rate limiting, auth and server errors would hit the other strategy too,
+                        # and after a server error the message may already have been added
+                        return {
+                            "text": error_msg,
+                            "meta": {
+                                "response_time_seconds": round(time.time() - start_time, 2),
+                                "error": True
+                            }
+                        }
+            
+                    # Process successful response
+                    self._note("strategy_ok", f"Success! Got 200 response from strategy: {name}", strategy=name)
+
+                    with phase("network"):
+                        answer, decoded_data, stopped = self._read_event_stream(
+                            response, on_text, cancel=cancel,
+                            first_byte_timeout=first_byte_timeout, idle_timeout=idle_timeout, stats=stream_stats
+                        )
+                    if stopped == "cancelled":
+                        self._note("cancelled", f"Completion cancelled after {len(answer)} chars",
+                                   characters=len(answer))
+                        traced.set(outcome="cancelled")
+                        return self._partial_result(answer, start_time, model, endpoint, cancelled=True,
+                                                    delivered=True)
+                    if stopped == "timeout":
+                        self._note("idle_timeout", f"Completion stream went idle after {len(answer)} chars",
+                                   characters=len(answer))
+                        traced.set(outcome="timeout")
+                        return self._partial_result(answer, start_time, model, endpoint, timed_out=True,
+                                                    delivered=True)
+                    if not answer:
+                        with phase("parse"):
+                            answer = self._parse_completion(decoded_data)
+                
+                    # If we still couldn't extract anything, try a more aggressive approach
+                    if not answer and decoded_data:
+                        self._note("aggressive_parse", "Trying aggressive pattern matching")
+                        # Look for anything that seems like a response
+                        patterns = [
+                            r'"completion"\s*:\s*"([^"]*)"',
+                            r'"text"\s*:\s*"([^"]*)"',
+                            r'"content"\s*:\s*"([^"]*)"',
+                            r'"delta"\s*:\s*{\s*"text"\s*:\s*"([^"]*)"'
+                        ]
                     
-                        # Process successful response
-                        if self.debug:
-                            print(f"Success! Got 200 response from endpoint: {endpoint}, model: {model}")
-                        decoded_data = response.content.decode("utf-8", errors="ignore")
-                        
-                        # Look for patterns in the response to detect format
-                        # First, check if it's a streaming response
-                        if 'data:' in decoded_data:
-                            if self.debug:
-                                print("Detected streaming response format")
-                            # More robust parsing of server-sent events
-                            completions = []
-                            for line in decoded_data.split('\n'):
-                                line = line.strip()
-                                if not line or not line.startswith('data:'):
-                                    continue
-                                    
-                                try:
-                                    json_str = line[5:].strip()
-                                    data = json.loads(json_str)
-                                    if 'completion' in data:
-                                        completions.append(data['completion'])
-                                    elif 'text' in data:  # Alternative format
-                                        completions.append(data['text'])
-                                    elif 'delta' in data and 'text' in data['delta']:  # Claude 3 format
-                                        completions.append(data['delta']['text'])
-                                except json.JSONDecodeError:
-                                    # Try to extract with regex if JSON parsing fails
-                                    completion_match = re.search(r'"completion"\s*:\s*"([^"]*)"', line)
-                                    if completion_match:
-                                        completions.append(completion_match.group(1))
-                            
-                            answer = ''.join(completions)
-                        else:
-                            # Might be a regular JSON response
-                            if self.debug:
-                                print("Detected non-streaming response format")
-                            try:
-                                data = json.loads(decoded_data)
-                                # Various possible response formats
-                                if 'completion' in data:
-                                    answer = data['completion']
-                                elif 'text' in data:
-                                    answer = data['text']
-                                elif 'content' in data:
-                                    answer = data['content']
-                                else:
-                                    # Return the whole response for debugging
-                                    answer = f"Got a 200 response but couldn't extract text. Raw data:\n\n{decoded_data[:1000]}"
-                            except json.JSONDecodeError:
-                                answer = f"Got a 200 response but couldn't parse JSON. Raw data:\n\n{decoded_data[:1000]}"
+                        for pattern in patterns:
+                            all_matches = re.findall(pattern, decoded_data)
+                            if all_matches:
+                                answer = ''.join(all_matches)
+                                break
+                    
+                    # If we got a valid response, return it!
+                    if answer and len(answer.strip()) > 0:
+                        # Calculate response time
+                        end_time = time.time()
+                        response_time = end_time - start_time
+                    
+                        self._note("answer", f"Successfully extracted answer ({len(answer)} chars)\n"
+                                             f"Response time: {response_time:.2f} seconds",
+                                   characters=len(answer), seconds=response_time)
+                        traced.set(outcome="ok")
+
+                        for failed in rejected:
+                            self._strategies.record(failed, False)
+                        self._strategies.record(name, True, end_time - attempt_start)
+                        self._flight.forget(("history", conversation_id))
                         
-                        # If we still couldn't extract anything, try a more aggressive approach
-                        if not answer and decoded_data:
-                            if self.debug:
-                                print("Trying aggressive pattern matching")
-                            # Look for anything that seems like a response
-                            patterns = [
-                                r'"completion"\s*:\s*"([^"]*)"',
-                                r'"text"\s*:\s*"([^"]*)"',
-                                r'"content"\s*:\s*"([^"]*)"',
-                                r'"delta"\s*:\s*{\s*"text"\s*:\s*"([^"]*)"'
-                            ]
-                            
-                            for pattern in patterns:
-                                all_matches = re.findall(pattern, decoded_data)
-                                if all_matches:
-                                    answer = ''.join(all_matches)
-                                    break
-                            
-                        # If we got a valid response, return it!
-                        if answer and len(answer.strip()) > 0:
-                            # Calculate response time
-                            end_time = time.time()
-                            response_time = end_time - start_time
-                            
-                            if self.debug:
-                                print(f"Successfully extracted answer ({len(answer)} chars)")
-                                print(f"Response time: {response_time:.2f} seconds")
-                                
-                            # Add a meta field with response information
-                            result = {
-                                "text": answer,
-                                "meta": {
-                                    "response_time_seconds": round(response_time, 2),
-                                    "model": model,
-                                    "endpoint": endpoint,
-                                    "characters": len(answer)
-                                }
+                        # Add a meta field with response information
+                        result = {
+                            "text": answer,
+                            "meta": {
+                                "response_time_seconds": round(response_time, 2),
+                                "model": model,
+                                "endpoint": endpoint,
+                                "strategy": name,
+                                "characters": len(answer),
+                                "delivered": True
                             }
-                            return result
-                        
-                        # If we get here, we got a 200 response but couldn't extract the answer
-                        if self.debug:
-                            print("Got 200 response but couldn't extract answer")
-                        if payload_idx == len(payloads) - 1 and model == models_to_try[-1] and endpoint == api_endpoints[-1]:
-                            end_time = time.time()
-                            response_time = end_time - start_time
-                            error_msg = f"Got response from Claude but couldn't extract the answer. Raw data:\n\n{decoded_data[:1000]}"
-                            return {
-                                "text": error_msg,
-                                "meta": {
-                                    "response_time_seconds": round(response_time, 2),
-                                    "error": True
-                                }
+                        }
+                        return result
+                
+                    # If we get here, we got a 200 response but couldn't extract the answer
+                    self._note("no_answer", "Got 200 response but couldn't extract answer", strategy=name)
+                    traced.set(outcome="unparsed")
+                    self._strategies.record(name, False)
+                    if is_last_attempt:
+                        end_time = time.time()
+                        response_time = end_time - start_time
+                        error_msg = f"Got response from Claude but couldn't extract the answer. Raw data:\n\n{decoded_data[:1000]}"
+                        return {
+                            "text": error_msg,
+                            "meta": {
+                                "response_time_seconds": round(response_time, 2),
+                                "error": True,
+                                "delivered": True
                             }
-                    
-                    except Exception as e:
-                        if self.debug:
-                            print(f"Exception with endpoint {endpoint}, model {model}, payload {payload_idx+1}: {str(e)}")
-                        # Continue to next payload format
-                        continue
+                        }
+            
+                except Exception as e:
+                    self._note("strategy_error", f"Exception with strategy {name}: {str(e)}", strategy=name)
+                    traced.set(outcome="exception")
+                    # A network error says nothing about the strategy, and the message may already
+                    # have been delivered, so trying the next strategy could send it twice
+                    return {
+                        "text": f"Error communicating with Claude: {str(e)}",
+                        "meta": {
+                            "response_time_seconds": round(time.time() - start_time, 2),
+                            "error": True
+                        }
+                    }
         
-        # This should only be reached if all endpoints, models, and payload formats failed
+        # This should only be reached if every strategy failed
         end_time = time.time()
         response_time = end_time - start_time
         error_msg = "All communication attempts with Claude failed. The Claude.ai API may have changed significantly. Please check for updates to the client library or try refreshing your cookie."
@@ -357,11 +569,209 @@ class EnhancedClient:
             }
         }
 
+    def _completion_strategies(self, prompt, conversation_id, attachments):
+        """
+        Return the known ways of sending a completion, keyed by strategy name,
+        as (endpoint, model, payload) tuples. Claude periodically changes these.
+        """
+        return {
+            "completion": (
+                f"https://claude.ai/api/organizations/{self.organization_id}/chat_conversations/{conversation_id}/completion",
+                "claude",
+                fastjson.dumps({
+                    "prompt": f"{prompt}",
+                    "attachments": attachments
+                })
+            ),
+            # Older API that was used as a fallback when the completion endpoint failed
+            "append_message": (
+                "https://claude.ai/api/append_message",
+                "claude-2",
+                fastjson.dumps({
+                    "completion": {
+                        "prompt": f"{prompt}",
+                        "timezone": "Asia/Kolkata",
+                        "model": "claude-2"
+                    },
+                    "organization_uuid": f"{self.organization_id}",
+                    "conversation_uuid": f"{conversation_id}",
+                    "text": f"{prompt}",
+                    "attachments": attachments
+                })
+            )
+        }
+
+    def _partial_result(self, answer, start_time, model, endpoint, cancelled=False, timed_out=False,
+                        delivered=False):
+        """Build the result for a completion that stopped before it finished."""
+        meta = {
+            "response_time_seconds": round(time.time() - start_time, 2),
+            "model": model,
+            "endpoint": endpoint,
+            "characters": len(answer)
+        }
+        if cancelled:
+            meta["cancelled"] = True
+        if delivered:
+            meta["delivered"] = True
+        if timed_out:
+            meta["error"] = True
+            meta["timed_out"] = True
+            if not answer:
+                answer = "The response stream stopped sending data. Please try again."
+        return {"text": answer, "meta": meta}
+
+    def _parse_completion(self, decoded_data):
+        """Extract the answer text from a fully buffered completion response."""
+        # Look for patterns in the response to detect format
+        # First, check if it's a streaming response
+        if 'data:' in decoded_data:
+            self._note("format", "Detected streaming response format", streaming=True)
+            # More robust parsing of server-sent events
+            completions = []
+            for line in decoded_data.split('\n'):
+                text = self._parse_event_line(line)
+                if text:
+                    completions.append(text)
+            return ''.join(completions)
+
+        # Might be a regular JSON response
+        self._note("format", "Detected non-streaming response format", streaming=False)
+        try:
+            data = fastjson.loads(decoded_data)
+            # Various possible response formats
+            if 'completion' in data:
+                return data['completion']
+            elif 'text' in data:
+                return data['text']
+            elif 'content' in data:
+                return data['content']
+            else:
+                # Return the whole response for debugging
+                return f"Got a 200 response but couldn't extract text. Raw data:\n\n{decoded_data[:1000]}"
+        except json.JSONDecodeError:
+            return f"Got a 200 response but couldn't parse JSON. Raw data:\n\n{decoded_data[:1000]}"
+
+    def _parse_event_line(self, line):
+        """Extract the text delta from one server-sent event line, if any."""
+        line = line.strip()
+        if not line or not line.startswith('data:'):
+            return None
+
+        try:
+            # The completion, text (alternative format) or delta text (Claude 3 format)
+            return fastjson.event_text(line[5:].strip())
+        except json.JSONDecodeError:
+            # Try to extract with regex if JSON parsing fails
+            completion_match = re.search(r'"completion"\s*:\s*"([^"]*)"', line)
+            if completion_match:
+                return completion_match.group(1)
+        except (TypeError, AttributeError):
+            pass
+        return None
+
+    def _cancellable(self, cancel, func, *args, **kwargs):
+        """
+        Call func, or return _CANCELLED if cancel fires before it finishes.
+
+        With a cancel token the call runs on a worker thread while this one
+        polls the token, so a slow verification, upload or wait for response
+        headers can be abandoned. An abandoned response is closed when it arrives.
+        """
+        if cancel is None:
+            return func(*args, **kwargs)
+        with self._lock:
+            if self._waiter is None:
+                # Long-lived workers keep their per-thread sessions, and so their connections
+                self._waiter = ThreadPoolExecutor(max_workers=8, thread_name_prefix="claude-cancellable")
+            waiter = self._waiter
+        future = waiter.submit(func, *args, **kwargs)
+        while not future.done():
+            if cancel.cancelled:
+                future.add_done_callback(_discard)
+                return _CANCELLED
+            wait([future], timeout=0.1)
+        return future.result()
+
+    def _read_event_stream(self, response, on_text=None, cancel=None, first_byte_timeout=None, idle_timeout=None,
+                           stats=None):
+        """
+        Read a streamed completion, passing each text delta to on_text.
+
+        Lines are read on a helper thread so that cancellation and the
+        first-byte/idle timeouts are noticed even while the socket is silent.
+        Returns (text, raw, stopped): the text received, the raw body when it
+        was not an event stream, and "cancelled" or "timeout" if reading
+        stopped early (otherwise None). If stats is a dict, the bytes read are
+        added to stats["bytes"] and the arrival time (perf_counter) of the
+        first text is stored in stats["first_byte"].
+        """
+        lines = queue.Queue()
+
+        def reader():
+            try:
+                for line in response.iter_lines():
+                    lines.put(line)
+            except Exception as e:
+                lines.put(e)
+            lines.put(_END_OF_STREAM)
+
+        threading.Thread(target=reader, name="completion-reader", daemon=True).start()
+
+        completions = []
+        raw = []
+        received = False
+        last_activity = time.monotonic()
+        stopped = None
+        while True:
+            if cancel is not None and cancel.cancelled:
+                stopped = "cancelled"
+                break
+            try:
+                line = lines.get(timeout=0.1)
+            except queue.Empty:
+                limit = idle_timeout if received else first_byte_timeout
+                if limit and time.monotonic() - last_activity > limit:
+                    stopped = "timeout"
+                    break
+                continue
+
+            if line is _END_OF_STREAM:
+                break
+            if isinstance(line, Exception):
+                raise line
+            received = True
+            last_activity = time.monotonic()
+
+            if stats is not None:
+                stats["bytes"] = stats.get("bytes", 0) + len(line) + 1
+            if isinstance(line, bytes):
+                line = line.decode("utf-8", errors="ignore")
+            text = self._parse_event_line(line)
+            if text:
+                if not completions:
+                    tracing.event("first_text")
+                    if stats is not None:
+                        stats["first_byte"] = time.perf_counter()
+                completions.append(text)
+                if on_text is not None:
+                    on_text(text)
+            elif not completions:
+                # Keep the body in case this turns out not to be an event stream
+                raw.append(line)
+
+        if stopped:
+            try:
+                response.close()
+            except Exception:
+                pass
+        return ''.join(completions), '\n'.join(raw), stopped
+
     def delete_conversation(self, conversation_id):
         """Delete a conversation."""
         url = f"https://claude.ai/api/organizations/{self.organization_id}/chat_conversations/{conversation_id}"
 
-        payload = json.dumps(f"{conversation_id}")
+        payload = fastjson.dumps(f"{conversation_id}")
         headers = {
             'User-Agent':
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0',
@@ -379,9 +789,12 @@ class EnhancedClient:
         }
 
         try:
-            response = self._make_request("DELETE", url, headers=headers, data=payload)
+            response = self._make_request("DELETE", url, headers=headers, data=payload, op="delete")
+            self._flight.forget(("conversations",))
+            self._flight.forget(("history", conversation_id))
             
             if response.status_code == 204:
+                conversation_index.remove_from_index(conversation_id)
                 return True
             else:
                 return False
@@ -389,7 +802,15 @@ class EnhancedClient:
             return False
 
     def chat_conversation_history(self, conversation_id):
-        """Get conversation history."""
+        """Get conversation history as a Conversation with its messages."""
+        key = ("history", conversation_id)
+        history = self._flight.do(key, lambda: self._fetch_conversation_history(conversation_id))
+        if isinstance(history, dict):
+            # Never keep serving an error from the cache
+            self._flight.forget(key)
+        return history
+
+    def _fetch_conversation_history(self, conversation_id):
         url = f"https://claude.ai/api/organizations/{self.organization_id}/chat_conversations/{conversation_id}"
 
         headers = {
@@ -406,33 +827,21 @@ class EnhancedClient:
         }
 
         try:
-            if self.debug:
-                print(f"Fetching conversation history from: {url}")
+            self._note("history", f"Fetching conversation history from: {url}", conversation=conversation_id)
                 
-            response = self._make_request("GET", url, headers=headers)
-            
-            if response.status_code == 200:
-                return json.loads(response.text)
+            status, history = self._get_json(url, headers, "history", fastjson.read_conversation)
+
+            if status == 200:
+                return history
             else:
-                error_msg = f"Failed to get conversation history: HTTP {response.status_code}"
-                try:
-                    error_data = json.loads(response.content)
-                    if 'error' in error_data:
-                        error_msg += f" - {error_data['error'].get('message', '')}"
-                except:
-                    pass
-                    
-                if self.debug:
-                    print(error_msg)
-                    
+                error_msg = f"Failed to get conversation history: HTTP {status}{history}"
+                self._note("history_failed", error_msg, status=status)
                 return {"error": error_msg}
         except json.JSONDecodeError:
-            if self.debug:
-                print("Failed to parse conversation history JSON")
+            self._note("history_failed", "Failed to parse conversation history JSON")
             return {"error": "Failed to parse conversation history"}
         except Exception as e:
-            if self.debug:
-                print(f"Exception fetching history: {str(e)}")
+            self._note("history_failed", f"Exception fetching history: {str(e)}")
             return {"error": f"Failed to get conversation history: {str(e)}"}
 
     def generate_uuid(self):
@@ -447,7 +856,7 @@ class EnhancedClient:
         url = f"https://claude.ai/api/organizations/{self.organization_id}/chat_conversations"
         new_uuid = self.generate_uuid()
 
-        payload = json.dumps({"uuid": new_uuid, "name": ""})
+        payload = fastjson.dumps({"uuid": new_uuid, "name": ""})
         headers = {
             'User-Agent':
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0',
@@ -465,14 +874,18 @@ class EnhancedClient:
         }
 
         try:
-            response = self._make_request("POST", url, headers=headers, data=payload)
+            response = self._make_request("POST", url, headers=headers, data=payload, op="write", metric="create")
+            self._flight.forget(("conversations",))
             
             if response.status_code == 200:
-                return json.loads(response.text)
+                with phase("parse"):
+                    conversation = Conversation.from_dict(fastjson.loads(response.content))
+                conversation_index.add_to_index(conversation.uuid, conversation.title)
+                return conversation
             else:
                 error_msg = f"Failed to create conversation: HTTP {response.status_code}"
                 try:
-                    error_data = json.loads(response.content)
+                    error_data = fastjson.loads(response.content)
                     if 'error' in error_data:
                         error_msg += f" - {error_data['error'].get('message', '')}"
                 except:
@@ -491,11 +904,18 @@ class EnhancedClient:
             return False
 
         for conversation in conversations:
-            conversation_id = conversation['uuid']
-            self.delete_conversation(conversation_id)
+            self.delete_conversation(conversation.uuid)
 
         return True
 
+    def upload_attachments(self, file_paths, workers=4):
+        """Prepare and upload several attachments in parallel, returning the results in order."""
+        if len(file_paths) == 1:
+            return [self.upload_attachment(file_paths[0])]
+        with ThreadPoolExecutor(max_workers=min(workers, len(file_paths)),
+                                thread_name_prefix="claude-upload") as executor:
+            return list(executor.map(self.upload_attachment, file_paths))
+
     def upload_attachment(self, file_path):
         """Upload an attachment to Claude."""
         if not os.path.exists(file_path):
@@ -513,12 +933,7 @@ class EnhancedClient:
                 with open(file_path, 'r', encoding='latin-1') as file:
                     file_content = file.read()
 
-            return {
-                "file_name": file_name,
-                "file_type": file_type,
-                "file_size": file_size,
-                "extracted_content": file_content
-            }
+            return Attachment(file_name, file_type, file_size, file_content)
             
         url = 'https://claude.ai/api/convert_document'
         headers = {
@@ -539,30 +954,25 @@ class EnhancedClient:
         content_type = self.get_content_type(file_path)
 
         try:
-            with open(file_path, 'rb') as f:
-                file_data = f.read()
+            prepared = self._prepare_image(file_path)
+            if prepared is not None:
+                file_name, file_data, content_type = prepared.file_name, prepared.data, prepared.content_type
+            else:
+                with open(file_path, 'rb') as f:
+                    file_data = f.read()
                 
             files = {
                 'file': (file_name, file_data, content_type),
                 'orgUuid': (None, self.organization_id)
             }
 
-            # For file uploads, we need to use the regular requests library
-            # as curl_cffi doesn't handle multipart form data well
-            proxies = {}
-            if self.proxy:
-                proxies = {
-                    'http': self.proxy,
-                    'https': self.proxy
-                }
-                
-            response = req.post(url, headers=headers, files=files, proxies=proxies, timeout=30)
+            response = self._make_request("POST", url, headers=headers, files=files, op="upload")
             if response.status_code == 200:
-                return response.json()
+                return Attachment.from_dict(response.json())
             else:
                 error_msg = f"Failed to upload attachment: HTTP {response.status_code}"
                 try:
-                    error_data = json.loads(response.content)
+                    error_data = fastjson.loads(response.content)
                     if 'error' in error_data:
                         error_msg += f" - {error_data['error'].get('message', '')}"
                 except:
@@ -573,11 +983,27 @@ class EnhancedClient:
             print(f"Upload exception: {str(e)}")
             return False
 
+    def _prepare_image(self, file_path):
+        """Downscale and recompress an image attachment if image preprocessing is on."""
+        if not self.image_options or not images.is_image(file_path):
+            return None
+        if images.Image is None:
+            self._note("image_skipped", "Image preprocessing needs Pillow (pip install Pillow); uploading as-is")
+            return None
+        options = self.image_options if isinstance(self.image_options, dict) else {}
+        prepared = images.prepare_image(file_path, **options)
+        if prepared is not None:
+            share = 100 * prepared.saved / prepared.original_size if prepared.original_size else 0
+            self._note("image_prepared", f"Prepared {os.path.basename(file_path)}: {prepared.original_size:,} -> "
+                                         f"{len(prepared.data):,} bytes ({share:.0f}% saved) in {prepared.seconds:.2f}s",
+                       original=prepared.original_size, size=len(prepared.data), seconds=prepared.seconds)
+        return prepared
+
     def rename_chat(self, title, conversation_id):
         """Rename a chat conversation."""
         url = "https://claude.ai/api/rename_chat"
 
-        payload = json.dumps({
+        payload = fastjson.dumps({
             "organization_uuid": f"{self.organization_id}",
             "conversation_uuid": f"{conversation_id}",
             "title": f"{title}"
@@ -598,33 +1024,127 @@ class EnhancedClient:
         }
 
         try:
-            response = self._make_request("POST", url, headers=headers, data=payload)
+            response = self._make_request("POST", url, headers=headers, data=payload, op="write", metric="rename")
+            self._flight.forget(("conversations",))
+            self._flight.forget(("history", conversation_id))
 
             if response.status_code == 200:
+                conversation_index.add_to_index(conversation_id, title)
                 return True
             else:
                 return False
         except Exception:
             return False
             
-    def _make_request(self, method, url, headers=None, data=None, timeout=30):
-        """Make a request with proxy support if configured and better error handling."""
-        proxy_dict = {}
-        if self.proxy:
-            proxy_dict = {"proxies": {"https": self.proxy, "http": self.proxy}}
-            
+    def _get_json(self, url, headers, metric, parse):
+        """
+        GET a JSON body, advertising the compression the transport can undo.
+        parse is given an iterator of decompressed byte chunks, so it can
+        decode them as they arrive (the standard library reader in fastjson
+        does). Returns (status, parsed result), or (status, error detail) for
+        responses other than 200.
+        """
+        headers = dict(headers, **{'Accept-Encoding': self.transport.accept_encoding})
+        started = time.perf_counter()
+        response = self._make_request("GET", url, headers=headers, op="list", metric=metric, stream=True)
+        received = [0]
+
+        def chunks():
+            body = response.iter_content(READ_CHUNK_SIZE)
+            while True:
+                with phase("network"):
+                    chunk = next(body, None)
+                if chunk is None:
+                    return
+                received[0] += len(chunk)
+                yield chunk
+
+        status = response.status_code
         try:
-            if method == "GET":
-                return requests.get(url, headers=headers, impersonate="chrome110", timeout=timeout, **proxy_dict)
-            elif method == "POST":
-                return requests.post(url, headers=headers, data=data, impersonate="chrome110", timeout=timeout, **proxy_dict)
-            elif method == "DELETE":
-                return requests.delete(url, headers=headers, data=data, impersonate="chrome110", timeout=timeout, **proxy_dict)
+            if status != 200:
+                result = ""
+                try:
+                    error_data = fastjson.loads(b"".join(chunks()))
+                    if 'error' in error_data:
+                        result = f" - {error_data['error'].get('message', '')}"
+                except Exception:
+                    pass
             else:
-                raise ValueError(f"Unsupported method: {method}")
-        except requests.exceptions.ProxyError:
-            raise Exception(f"Proxy connection error. Please check your proxy configuration: {self.proxy}")
-        except requests.exceptions.ConnectTimeout:
-            raise Exception(f"Connection timeout. The request took too long to complete (>{timeout}s).")
-        except requests.exceptions.ConnectionError:
-            raise Exception("Connection error. Please check your internet connection and proxy settings.")
\ No newline at end of file
+                with phase("parse"):
+                    result = parse(chunks())
+        except Exception:
+            status = None
+            raise
+        finally:
+            response.close()
+            if self.metrics is not None:
+                self.metrics.record(metric, latency=time.perf_counter() - started, bytes=received[0],
+                                    error=status is None or status >= 400)
+        return status, result
+
+    def _throttle(self, op):
+        """Wait for the rate limiter to allow another request of class op."""
+        if self._limiter is None:
+            return
+        waited = self._limiter.acquire(op)
+        if waited > 0:
+            self._note("throttled", f"Rate limiter delayed {op} request by {waited:.2f}s", op=op, seconds=waited)
+
+    def _note(self, name, message, **args):
+        """Record a trace event for a client decision, and print message with --debug."""
+        tracing.event(name, message=message, **args)
+        if self.debug:
+            print(message)
+
+    def _record_rate_limit(self, op, response):
+        """Feed a response's status back into the rate limiter."""
+        if self._limiter is None:
+            return
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get('Retry-After') or 0)
+            except ValueError:
+                retry_after = 0
+            self._limiter.penalize(op, retry_after)
+        elif response.status_code < 400:
+            self._limiter.reward(op)
+
+    def _make_request(self, method, url, headers=None, data=None, timeout=30, stream=False, op=None, files=None,
+                      metric=None):
+        """
+        Make a request with proxy support if configured and better error handling.
+
+        op names the rate-limit class of the request (completion, list,
+        upload, delete or write); it defaults to one derived from the method.
+        metric names the operation in the recorded metrics (default: op).
+        Streamed requests are not recorded here; send_message and _get_json
+        record them.
+        """
+        if op is None:
+            op = {"GET": "list", "DELETE": "delete"}.get(method, "write")
+        self._throttle(op)
+
+        if method not in ("GET", "POST", "DELETE"):
+            raise ValueError(f"Unsupported method: {method}")
+
+        started = time.perf_counter()
+        with tracing.span("request", op=metric or op, method=method, stream=stream) as traced:
+            try:
+                with phase("network"):
+                    response = self.transport.request(method, url, headers=headers, data=data, files=files,
+                                                      timeout=timeout, stream=stream)
+            except Exception:
+                if self.metrics is not None and not stream:
+                    self.metrics.record(metric or op, latency=time.perf_counter() - started, error=True)
+                raise
+            traced.set(status=response.status_code)
+            self._record_rate_limit(op, response)
+            if self.metrics is not None and not stream:
+                try:
+                    size = len(response.content)
+                except Exception:
+                    size = 0
+                traced.set(bytes=size)
+                self.metrics.record(metric or op, latency=time.perf_counter() - started, bytes=size,
+                                    error=response.status_code >= 400)
+        return response
\ No newline at end of file
@@ -0,0 +1,241 @@
+"""
+JSON encoding and decoding through the fastest library installed: msgspec
+(which decodes plain listings and completion events against typed schemas), then
+orjson, then the standard library. Set CLAUDE_JSON to
+msgspec, orjson or json to choose one explicitly.
+
+use() binds the module's functions to the chosen library:
+
+    loads(data)                 str or bytes to objects; invalid JSON raises json.JSONDecodeError
+    dumps(obj, default=None)    objects to ASCII str; default converts what JSON can't represent
+    read_conversations(chunks)  a listing body, as byte chunks, to Conversations
+    read_conversation(chunks)   a history body, as byte chunks, to a Conversation of Messages
+    event_text(data)            the text delta of a completion event's JSON, or None
+"""
+import importlib
+import importlib.util
+import json
+import os
+import re
+import sys
+from typing import Any, List, Optional
+
+from claude_cli.utils import jsonstream
+from claude_cli.utils.models import Conversation, Message
+
+BACKENDS = ("msgspec", "orjson", "json")
+
+# Imported by use(), and only the one chosen: each costs 10-20ms at startup
+orjson = None
+msgspec = None
+
+# Name of the library in use, set by use()
+backend = None
+
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]+")
+
+
+def _decode_error(e):
+    """Report a decode error from another library as the json.JSONDecodeError callers catch."""
+    return json.JSONDecodeError(str(e), "", 0)
+
+
+def _ascii(text):
+    """
+    Escape non-ASCII characters as json.dumps does: payloads and output stay
+    ASCII, whatever encoding the transport or terminal uses.
+    """
+    if text.isascii():
+        return text
+    return _NON_ASCII_RE.sub(lambda match: json.dumps(match.group())[1:-1], text)
+
+
+def _expect(data, kind):
+    if not isinstance(data, kind):
+        raise json.JSONDecodeError(f"Expecting a JSON {'array' if kind is list else 'object'}", "", 0)
+    return data
+
+
+def _conversation(fields):
+    return Conversation(fields.uuid, fields.name or '', fields.summary or '', fields.created_at or '',
+                        fields.updated_at or '')
+
+
+def _conversations_from(data):
+    return [Conversation.from_dict(conv) for conv in _expect(data, list)]
+
+
+def _history_from(data):
+    messages = _expect(data, dict).get("chat_messages")
+    if isinstance(messages, list):
+        data["chat_messages"] = [Message.from_dict(m) for m in messages]
+    return Conversation.from_dict(data)
+
+
+def _event_text(data):
+    """The text delta of a decoded completion event, in any of the formats the API has used."""
+    if not isinstance(data, dict):
+        return None
+    if 'completion' in data:
+        return data['completion']
+    if 'text' in data:
+        return data['text']
+    delta = data.get('delta')
+    # Claude 3 format
+    if isinstance(delta, dict):
+        return delta.get('text')
+    return None
+
+
+# Standard library: bodies are decoded incrementally as they stream in
+
+def _json_dumps(obj, default=None):
+    return json.dumps(obj, default=default)
+
+
+def _json_read_conversations(chunks):
+    return [Conversation.from_dict(conv) for conv in jsonstream.iter_array(chunks)]
+
+
+def _json_read_conversation(chunks):
+    return Conversation.from_dict(jsonstream.load_object(chunks, {"chat_messages": Message.from_dict}))
+
+
+def _json_event_text(data):
+    return _event_text(json.loads(data))
+
+
+# orjson: much faster, but needs the whole body at once
+
+def _orjson_dumps(obj, default=None):
+    return _ascii(orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8"))
+
+
+def _orjson_read_conversations(chunks):
+    return _conversations_from(orjson.loads(b"".join(chunks)))
+
+
+def _orjson_read_conversation(chunks):
+    return _history_from(orjson.loads(b"".join(chunks)))
+
+
+def _orjson_event_text(data):
+    return _event_text(orjson.loads(data))
+
+
+# msgspec: decodes straight into structs where that loses nothing, without
+# building dicts
+
+def _define_schemas():
+    """Build the msgspec structs and decoders, once msgspec has been imported."""
+    global _decoder, _listing_decoder, _event_decoder
+
+    # Listing entries with just these fields skip the dicts. Entries with any
+    # other field fail validation and are decoded generically, so that field
+    # is kept in Conversation.extra as with the other libraries. Histories
+    # are always decoded generically: they are exported, so nothing may be dropped.
+    class _ConversationFields(msgspec.Struct, forbid_unknown_fields=True):
+        uuid: Optional[str] = ''
+        name: Optional[str] = None
+        summary: Optional[str] = None
+        created_at: Optional[str] = None
+        updated_at: Optional[str] = None
+
+    class _EventFields(msgspec.Struct):
+        # UNSET tells a missing field from an explicit null
+        completion: Any = msgspec.UNSET
+        text: Any = msgspec.UNSET
+        delta: Any = None
+
+    _decoder = msgspec.json.Decoder()
+    _listing_decoder = msgspec.json.Decoder(List[_ConversationFields])
+    _event_decoder = msgspec.json.Decoder(_EventFields)
+
+
+def _msgspec_loads(data):
+    try:
+        return _decoder.decode(data)
+    except msgspec.DecodeError as e:
+        raise _decode_error(e) from None
+
+
+def _msgspec_dumps(obj, default=None):
+    return _ascii(msgspec.json.encode(obj, enc_hook=default).decode("utf-8"))
+
+
+def _msgspec_read_conversations(chunks):
+    body = b"".join(chunks)
+    try:
+        listing = _listing_decoder.decode(body)
+    except msgspec.ValidationError:
+        # Fields the schema doesn't hold, or not the shape it expects; decode it the generic way
+        return _conversations_from(_msgspec_loads(body))
+    except msgspec.DecodeError as e:
+        raise _decode_error(e) from None
+    return [_conversation(fields) for fields in listing]
+
+
+def _msgspec_read_conversation(chunks):
+    return _history_from(_msgspec_loads(b"".join(chunks)))
+
+
+def _msgspec_event_text(data):
+    try:
+        event = _event_decoder.decode(data)
+    except msgspec.ValidationError:
+        return None
+    except msgspec.DecodeError as e:
+        raise _decode_error(e) from None
+    if event.completion is not msgspec.UNSET:
+        return event.completion
+    if event.text is not msgspec.UNSET:
+        return event.text
+    if isinstance(event.delta, dict):
+        return event.delta.get('text')
+    return None
+
+
+def _import(name):
+    """Import an optional library, or return None if it isn't installed."""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def use(name=None):
+    """
+    Switch to the named library (default: $CLAUDE_JSON, or the fastest one
+    installed) and return its name.
+    """
+    global backend, loads, dumps, read_conversations, read_conversation, event_text
+    name = name or os.environ.get("CLAUDE_JSON") or next(
+        name for name in BACKENDS if name == "json" or importlib.util.find_spec(name) is not None)
+    if name not in BACKENDS:
+        raise Exception(f"Unknown JSON library '{name}'; choose one of {', '.join(BACKENDS)}")
+    if name != "json" and globals()[name] is None:
+        library = _import(name)
+        if library is None:
+            raise Exception(f"The {name} JSON library is not installed: pip install {name}")
+        globals()[name] = library
+        if name == "msgspec":
+            _define_schemas()
+
+    if name == "msgspec":
+        functions = (_msgspec_loads, _msgspec_dumps, _msgspec_read_conversations, _msgspec_read_conversation,
+                     _msgspec_event_text)
+    elif name == "orjson":
+        functions = (orjson.loads, _orjson_dumps, _orjson_read_conversations, _orjson_read_conversation,
+                     _orjson_event_text)
+    else:
+        functions = json.loads, _json_dumps, _json_read_conversations, _json_read_conversation, _json_event_text
+    backend = name
+    loads, dumps, read_conversations, read_conversation, event_text = functions
+    return name
+
+
+try:
+    use()
+except Exception as e:
+    print(f"Warning: {str(e)}; using the standard json module", file=sys.stderr)
+    use("json")
@@ -0,0 +1,200 @@
+"""
+Hedged requests: re-issue a slow idempotent read and take whichever copy
+answers first
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from claude_cli.config import CONFIG_DIR, config_lock
+from claude_cli.utils.transport import Transport, _UUID_RE
+
+HEDGE_PATH = os.path.join(CONFIG_DIR, "latency.json")
+HEDGE_LOCK_PATH = os.path.join(CONFIG_DIR, "latency.lock")
+
+# Hedge once a read has taken longer than this percentile of recent reads...
+DEFAULT_PERCENTILE = 95
+# ...but never sooner than this many seconds
+DEFAULT_MIN_DELAY = 0.05
+# Until this many samples exist for a kind of read, hedge after this delay
+DEFAULT_MIN_SAMPLES = 10
+DEFAULT_INITIAL_DELAY = 1.0
+# Recent latencies kept per kind of read
+DEFAULT_WINDOW = 100
+# At most this fraction of reads (plus one) may be hedged, so a slow service doesn't get twice the load
+DEFAULT_BUDGET = 0.1
+# New samples are merged into the shared file at most this often, and at exit
+SAVE_INTERVAL = 10
+
+
+class HedgedTransport(Transport):
+    """
+    Wraps a transport so that plain GETs which have not answered within the
+    configured percentile of recent latency are sent a second time, over
+    another pooled connection or through the next alternate transport (one
+    per hedge proxy). The first response wins. The other copy is cancelled
+    if it hasn't started, or closed and discarded when it finishes.
+
+    Uploads and anything but GET are passed straight through: only
+    idempotent reads are safe to send twice. Streamed GETs race on the
+    arrival of the response headers, and the loser is closed unread.
+
+    Latencies are kept per URL shape (IDs masked) and shared through a file
+    on disk, since most commands only make a handful of reads. New samples
+    are kept in memory and merged into the file every SAVE_INTERVAL seconds,
+    on close() and at exit; pass path=None to keep them in memory only.
+    """
+
+    def __init__(self, inner, alternates=None, percentile=DEFAULT_PERCENTILE, min_delay=DEFAULT_MIN_DELAY,
+                 initial_delay=DEFAULT_INITIAL_DELAY, min_samples=DEFAULT_MIN_SAMPLES, window=DEFAULT_WINDOW,
+                 budget=DEFAULT_BUDGET, max_workers=8, path=HEDGE_PATH, lock_path=HEDGE_LOCK_PATH):
+        self.inner = inner
+        self.name = inner.name
+        self.accept_encoding = inner.accept_encoding
+        self.alternates = list(alternates or [])
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.budget = budget
+        self.path = path
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._latencies = self._load()
+        # Samples not yet merged into the file, and when it was last written
+        self._unsaved = {}
+        self._saved_at = time.monotonic()
+        self._next_alternate = 0
+        self.stats = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+        # Long-lived workers keep their per-thread sessions, so a hedge goes out
+        # over a warm connection other than the one the slow request is using
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="claude-hedge")
+        if path is not None:
+            atexit.register(self.save)
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        if method != "GET" or files:
+            return self.inner.request(method, url, headers=headers, data=data, files=files,
+                                      timeout=timeout, stream=stream)
+
+        key = _UUID_RE.sub("*", url)
+        with self._lock:
+            self.stats["requests"] += 1
+        primary = self._executor.submit(self._timed, self.inner, key, method, url, headers, timeout, stream)
+        done, _ = wait([primary], timeout=self._delay(key))
+        if done or not self._take_budget():
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed, self._hedge_transport(), key, method, url, headers, timeout,
+                                      stream)
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        # Prefer a successful copy if the first to finish failed
+        winner = primary if primary in done else hedge
+        loser = hedge if winner is primary else primary
+        if winner.exception() is not None:
+            winner, loser = loser, winner
+            if winner.exception() is not None:
+                return winner.result()
+
+        if winner is hedge:
+            with self._lock:
+                self.stats["hedge_wins"] += 1
+        if not loser.cancel():
+            loser.add_done_callback(_discard)
+        return winner.result()
+
+    def _timed(self, transport, key, method, url, headers, timeout, stream=False):
+        started = time.perf_counter()
+        response = transport.request(method, url, headers=headers, timeout=timeout, stream=stream)
+        self._record(key, time.perf_counter() - started)
+        return response
+
+    def _load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(self, key, latency):
+        """Add a latency sample, saving the new samples if the file hasn't been written for a while."""
+        latency = round(latency, 4)
+        with self._lock:
+            self._latencies[key] = (self._latencies.get(key, []) + [latency])[-self.window:]
+            if self.path is None:
+                return
+            self._unsaved.setdefault(key, []).append(latency)
+            if time.monotonic() - self._saved_at < SAVE_INTERVAL:
+                return
+        self.save()
+
+    def save(self):
+        """Merge the unsaved samples into the shared file, picking up other processes' samples."""
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+            self._saved_at = time.monotonic()
+        if self.path is None or not unsaved:
+            return
+        try:
+            with config_lock(self.lock_path):
+                latencies = self._load()
+                for key, samples in unsaved.items():
+                    latencies[key] = (latencies.get(key, []) + samples)[-self.window:]
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(latencies, f)
+                os.replace(tmp_path, self.path)
+        except OSError:
+            return
+        with self._lock:
+            # Samples recorded while the file was being written are saved next time
+            for key, samples in latencies.items():
+                self._latencies[key] = (samples + self._unsaved.get(key, []))[-self.window:]
+
+    def _delay(self, key):
+        """Seconds to wait for the first copy before hedging a read of this kind."""
+        with self._lock:
+            samples = sorted(self._latencies.get(key, ()))
+        if len(samples) < self.min_samples:
+            return max(self.initial_delay, self.min_delay)
+        index = min(len(samples) - 1, int(len(samples) * self.percentile / 100))
+        return max(samples[index], self.min_delay)
+
+    def _take_budget(self):
+        with self._lock:
+            if self.stats["hedged"] >= self.budget * self.stats["requests"] + 1:
+                return False
+            self.stats["hedged"] += 1
+            return True
+
+    def _hedge_transport(self):
+        """Round-robin over the alternate transports, or the wrapped one if there are none."""
+        if not self.alternates:
+            return self.inner
+        with self._lock:
+            transport = self.alternates[self._next_alternate % len(self.alternates)]
+            self._next_alternate += 1
+        return transport
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.save()
+        self.inner.close()
+        for transport in self.alternates:
+            transport.close()
+
+
+def _discard(future):
+    """Close the response of a copy that lost the race."""
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        future.result().close()
+    except Exception:
+        pass
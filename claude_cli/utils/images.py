@@ -0,0 +1,107 @@
+"""
+Optional downscaling and recompression of images before upload (needs Pillow)
+"""
+import io
+import os
+import time
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".webp": "image/webp"}
+
+# Longest side in pixels; larger images are scaled down before upload
+DEFAULT_MAX_DIMENSION = 1568
+DEFAULT_QUALITY = 85
+# Never go below this JPEG quality when squeezing into max_bytes...
+MIN_QUALITY = 50
+# ...shrink the image by this factor instead
+SHRINK_STEP = 0.8
+
+
+def is_image(file_path):
+    return os.path.splitext(file_path)[-1].lower() in CONTENT_TYPES
+
+
+class PreparedImage:
+    """An image ready to upload, with the numbers for the debug report."""
+
+    __slots__ = ("file_name", "data", "content_type", "original_size", "seconds")
+
+    def __init__(self, file_name, data, content_type, original_size, seconds):
+        self.file_name = file_name
+        self.data = data
+        self.content_type = content_type
+        self.original_size = original_size
+        self.seconds = seconds
+
+    @property
+    def saved(self):
+        return self.original_size - len(self.data)
+
+
+def prepare_image(file_path, max_dimension=DEFAULT_MAX_DIMENSION, quality=DEFAULT_QUALITY, max_bytes=None):
+    """
+    Cap an image's resolution, drop its metadata (EXIF, GPS, comments) and
+    re-encode it: JPEG for opaque images, PNG for ones with transparency.
+    If max_bytes is set, lower the JPEG quality and then the resolution
+    until the result fits.
+
+    Returns None when Pillow is not installed or the file can't be handled
+    (say, an animation), in which case the original should be uploaded.
+    """
+    if Image is None:
+        return None
+    started = time.perf_counter()
+    with open(file_path, 'rb') as f:
+        original = f.read()
+
+    try:
+        image = Image.open(io.BytesIO(original))
+        if getattr(image, "is_animated", False):
+            return None
+        has_metadata = bool(image.info.get("exif") or image.getexif())
+        # Bake the EXIF orientation into the pixels, since the tag is dropped below
+        image = ImageOps.exif_transpose(image)
+        transparent = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if transparent else "RGB")
+
+        resized = max(image.size) > max_dimension
+        if resized:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        data = _encode(image, transparent, quality)
+        while max_bytes and len(data) > max_bytes:
+            if not transparent and quality > MIN_QUALITY:
+                quality = max(MIN_QUALITY, quality - 10)
+            elif min(image.size) > 64:
+                image = image.resize((int(image.width * SHRINK_STEP), int(image.height * SHRINK_STEP)),
+                                     Image.LANCZOS)
+                resized = True
+            else:
+                break
+            data = _encode(image, transparent, quality)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+    base_name, extension = os.path.splitext(os.path.basename(file_path))
+    if len(data) >= len(original) and not resized and not has_metadata:
+        # Re-encoding didn't help and there's nothing to strip
+        data = original
+        file_name, content_type = os.path.basename(file_path), CONTENT_TYPES[extension.lower()]
+    elif transparent:
+        file_name, content_type = f"{base_name}.png", "image/png"
+    else:
+        file_name, content_type = f"{base_name}.jpg", "image/jpeg"
+    return PreparedImage(file_name, data, content_type, len(original), time.perf_counter() - started)
+
+
+def _encode(image, transparent, quality):
+    out = io.BytesIO()
+    if transparent:
+        image.save(out, format="PNG", optimize=True)
+    else:
+        image.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
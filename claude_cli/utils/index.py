@@ -0,0 +1,119 @@
+"""
+Local index of conversation IDs and titles, for shell completion without
+network access
+"""
+import json
+import os
+import sys
+import time
+
+from claude_cli.config import CONFIG_DIR, config_lock
+
+INDEX_PATH = os.path.join(CONFIG_DIR, "conversations.json")
+INDEX_LOCK_PATH = os.path.join(CONFIG_DIR, "conversations.lock")
+# Marks when a background refresh was last started
+REFRESH_MARKER_PATH = os.path.join(CONFIG_DIR, "conversations.refresh")
+
+# The index is refreshed in the background once it is this old...
+INDEX_TTL = 5 * 60
+# ...but at most this often, however many completions ask for it
+REFRESH_INTERVAL = 60
+
+
+def load_index(path=INDEX_PATH):
+    """Return (entries, fetched_at) where entries are [uuid, title, updated_at] lists, newest first."""
+    try:
+        with open(path, 'r') as f:
+            index = json.load(f)
+        return index.get("conversations", []), index.get("fetched_at", 0)
+    except (OSError, ValueError, AttributeError):
+        return [], 0
+
+
+# The entries this process last saved or read, and when they were fetched
+_last_saved = [None, 0]
+
+
+def _update_index(func, fetched=False, path=INDEX_PATH, lock_path=INDEX_LOCK_PATH):
+    """Apply func to the saved entries under the index lock and save the result."""
+    if not fetched:
+        # Edited in place, so the next listing is compared against the file again
+        _last_saved[0] = None
+    try:
+        with config_lock(lock_path):
+            entries, fetched_at = load_index(path)
+            entries = _sorted(func(entries))
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"fetched_at": time.time() if fetched else fetched_at, "conversations": entries}, f)
+            os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def _sorted(entries):
+    return sorted(entries, key=lambda entry: entry[2] or "", reverse=True)
+
+
+def save_index(conversations):
+    """
+    Replace the index with a fresh conversation listing. Every upstream
+    listing (including the check before each message) calls this, so the
+    file is only rewritten when the listing changed or the index is getting
+    stale, not on every call.
+    """
+    entries = _sorted([conv.uuid, conv.title, conv.updated_at or conv.created_at] for conv in conversations)
+    saved, fetched_at = _last_saved
+    if saved is None:
+        saved, fetched_at = load_index()
+    if entries == saved and time.time() - fetched_at < INDEX_TTL / 2:
+        _last_saved[:] = saved, fetched_at
+        return
+    _update_index(lambda _: entries, fetched=True)
+    _last_saved[:] = entries, time.time()
+
+
+def add_to_index(conversation_id, title="", updated_at=None):
+    """Add or update one conversation, e.g. after creating or renaming it."""
+    updated_at = updated_at or time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
+
+    def upsert(entries):
+        entries = [entry for entry in entries if entry[0] != conversation_id]
+        entries.append([conversation_id, title, updated_at])
+        return entries
+    _update_index(upsert)
+
+
+def remove_from_index(conversation_id):
+    _update_index(lambda entries: [entry for entry in entries if entry[0] != conversation_id])
+
+
+def refresh_in_background(ttl=INDEX_TTL):
+    """
+    Start a detached `claude` process that re-fetches the conversation
+    listing if the index is older than ttl. Returns immediately.
+    """
+    _, fetched_at = load_index()
+    now = time.time()
+    if now - fetched_at < ttl:
+        return False
+    try:
+        if now - os.path.getmtime(REFRESH_MARKER_PATH) < REFRESH_INTERVAL:
+            return False
+    except OSError:
+        pass
+    # Only needed here, so completions that don't refresh skip the import
+    import subprocess
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with open(REFRESH_MARKER_PATH, 'w'):
+            pass
+        kwargs = {"start_new_session": True} if os.name != "nt" else {}
+        # The completion environment variable would make the child complete instead of refresh
+        env = {key: value for key, value in os.environ.items() if key != "_CLAUDE_COMPLETE"}
+        subprocess.Popen([sys.executable, "-m", "claude_cli.cli", "refresh-index"],
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         env=env, **kwargs)
+        return True
+    except OSError:
+        return False
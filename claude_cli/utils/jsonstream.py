@@ -0,0 +1,145 @@
+"""
+Incremental JSON decoding of streamed response bodies, so that large
+listings and histories become models without buffering the whole body
+"""
+import codecs
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\r\n"
+_WHITESPACE_RE = re.compile(r"[ \t\r\n]*")
+
+
+class _Reader:
+    """A text buffer over byte chunks, decoded as UTF-8 as they arrive."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.buffer = ""
+        self.pos = 0
+        self.done = False
+
+    def fill(self):
+        """Append the next chunk, dropping the consumed text; False once the body is exhausted."""
+        if self.done:
+            return False
+        text = ""
+        for chunk in self._chunks:
+            text = self._decode(chunk)
+            if text:
+                break
+        else:
+            text = self._decode(b"", True)
+            self.done = True
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(text) or not self.done
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end of the body)."""
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number near the end of the buffer may continue in the next chunk
+            # ("12" + "34", or "1.5" + "e3" where only "1.5e" has arrived)
+            if not self.done and (end == len(self.buffer) or (
+                    end >= len(self.buffer) - 2 and type(value) in (int, float))):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Yield the items of the array starting at the current position."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        scan = _decoder.scan_once
+        skip = _WHITESPACE_RE.match
+        while True:
+            # Fast path: decode the item and find its separator straight from the
+            # buffer; value() and peek() take over at the chunk boundaries
+            buffer = self.buffer
+            try:
+                value, end = scan(buffer, self.pos)
+                if buffer[end] in _WHITESPACE:
+                    end = skip(buffer, end).end()
+                separator = buffer[end]
+            except (StopIteration, json.JSONDecodeError, IndexError):
+                separator = None
+            if separator != "," and separator != "]":
+                # Runs past the buffer (a number may even look complete), or is invalid
+                value = self.value()
+                separator = self.peek()
+                end = self.pos
+                buffer = self.buffer
+            yield value
+            if separator == "]":
+                self.pos = end + 1
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, end)
+            end += 1
+            if end < len(buffer) and buffer[end] in _WHITESPACE:
+                end = skip(buffer, end).end()
+            self.pos = end
+
+
+def iter_array(chunks):
+    """Yield the items of a top-level JSON array from byte chunks, each as soon as it is complete."""
+    return _Reader(chunks).items()
+
+
+def load_object(chunks, arrays=None):
+    """
+    Decode a top-level JSON object from byte chunks. For keys in arrays (a
+    {key: convert} dict) whose value is an array, each item is passed
+    through convert as soon as it is decoded, so the raw items never all
+    exist at once.
+    """
+    arrays = arrays or {}
+    reader = _Reader(chunks)
+    reader.expect("{")
+    result = {}
+    if reader.peek() == "}":
+        return result
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        convert = arrays.get(key)
+        if convert is not None and reader.peek() == "[":
+            result[key] = [convert(item) for item in reader.items()]
+        else:
+            result[key] = reader.value()
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "}":
+            return result
+        if separator != ",":
+            raise json.JSONDecodeError("Expecting ',' delimiter", reader.buffer, reader.pos - 1)
@@ -0,0 +1,154 @@
+"""
+Local request metrics kept as fixed-bucket histograms, for `claude stats`
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+
+from claude_cli.config import CONFIG_DIR, config_lock
+
+METRICS_PATH = os.path.join(CONFIG_DIR, "metrics.json")
+METRICS_LOCK_PATH = os.path.join(CONFIG_DIR, "metrics.lock")
+
+# Latency bucket i holds samples in (BASE * GROWTH**(i-1), BASE * GROWTH**i];
+# 1 ms to ~17 min in 63 buckets, so estimates are within about 12%
+BUCKET_BASE = 0.001
+BUCKET_GROWTH = 1.25
+BUCKET_COUNT = 63
+
+# Hourly slots older than this are dropped, which bounds the file size
+RETENTION_DAYS = 30
+
+_COUNTERS = ("count", "errors", "retries", "cancelled", "bytes", "chars", "busy_seconds")
+
+
+def bucket_index(seconds):
+    if seconds <= BUCKET_BASE:
+        return 0
+    return min(BUCKET_COUNT - 1, int(math.ceil(math.log(seconds / BUCKET_BASE, BUCKET_GROWTH))))
+
+
+def bucket_value(index):
+    """A representative latency for a bucket (the geometric middle of its range)."""
+    if index == 0:
+        return BUCKET_BASE
+    return BUCKET_BASE * BUCKET_GROWTH ** (index - 0.5)
+
+
+def percentile(histogram, pct):
+    """Estimate a percentile from a {bucket index: count} histogram (None if empty)."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = pct / 100 * total
+    seen = 0
+    for index in sorted(histogram, key=int):
+        seen += histogram[index]
+        if seen >= rank:
+            return bucket_value(int(index))
+    return bucket_value(int(max(histogram, key=int)))
+
+
+def _merge(into, slot):
+    for name in _COUNTERS:
+        into[name] = into.get(name, 0) + slot.get(name, 0)
+    for name in ("latency", "first_byte"):
+        histogram = into.setdefault(name, {})
+        for index, count in slot.get(name, {}).items():
+            histogram[index] = histogram.get(index, 0) + count
+
+
+class MetricsStore:
+    """
+    Per-operation request metrics, aggregated into one slot per hour.
+
+    Each slot holds counters (requests, errors, retries, cancellations, bytes,
+    characters) and latency histograms with fixed buckets, so the file stays
+    small however many requests are made. Samples are buffered in memory and
+    merged into the file under a lock when the process exits.
+    """
+
+    def __init__(self, path=METRICS_PATH, lock_path=METRICS_LOCK_PATH, retention_days=RETENTION_DAYS):
+        self.path = path
+        self.lock_path = lock_path
+        self.retention = retention_days * 86400
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._registered = False
+
+    def record(self, op, latency=None, first_byte=None, bytes=0, chars=0, error=False, retries=0,
+               cancelled=False):
+        """Buffer one request's measurements."""
+        hour = str(int(time.time() // 3600 * 3600))
+        with self._lock:
+            slot = self._pending.setdefault(hour, {}).setdefault(op, {})
+            slot["count"] = slot.get("count", 0) + 1
+            slot["errors"] = slot.get("errors", 0) + bool(error)
+            slot["retries"] = slot.get("retries", 0) + retries
+            slot["cancelled"] = slot.get("cancelled", 0) + bool(cancelled)
+            slot["bytes"] = slot.get("bytes", 0) + bytes
+            for name, value in (("latency", latency), ("first_byte", first_byte)):
+                if value is not None and not error and not cancelled:
+                    histogram = slot.setdefault(name, {})
+                    index = str(bucket_index(value))
+                    histogram[index] = histogram.get(index, 0) + 1
+            if chars and latency and not error:
+                slot["chars"] = slot.get("chars", 0) + chars
+                slot["busy_seconds"] = slot.get("busy_seconds", 0) + latency
+            if not self._registered:
+                atexit.register(self.flush)
+                self._registered = True
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        """Merge the buffered samples into the file and drop expired slots."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with config_lock(self.lock_path):
+                hours = self.load()
+                for hour, ops in pending.items():
+                    for op, slot in ops.items():
+                        _merge(hours.setdefault(hour, {}).setdefault(op, {}), slot)
+                cutoff = time.time() - self.retention
+                hours = {hour: ops for hour, ops in hours.items() if int(hour) >= cutoff}
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump(hours, f, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def summarize(self, since=None, period=None):
+        """
+        Aggregate saved (and buffered) slots newer than since (epoch seconds).
+
+        Returns {(period start, op): slot}; period is None for one total per
+        operation, or a length in seconds (3600, 86400) to split by time.
+        """
+        hours = self.load()
+        with self._lock:
+            for hour, ops in self._pending.items():
+                for op, slot in ops.items():
+                    _merge(hours.setdefault(hour, {}).setdefault(op, {}), slot)
+
+        summary = {}
+        for hour, ops in hours.items():
+            start = int(hour)
+            if since is not None and start + 3600 <= since:
+                continue
+            key = start // period * period if period else None
+            for op, slot in ops.items():
+                _merge(summary.setdefault((key, op), {}), slot)
+        return summary
@@ -0,0 +1,221 @@
+"""
+Compact data models for Claude conversations, messages and attachments
+"""
+import sys
+
+
+def _intern(value):
+    """Intern short, frequently repeated strings such as senders and timestamps."""
+    if isinstance(value, str) and len(value) <= 64:
+        return sys.intern(value)
+    return value
+
+
+class _Model:
+    """
+    Base class giving the slotted models read-only dict-style access,
+    so code written against the raw API dicts keeps working.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self._fields() and getattr(self, key, None) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self._fields() else None
+        return default if value is None else value
+
+    @classmethod
+    def _fields(cls):
+        return [name for name in cls.__slots__ if not name.startswith('_')]
+
+
+class Attachment(_Model):
+    """A file attached to a message."""
+    __slots__ = ('file_name', 'file_type', 'file_size', 'extracted_content', 'extra')
+
+    def __init__(self, file_name, file_type, file_size=0, extracted_content='', extra=None):
+        self.file_name = file_name
+        self.file_type = _intern(file_type)
+        self.file_size = file_size
+        self.extracted_content = extracted_content
+        self.extra = extra
+
+    @classmethod
+    def _fields(cls):
+        return ['file_name', 'file_type', 'file_size', 'extracted_content']
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build an attachment from an API dict."""
+        extra = {k: v for k, v in data.items()
+                 if k not in ('file_name', 'file_type', 'file_size', 'extracted_content')}
+        return cls(
+            data.get('file_name', ''),
+            data.get('file_type', ''),
+            data.get('file_size', 0),
+            data.get('extracted_content') or '',
+            extra or None,
+        )
+
+    def to_dict(self):
+        """Convert back into the dict shape the API expects."""
+        data = dict(self.extra or {})
+        data.update({
+            "file_name": self.file_name,
+            "file_type": self.file_type,
+            "file_size": self.file_size,
+            "extracted_content": self.extracted_content
+        })
+        return data
+
+    def __repr__(self):
+        return f"Attachment(file_name={self.file_name!r}, file_size={self.file_size})"
+
+
+class Message(_Model):
+    """A single chat message."""
+    __slots__ = ('uuid', 'sender', 'created_at', 'index', 'attachments', '_content', '_text')
+
+    def __init__(self, uuid, sender, created_at='', index=0, content=None, attachments=(), text=None):
+        self.uuid = uuid
+        self.sender = _intern(sender)
+        self.created_at = _intern(created_at)
+        self.index = index
+        self.attachments = attachments
+        self._content = content
+        self._text = text
+
+    @property
+    def text(self):
+        """Message text, joined from the content blocks on first access."""
+        if self._text is None:
+            blocks = self._content or ()
+            self._text = ''.join(
+                block.get('text', '') for block in blocks if isinstance(block, dict)
+            )
+            self._content = None
+        return self._text
+
+    @property
+    def is_human(self):
+        return self.sender == 'human'
+
+    @classmethod
+    def _fields(cls):
+        return ['uuid', 'sender', 'created_at', 'index', 'attachments', 'text']
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a message from an API dict, leaving its text undecoded."""
+        body = data.get('message') if isinstance(data.get('message'), dict) else data
+        return cls.from_fields(
+            data.get('uuid', ''),
+            data.get('sender', ''),
+            data.get('created_at', ''),
+            data.get('index', 0),
+            body.get('content'),
+            data.get('text'),
+            data.get('attachments'),
+        )
+
+    @classmethod
+    def from_fields(cls, uuid, sender, created_at, index, content, text, attachments):
+        """Build a message from decoded fields: content blocks (or a string) win over text."""
+        if content:
+            text = None
+        if isinstance(content, str):
+            text, content = content, None
+        attachments = tuple(Attachment.from_dict(a) for a in attachments or ())
+        return cls(uuid, sender, created_at, index, content, attachments, text)
+
+    def to_dict(self):
+        return {
+            "uuid": self.uuid,
+            "sender": self.sender,
+            "created_at": self.created_at,
+            "index": self.index,
+            "text": self.text,
+            "attachments": [a.to_dict() for a in self.attachments]
+        }
+
+    def __repr__(self):
+        return f"Message(uuid={self.uuid!r}, sender={self.sender!r})"
+
+
+class Conversation(_Model):
+    """A conversation, either from a listing or with its full message history."""
+    __slots__ = ('uuid', 'name', 'summary', 'created_at', 'updated_at', '_messages', 'extra')
+
+    _KEYS = ('uuid', 'name', 'summary', 'created_at', 'updated_at', 'chat_messages')
+
+    def __init__(self, uuid, name='', summary='', created_at='', updated_at='', messages=None, extra=None):
+        self.uuid = uuid
+        self.name = name
+        self.summary = summary
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self._messages = messages
+        # Any other fields of the API dict, so that to_dict() loses nothing
+        self.extra = extra
+
+    @property
+    def title(self):
+        return self.name or 'Untitled'
+
+    @property
+    def chat_messages(self):
+        """Messages in this conversation, built from the raw dicts on first access."""
+        messages = self._messages
+        if messages is None:
+            return []
+        if messages and isinstance(messages[0], dict):
+            messages = [Message.from_dict(m) for m in messages]
+            self._messages = messages
+        return messages
+
+    @property
+    def message_count(self):
+        return len(self._messages) if self._messages else 0
+
+    @classmethod
+    def _fields(cls):
+        return [*cls._KEYS]
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a conversation from an API dict."""
+        extra = {k: v for k, v in data.items() if k not in cls._KEYS}
+        return cls(
+            data.get('uuid', ''),
+            data.get('name') or '',
+            data.get('summary') or '',
+            data.get('created_at') or '',
+            data.get('updated_at') or '',
+            data.get('chat_messages'),
+            extra or None,
+        )
+
+    def to_dict(self):
+        data = dict(self.extra or {})
+        data.update({
+            "uuid": self.uuid,
+            "name": self.name,
+            "summary": self.summary,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        })
+        if self._messages is not None:
+            data["chat_messages"] = [
+                m if isinstance(m, dict) else m.to_dict() for m in self._messages
+            ]
+        return data
+
+    def __repr__(self):
+        return f"Conversation(uuid={self.uuid!r}, name={self.name!r})"
@@ -0,0 +1,111 @@
+"""
+Pool of pre-created empty conversations, so queries don't wait on create_new_chat
+"""
+import threading
+import time
+
+from claude_cli.config import update_config
+from claude_cli.utils import tracing
+
+DEFAULT_POOL_TTL = 6 * 3600
+
+
+class ConversationPool:
+    """
+    A small pool of empty conversations kept in the config file.
+
+    Each invocation takes one conversation from the pool instantly and tops
+    the pool back up in the background while its own request is running.
+    Conversations older than the TTL are deleted instead of being handed out.
+    """
+
+    def __init__(self, config, debug=False):
+        self.size = int(config.get('pool_size', 0) or 0)
+        self.ttl = int(config.get('pool_ttl', DEFAULT_POOL_TTL))
+        self.debug = debug
+
+    def _note(self, name, message, **args):
+        """Record a trace event for a pool decision, and print message with --debug."""
+        tracing.event(name, cat="pool", message=message, **args)
+        if self.debug:
+            print(message)
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def _is_fresh(self, entry, organization_id, now):
+        return (entry.get('organization_id') == organization_id
+                and now - entry.get('created_at', 0) < self.ttl)
+
+    def take(self, organization_id):
+        """Remove and return a fresh pooled conversation ID, or None if the pool is empty."""
+        if not self.enabled:
+            return None
+
+        def pop(config):
+            now = time.time()
+            pool = config.get('conversation_pool', [])
+            for i, entry in enumerate(pool):
+                if self._is_fresh(entry, organization_id, now):
+                    del pool[i]
+                    return entry['uuid']
+            return None
+
+        conversation_id = update_config(pop)
+        self._note("pool_take", f"Conversation pool: {'took ' + conversation_id if conversation_id else 'empty'}",
+                   conversation_id=conversation_id)
+        return conversation_id
+
+    def refill(self, claude):
+        """Reap expired conversations and create new ones until the pool is full."""
+        now = time.time()
+
+        def reap(config):
+            pool = config.get('conversation_pool', [])
+            fresh = [e for e in pool if self._is_fresh(e, claude.organization_id, now)]
+            expired = [e for e in pool if e not in fresh]
+            # Entries from other organizations are left for the account they belong to
+            config['conversation_pool'] = fresh + [
+                e for e in expired if e.get('organization_id') != claude.organization_id
+            ]
+            return [e['uuid'] for e in expired if e.get('organization_id') == claude.organization_id], len(fresh)
+
+        expired, available = update_config(reap)
+        for conversation_id in expired:
+            self._note("pool_reap", f"Conversation pool: reaping expired {conversation_id}",
+                       conversation_id=conversation_id)
+            claude.delete_conversation(conversation_id)
+
+        created = []
+        for _ in range(self.size - available):
+            conversation = claude.create_new_chat()
+            if 'error' in conversation:
+                self._note("pool_create_failed", f"Conversation pool: create failed: {conversation['error']}",
+                           error=conversation['error'])
+                break
+            created.append({
+                'uuid': conversation.uuid,
+                'organization_id': claude.organization_id,
+                'created_at': time.time()
+            })
+
+        if created:
+            update_config(lambda config: config.setdefault('conversation_pool', []).extend(created))
+            self._note("pool_refill", f"Conversation pool: added {len(created)} conversation(s)",
+                       added=len(created))
+
+    def refill_in_background(self, claude):
+        """Start refilling on a worker thread; the process waits for it before exiting."""
+        if not self.enabled:
+            return None
+
+        def run():
+            try:
+                self.refill(claude)
+            except Exception as e:
+                self._note("pool_refill_failed", f"Conversation pool: refill failed: {str(e)}", error=str(e))
+
+        thread = threading.Thread(target=run, name="conversation-pool-refill")
+        thread.start()
+        return thread
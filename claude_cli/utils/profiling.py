@@ -0,0 +1,184 @@
+"""
+Built-in profiling for the --profile option: cProfile, tracemalloc and a
+wall-clock breakdown by phase
+"""
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from claude_cli.utils import tracing
+
+# The active profiler, or None when profiling is off
+_active = None
+
+PHASES = ("startup", "client init", "network", "parse", "render")
+
+
+def phase(name):
+    """
+    Attribute the wall-clock time of a block to a phase, and trace it as a
+    span when --trace is on (free when both are off).
+    """
+    profiler = _active
+    if profiler is None:
+        return tracing.span(name, cat="phase")
+    if not tracing.enabled():
+        return profiler.phase(name)
+    return _profiled_span(profiler, name)
+
+
+@contextmanager
+def _profiled_span(profiler, name):
+    with profiler.phase(name), tracing.span(name, cat="phase"):
+        yield
+
+
+class _Timeline:
+    """Phase bookkeeping for one thread."""
+
+    __slots__ = ("stack", "mark", "times")
+
+    def __init__(self, times, mark):
+        self.stack = []
+        self.mark = mark
+        self.times = times
+
+
+class Profiler:
+    """
+    Profiles one command run.
+
+    Phase times are exclusive: time spent in a nested phase (say, network
+    inside client init) is only counted once, for the innermost phase. The
+    breakdown is the main thread's wall clock; the time worker threads
+    (uploads, hedged reads, pool refills) spend in phases is summed
+    separately. cProfile covers every thread started while profiling.
+    """
+
+    def __init__(self, output_prefix, started_at=None, top=25):
+        self.output_prefix = output_prefix
+        self.top = top
+        self.started_at = started_at
+        self.times = {name: 0.0 for name in PHASES}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._main = None
+        self._workers = []
+        self._profile = cProfile.Profile()
+        self._thread_profiles = []
+
+    def start(self):
+        global _active
+        now = time.perf_counter()
+        if self.started_at is not None:
+            self.times["startup"] = now - self.started_at
+        self._start = now
+        self._main = self._local.timeline = _Timeline(self.times, now)
+        tracemalloc.start(10)
+        if sys.version_info < (3, 12):
+            # Before 3.12 a cProfile.Profile only sees the thread that enabled it
+            threading.setprofile(self._profile_thread)
+        self._profile.enable()
+        _active = self
+
+    def _profile_thread(self, frame, event, arg):
+        """Installed in each new thread: swap itself for a cProfile of that thread."""
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        with self._lock:
+            if _active is not self:
+                return
+            self._thread_profiles.append(profile)
+        profile.enable()
+
+    def _timeline(self):
+        timeline = getattr(self._local, "timeline", None)
+        if timeline is None:
+            timeline = self._local.timeline = _Timeline({}, time.perf_counter())
+            with self._lock:
+                self._workers.append(timeline)
+        return timeline
+
+    @contextmanager
+    def phase(self, name):
+        timeline = self._timeline()
+        self._switch(timeline)
+        timeline.stack.append(name)
+        try:
+            yield
+        finally:
+            self._switch(timeline)
+            timeline.stack.pop()
+
+    def _switch(self, timeline):
+        """Charge the time since the thread's last switch to the phase it was running."""
+        now = time.perf_counter()
+        if timeline.stack:
+            current = timeline.stack[-1]
+        else:
+            # A worker's time outside phases is mostly spent idle in a pool
+            current = "other" if timeline is self._main else None
+        if current is not None:
+            timeline.times[current] = timeline.times.get(current, 0.0) + now - timeline.mark
+        timeline.mark = now
+
+    def stop(self):
+        """Stop profiling, write the reports and return the summary text."""
+        global _active
+        self._profile.disable()
+        with self._lock:
+            _active = None
+            thread_profiles = [*self._thread_profiles]
+        if sys.version_info < (3, 12):
+            threading.setprofile(None)
+        self._switch(self._main)
+        worker_times = {}
+        with self._lock:
+            workers = [*self._workers]
+        for timeline in workers:
+            for name, seconds in timeline.times.items():
+                worker_times[name] = worker_times.get(name, 0.0) + seconds
+        total = time.perf_counter() - self._start + self.times["startup"]
+
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        stats = pstats.Stats(self._profile)
+        for profile in thread_profiles:
+            # Threads still running keep their profiles enabled; their calls so far are included
+            profile.create_stats()
+            if profile.stats:
+                stats.add(profile)
+        pstats_path = f"{self.output_prefix}.pstats"
+        stats.dump_stats(pstats_path)
+
+        out = io.StringIO()
+        out.write(f"Wall-clock breakdown (total {total:.3f}s)\n")
+        for name, seconds in sorted(self.times.items(), key=lambda item: -item[1]):
+            share = 100 * seconds / total if total else 0
+            out.write(f"  {name:<12} {seconds:8.3f}s  {share:5.1f}%\n")
+        if worker_times:
+            out.write(f"Worker threads ({len(workers)}, summed)\n")
+            for name, seconds in sorted(worker_times.items(), key=lambda item: -item[1]):
+                out.write(f"  {name:<12} {seconds:8.3f}s\n")
+
+        out.write(f"\nTop {self.top} functions by cumulative time\n")
+        stats.stream = out
+        stats.strip_dirs().sort_stats("cumulative").print_stats(self.top)
+
+        out.write(f"Memory: peak traced {peak / 1024 / 1024:.2f} MiB\n")
+        out.write(f"Top {self.top} allocation sites\n")
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            out.write(f"  {stat}\n")
+
+        summary = out.getvalue()
+        summary_path = f"{self.output_prefix}.txt"
+        with open(summary_path, "w") as f:
+            f.write(summary)
+        return summary, pstats_path, summary_path
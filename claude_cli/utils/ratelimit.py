@@ -0,0 +1,123 @@
+"""
+Client-side token-bucket rate limiting shared by every claude process
+"""
+import json
+import os
+import time
+
+from claude_cli.config import CONFIG_DIR, config_lock
+
+RATE_STATE_PATH = os.path.join(CONFIG_DIR, "ratelimit.json")
+RATE_LOCK_PATH = os.path.join(CONFIG_DIR, "ratelimit.lock")
+
+# Operation classes requests are grouped into
+OPERATIONS = ("completion", "list", "upload", "delete", "write")
+
+# The adaptive rate never drops below this fraction of the configured rate
+MIN_RATE_FRACTION = 0.05
+
+
+class RateLimiter:
+    """
+    Token buckets per operation class, stored in a lock-protected state file
+    so that all processes on the machine draw from the same buckets.
+
+    limits maps an operation class to {"rate": tokens per second, "burst": size}.
+    Operations without a configured limit are not throttled. When the server
+    answers 429 the shared rate is halved, and each success raises it back
+    towards the configured rate, so concurrent processes settle on the highest
+    rate the service sustains instead of alternating bursts and backoff.
+    """
+
+    def __init__(self, limits, state_path=RATE_STATE_PATH, lock_path=RATE_LOCK_PATH):
+        self.limits = {op: limit for op, limit in (limits or {}).items() if limit}
+        for op, limit in self.limits.items():
+            try:
+                rate = float(limit['rate'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError(f"rate_limits.{op} needs a numeric rate (requests per second)")
+            if rate <= 0:
+                raise ValueError(f"rate_limits.{op}.rate must be above 0; remove the entry to stop limiting {op}")
+        self.state_path = state_path
+        self.lock_path = lock_path
+        # The shared rate per operation as last read from the state file
+        self._rates = {}
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state):
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _bucket(self, state, op, now):
+        """Return the bucket for op with its tokens refilled up to now."""
+        limit = self.limits[op]
+        burst = float(limit.get('burst', 1))
+        rate = float(limit['rate'])
+        bucket = state.setdefault(op, {"tokens": burst, "updated": now, "rate": rate})
+        # The state file may predate a lower configured rate, or come from a process configured differently
+        bucket["rate"] = min(max(bucket["rate"], rate * MIN_RATE_FRACTION), rate)
+        elapsed = max(0.0, now - bucket["updated"])
+        bucket["tokens"] = min(burst, bucket["tokens"] + elapsed * bucket["rate"])
+        bucket["updated"] = now
+        self._rates[op] = bucket["rate"]
+        return bucket
+
+    def acquire(self, op):
+        """Take a token for op, sleeping until one is available. Returns the time waited."""
+        if op not in self.limits:
+            return 0.0
+
+        with config_lock(self.lock_path):
+            state = self._load()
+            now = time.time()
+            bucket = self._bucket(state, op, now)
+            # Reserve the token now; a negative balance makes later callers queue behind us
+            bucket["tokens"] -= 1
+            wait = 0.0
+            if bucket["tokens"] < 0:
+                wait = -bucket["tokens"] / bucket["rate"]
+            wait = max(wait, bucket.get("blocked_until", 0) - now)
+            self._save(state)
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def penalize(self, op, retry_after=None):
+        """Record a 429 for op: halve the shared rate and honour Retry-After."""
+        if op not in self.limits:
+            return
+        with config_lock(self.lock_path):
+            state = self._load()
+            now = time.time()
+            bucket = self._bucket(state, op, now)
+            floor = float(self.limits[op]['rate']) * MIN_RATE_FRACTION
+            bucket["rate"] = self._rates[op] = max(floor, bucket["rate"] / 2)
+            bucket["tokens"] = min(bucket["tokens"], 0.0)
+            if retry_after:
+                bucket["blocked_until"] = now + retry_after
+            self._save(state)
+
+    def reward(self, op):
+        """Record a success for op: raise the shared rate back towards the configured one."""
+        if op not in self.limits:
+            return
+        configured = float(self.limits[op]['rate'])
+        # Nothing to raise: skip the lock and the file. A 429 seen by another
+        # process is picked up by the next acquire().
+        if self._rates.get(op, 0.0) >= configured:
+            return
+        with config_lock(self.lock_path):
+            state = self._load()
+            bucket = self._bucket(state, op, time.time())
+            if bucket["rate"] < configured:
+                bucket["rate"] = self._rates[op] = min(configured, bucket["rate"] + configured * MIN_RATE_FRACTION)
+                self._save(state)
@@ -0,0 +1,94 @@
+"""
+Single-flight coalescing of identical concurrent calls, with an optional micro-TTL cache
+"""
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'generation')
+
+    def __init__(self, generation):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.generation = generation
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time.
+
+    Callers that ask for a key while a call for it is already in flight wait
+    for that call and share its result (or its exception). If ttl is set,
+    successful results are also served from memory for ttl seconds.
+    Expired results are purged as calls come in, at most once per ttl.
+    """
+
+    def __init__(self, ttl=0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._cache = {}
+        self._next_purge = 0.0
+        # Bumped by forget(), so a call started before it doesn't cache a stale result
+        self._generation = 0
+        self.stats = {"calls": 0, "upstream": 0, "coalesced": 0, "cache_hits": 0}
+
+    def do(self, key, func):
+        """Return func()'s result, sharing it with concurrent callers for the same key."""
+        with self._lock:
+            self.stats["calls"] += 1
+            now = time.monotonic()
+            if self._cache and now >= self._next_purge:
+                self._cache = {k: entry for k, entry in self._cache.items() if entry[0] > now}
+                self._next_purge = now + self.ttl
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] > now:
+                self.stats["cache_hits"] += 1
+                return cached[1]
+
+            call = self._calls.get(key)
+            if call is not None:
+                self.stats["coalesced"] += 1
+                leader = False
+            else:
+                call = _Call(self._generation)
+                self._calls[key] = call
+                self.stats["upstream"] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                if call.error is None and self.ttl > 0 and call.generation == self._generation:
+                    self._cache[key] = (time.monotonic() + self.ttl, call.result)
+            call.done.set()
+        return call.result
+
+    def forget(self, key=None):
+        """
+        Drop the cached result for key, or every cached result if key is None.
+        Calls already in flight still answer their waiters, but their results
+        aren't cached and later callers start a fresh call.
+        """
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._cache.clear()
+                self._calls.clear()
+            else:
+                self._cache.pop(key, None)
+                self._calls.pop(key, None)
@@ -0,0 +1,107 @@
+"""
+Persistent memory of which completion endpoint/payload strategies work
+"""
+import json
+import os
+import threading
+import time
+
+from claude_cli.config import CONFIG_DIR, config_lock
+
+STRATEGY_PATH = os.path.join(CONFIG_DIR, "strategies.json")
+STRATEGY_LOCK_PATH = os.path.join(CONFIG_DIR, "strategies.lock")
+
+# A strategy that failed this many times in a row is skipped...
+DEAD_AFTER_FAILURES = 3
+# ...until this many seconds have passed, when it is probed again
+PROBE_INTERVAL = 30 * 60
+
+# Responses that can mean the strategy itself is wrong (a moved endpoint or a
+# changed payload format). They are only counted against a strategy when
+# another one then succeeds for the same message, and a 404 that names the
+# conversation is never counted. Rate limiting, auth and server errors,
+# timeouts and connection errors say nothing about the strategy.
+FAILURE_STATUSES = (400, 404)
+
+# Weight of the newest sample in the latency moving average
+LATENCY_ALPHA = 0.3
+
+
+class StrategyRegistry:
+    """
+    Records success rates and latencies of named strategies on disk and
+    orders them so the one most likely to work quickly is tried first.
+    """
+
+    def __init__(self, path=STRATEGY_PATH, lock_path=STRATEGY_LOCK_PATH):
+        self.path = path
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._stats = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _is_dead(self, stats, now):
+        return (stats.get("consecutive_failures", 0) >= DEAD_AFTER_FAILURES
+                and now - stats.get("last_failure", 0) < PROBE_INTERVAL)
+
+    def order(self, names):
+        """
+        Return names in the order they should be tried.
+
+        The strategy that succeeded most recently comes first, then the rest by
+        success rate and latency. Dead strategies are left out until their
+        probe is due, except the one that succeeded most recently, which is
+        tried after the others; if every strategy is dead they are all
+        returned, the least recently failed first.
+        """
+        now = time.time()
+        with self._lock:
+            stats = {name: dict(self._stats.get(name, {})) for name in names}
+
+        def score(name):
+            s = stats[name]
+            attempts = s.get("successes", 0) + s.get("failures", 0)
+            # Untried strategies get the benefit of the doubt
+            success_rate = s.get("successes", 0) / attempts if attempts else 0.5
+            return (-s.get("last_success", 0), -success_rate, s.get("latency", 0.0))
+
+        alive = [name for name in names if not self._is_dead(stats[name], now)]
+        if not alive:
+            return sorted(names, key=lambda name: stats[name].get("last_failure", 0))
+        ordered = sorted(alive, key=score)
+        # Never give up on the last strategy known to work
+        last_good = max(names, key=lambda name: stats[name].get("last_success", 0))
+        if stats[last_good].get("last_success") and last_good not in ordered:
+            ordered.append(last_good)
+        return ordered
+
+    def record(self, name, success, latency=None):
+        """Record the outcome of one attempt and persist it."""
+        with self._lock, config_lock(self.lock_path):
+            # Merge with what other processes have written since we loaded
+            self._stats.update(self._load())
+            s = self._stats.setdefault(name, {})
+            now = time.time()
+            if success:
+                s["successes"] = s.get("successes", 0) + 1
+                s["consecutive_failures"] = 0
+                s["last_success"] = now
+                if latency is not None:
+                    previous = s.get("latency")
+                    s["latency"] = round(latency if previous is None else
+                                         LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * previous, 3)
+            else:
+                s["failures"] = s.get("failures", 0) + 1
+                s["consecutive_failures"] = s.get("consecutive_failures", 0) + 1
+                s["last_failure"] = now
+
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._stats, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,199 @@
+"""
+Local stand-in for the claude.ai API, for benchmarks and long-running tests
+"""
+import gzip
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_ORGANIZATION_ID = "00000000-0000-4000-8000-000000000000"
+
+_CONVERSATION_RE = re.compile(r"^/api/organizations/[^/]+/chat_conversations(?:/([^/]+))?(/completion)?$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; with Nagle, small bodies would wait for a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body=b"", content_type="application/json", gzipped=None):
+        """Send a body, gzip-compressed (gzipped, if already at hand) when the client accepts it."""
+        stub = self.server.stub
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        compress = (stub.compress and len(body) >= 1024
+                    and "gzip" in self.headers.get("Accept-Encoding", ""))
+        if compress:
+            body = gzipped or gzip.compress(body, compresslevel=6)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if compress:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        stub.count_sent(len(body))
+
+    def _send_events(self):
+        """Stream a completion as chunked server-sent events."""
+        stub = self.server.stub
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(stub.events):
+            event = f"data: {json.dumps({'completion': stub.event_text})}\n\n".encode("utf-8")
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(event), event))
+            self.wfile.flush()
+            if stub.event_delay:
+                time.sleep(stub.event_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        stub = self.server.stub
+        if self.path == "/api/organizations":
+            return self._send(200, [{"uuid": STUB_ORGANIZATION_ID}])
+        match = _CONVERSATION_RE.match(self.path)
+        if match and not match.group(1):
+            return self._send(200, stub.listing, gzipped=stub.gzipped_listing if stub.compress else None)
+        if match and not match.group(2):
+            return self._send(200, stub.history(match.group(1)))
+        self._send(404, {"error": {"type": "not_found_error", "message": "Not found"}})
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = self._read_body()
+        if self.path == "/api/convert_document":
+            return self._send(200, {"file_name": "upload", "file_type": "application/octet-stream",
+                                    "file_size": len(body), "extracted_content": "converted text"})
+        if self.path == "/api/rename_chat":
+            return self._send(200, {})
+        if self.path == "/api/append_message":
+            return self._send_events()
+        match = _CONVERSATION_RE.match(self.path)
+        if match and match.group(2):
+            return self._send_events()
+        if match:
+            try:
+                new_uuid = json.loads(body).get("uuid") or str(uuid.uuid4())
+            except ValueError:
+                new_uuid = str(uuid.uuid4())
+            stub.add(new_uuid)
+            return self._send(200, {"uuid": new_uuid, "name": ""})
+        self._send(404, {"error": {"type": "not_found_error", "message": "Not found"}})
+
+    def do_DELETE(self):
+        self._read_body()
+        match = _CONVERSATION_RE.match(self.path)
+        if match and match.group(1):
+            self.server.stub.remove(match.group(1))
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send(404, {"error": {"type": "not_found_error", "message": "Not found"}})
+
+
+class StubServer:
+    """
+    Serves the claude.ai endpoints EnhancedClient uses on a local port.
+
+    Point a client at it with RebaseTransport(inner, server.url). The listing
+    holds `conversations` entries, histories hold `messages` messages and
+    completions stream `events` events, `event_delay` seconds apart. JSON
+    bodies are gzip-compressed for clients that accept it unless compress is
+    False; bytes_sent counts the response body bytes put on the wire.
+    """
+
+    def __init__(self, conversations=100, messages=10, events=50, event_delay=0.0,
+                 event_text="lorem ipsum ", host="127.0.0.1", port=0, compress=True):
+        self.messages = messages
+        self.events = events
+        self.event_delay = event_delay
+        self.event_text = event_text
+        self.compress = compress
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._ids = [str(uuid.uuid4()) for _ in range(conversations)]
+        self._listing = None
+        self._gzipped_listing = None
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def listing(self):
+        with self._lock:
+            if self._listing is None:
+                self._listing = json.dumps([
+                    {"uuid": conversation_id, "name": f"Conversation {i}", "summary": "",
+                     "created_at": "2024-01-01T00:00:00.000000+00:00",
+                     "updated_at": "2024-01-01T00:00:00.000000+00:00"}
+                    for i, conversation_id in enumerate(self._ids)
+                ]).encode("utf-8")
+            return self._listing
+
+    @property
+    def gzipped_listing(self):
+        listing = self.listing
+        with self._lock:
+            if self._gzipped_listing is None or self._gzipped_listing[0] is not listing:
+                self._gzipped_listing = (listing, gzip.compress(listing, compresslevel=6))
+            return self._gzipped_listing[1]
+
+    def count_sent(self, size):
+        with self._lock:
+            self.bytes_sent += size
+
+    def history(self, conversation_id):
+        return {
+            "uuid": conversation_id,
+            "name": "Conversation",
+            "chat_messages": [
+                {"uuid": str(uuid.uuid4()), "sender": "human" if i % 2 == 0 else "assistant", "index": i,
+                 "content": [{"type": "text", "text": self.event_text * 20}]}
+                for i in range(self.messages)
+            ]
+        }
+
+    def add(self, conversation_id):
+        with self._lock:
+            self._ids.append(conversation_id)
+            self._listing = None
+
+    def remove(self, conversation_id):
+        with self._lock:
+            if conversation_id in self._ids:
+                self._ids.remove(conversation_id)
+                self._listing = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="claude-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,140 @@
+"""
+Structured tracing for the --trace option: spans and events kept in an
+in-memory ring and exported as Chrome trace-event JSON
+"""
+import collections
+import os
+import threading
+import time
+
+# The active tracer, or None when tracing is off
+_active = None
+
+# Events kept before the oldest are dropped (roughly 200 bytes each)
+DEFAULT_CAPACITY = 200000
+
+
+class _NoopSpan:
+    """Returned by span() when tracing is off, so disabled spans allocate nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def enabled():
+    return _active is not None
+
+
+def span(name, cat="client", **args):
+    """
+    Trace a block as one span:
+
+        with span("request", op="list") as s:
+            ...
+            s.set(status=200)
+
+    Free when tracing is off apart from the call itself.
+    """
+    if _active is None:
+        return _NOOP
+    return Span(_active, name, cat, args)
+
+
+def event(name, cat="client", **args):
+    """Record a point-in-time event (no-op when tracing is off)."""
+    if _active is not None:
+        _active.instant(name, cat, args)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def set(self, **args):
+        """Attach results (status codes, sizes, ...) to the span."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer.complete(self.name, self.cat, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+
+class Tracer:
+    """
+    Collects spans and events from every thread into a bounded ring.
+
+    Appending to a deque is atomic, so recording takes no lock; once the
+    ring is full the oldest events are dropped. Events are kept as tuples
+    and only turned into trace-event dicts on export.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self._events = collections.deque(maxlen=capacity)
+        self._threads = {}
+        self._recorded = 0
+        self._origin = time.perf_counter_ns()
+
+    def start(self):
+        global _active
+        _active = self
+
+    def _thread(self):
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        return tid
+
+    def complete(self, name, cat, start, end, args):
+        self._events.append(("X", name, cat, start, end - start, self._thread(), args))
+        self._recorded += 1
+
+    def instant(self, name, cat, args):
+        self._events.append(("i", name, cat, time.perf_counter_ns(), 0, self._thread(), args))
+        self._recorded += 1
+
+    def stop(self):
+        """Stop tracing and write the trace file; returns (path, events written, events dropped)."""
+        global _active
+        if _active is self:
+            _active = None
+        events = [*self._events]
+        pid = os.getpid()
+        trace = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self._threads.items()
+        ]
+        for ph, name, cat, start, duration, tid, args in events:
+            entry = {"name": name, "cat": cat, "ph": ph, "ts": (start - self._origin) / 1000,
+                     "pid": pid, "tid": tid, "args": args}
+            if ph == "X":
+                entry["dur"] = duration / 1000
+            else:
+                entry["s"] = "t"
+            trace.append(entry)
+        # Imported here: tracing is loaded on every start, the JSON libraries only when needed
+        from claude_cli.utils import fastjson
+        with open(self.path, "w") as f:
+            f.write(fastjson.dumps({"traceEvents": trace, "displayTimeUnit": "ms"}, default=str))
+        return self.path, len(events), self._recorded - len(events)
@@ -0,0 +1,494 @@
+"""
+HTTP transports used by EnhancedClient, including record/replay cassettes
+for deterministic offline runs
+"""
+import os
+import re
+import threading
+import time
+
+from claude_cli.utils import fastjson
+
+SCRUBBED = "<scrubbed>"
+_SECRET_HEADERS = ("cookie", "set-cookie", "authorization")
+# Seconds standing in for "no limit" where a library needs a number
+_NO_LIMIT = 7 * 24 * 3600
+
+_UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+class Transport:
+    """
+    Base class for the HTTP layer under EnhancedClient._make_request.
+
+    request() returns a response object exposing status_code, headers,
+    content, text, json(), iter_lines(), iter_content() and close(). files
+    takes requests-style multipart fields, and timeout is either a number or
+    a (connect, read) tuple, where None means no limit. Transports raise plain Exceptions with
+    user-facing messages for connection problems.
+
+    accept_encoding lists the content codings the transport decompresses
+    transparently (also while streaming), for the Accept-Encoding header.
+    """
+
+    name = None
+    accept_encoding = "gzip, deflate"
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class _PerThreadSessions:
+    """One HTTP session per thread, all closable from any thread."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sessions = []
+
+    def get(self):
+        """Return this thread's session, creating it on first use."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._factory()
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
+class RequestsTransport(Transport):
+    """Pure-Python transport built on the requests library."""
+
+    name = "requests"
+
+    def __init__(self, proxy=None):
+        import requests as req
+        from urllib3.util.request import ACCEPT_ENCODING
+        self._req = req
+        self.proxy = proxy
+        # urllib3 advertises brotli and zstd only when their decoders are installed
+        self.accept_encoding = ACCEPT_ENCODING.replace(",", ", ")
+        self._sessions = _PerThreadSessions(req.Session)
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        proxies = {}
+        if self.proxy:
+            proxies = {"http": self.proxy, "https": self.proxy}
+
+        try:
+            return self._sessions.get().request(method, url, headers=headers, data=data, files=files,
+                                                proxies=proxies, timeout=timeout, stream=stream)
+        except self._req.exceptions.ProxyError:
+            raise Exception(f"Proxy connection error. Please check your proxy configuration: {self.proxy}")
+        except self._req.exceptions.ConnectTimeout:
+            connect_timeout = timeout[0] if isinstance(timeout, tuple) else timeout
+            raise Exception(f"Connection timeout. The request took too long to complete (>{connect_timeout}s).")
+        except self._req.exceptions.ConnectionError:
+            raise Exception("Connection error. Please check your internet connection and proxy settings.")
+
+    def close(self):
+        self._sessions.close()
+
+
+class _HttpxResponse:
+    """Adapts an httpx response to the interface the client expects."""
+
+    def __init__(self, response, stream):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        if not stream:
+            response.read()
+
+    @property
+    def content(self):
+        return self._response.read()
+
+    @property
+    def text(self):
+        self._response.read()
+        return self._response.text
+
+    def json(self):
+        return fastjson.loads(self.content)
+
+    def iter_lines(self):
+        try:
+            for line in self._response.iter_lines():
+                yield line
+        finally:
+            self._response.close()
+
+    def iter_content(self, chunk_size=None):
+        try:
+            for chunk in self._response.iter_bytes(chunk_size):
+                yield chunk
+        finally:
+            self._response.close()
+
+    def close(self):
+        self._response.close()
+
+
+class HttpxTransport(Transport):
+    """
+    Pure-Python transport built on httpx, using HTTP/2 when the h2 package
+    is installed. One client (connection pool) is shared by all threads.
+    """
+
+    name = "httpx"
+
+    def __init__(self, proxy=None):
+        try:
+            import httpx
+        except ImportError:
+            raise Exception("The httpx transport needs httpx: pip install 'httpx[http2,socks]'")
+        self._httpx = httpx
+        self.proxy = proxy
+        self.accept_encoding = ", ".join(
+            ["gzip", "deflate"] + _optional_encodings({"br": ("brotli", "brotlicffi"), "zstd": ("zstandard",)}))
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        kwargs = {"http2": http2}
+        if proxy:
+            # httpx renamed "proxies" to "proxy" in 0.26
+            kwargs["proxy" if "proxy" in httpx.Client.__init__.__code__.co_varnames else "proxies"] = proxy
+        self._client = httpx.Client(**kwargs)
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        httpx = self._httpx
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        body = {"data": data} if files or isinstance(data, dict) else {"content": data}
+
+        try:
+            request = self._client.build_request(method, url, headers=headers, files=files,
+                                                 timeout=timeout, **body)
+            return _HttpxResponse(self._client.send(request, stream=True), stream)
+        except httpx.ProxyError:
+            raise Exception(f"Proxy connection error. Please check your proxy configuration: {self.proxy}")
+        except httpx.ConnectTimeout:
+            connect_timeout = timeout.connect if isinstance(timeout, httpx.Timeout) else timeout
+            raise Exception(f"Connection timeout. The request took too long to complete (>{connect_timeout}s).")
+        except httpx.TransportError:
+            raise Exception("Connection error. Please check your internet connection and proxy settings.")
+
+    def close(self):
+        self._client.close()
+
+
+class CurlTransport(Transport):
+    """
+    curl_cffi transport impersonating a browser, with one session per thread.
+    Multipart uploads go through requests, as curl_cffi doesn't handle
+    multipart form data well.
+    """
+
+    name = "curl"
+    # curl-impersonate is built with brotli support
+    accept_encoding = "gzip, deflate, br"
+
+    def __init__(self, proxy=None, impersonate="chrome110"):
+        from curl_cffi import requests
+        self._curl = requests
+        self.proxy = proxy
+        self.impersonate = impersonate
+        self._sessions = _PerThreadSessions(requests.Session)
+        self._multipart = None
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        if files:
+            if self._multipart is None:
+                self._multipart = RequestsTransport(self.proxy)
+            return self._multipart.request(method, url, headers=headers, data=data, files=files,
+                                           timeout=timeout, stream=stream)
+
+        proxy_dict = {}
+        if self.proxy:
+            proxy_dict = {"proxies": {"https": self.proxy, "http": self.proxy}}
+
+        if isinstance(timeout, tuple) and None in timeout:
+            # curl_cffi can't leave half of a timeout unlimited, so use one nothing will reach
+            timeout = tuple(_NO_LIMIT if limit is None else limit for limit in timeout)
+
+        requests = self._curl
+        try:
+            return self._sessions.get().request(method, url, headers=headers, data=data, impersonate=self.impersonate,
+                                                timeout=timeout, stream=stream, **proxy_dict)
+        except requests.exceptions.ProxyError:
+            raise Exception(f"Proxy connection error. Please check your proxy configuration: {self.proxy}")
+        except requests.exceptions.ConnectTimeout:
+            connect_timeout = timeout[0] if isinstance(timeout, tuple) else timeout
+            raise Exception(f"Connection timeout. The request took too long to complete (>{connect_timeout}s).")
+        except requests.exceptions.ConnectionError:
+            raise Exception("Connection error. Please check your internet connection and proxy settings.")
+
+    def close(self):
+        """Close the sessions of every thread that used this transport."""
+        self._sessions.close()
+        if self._multipart is not None:
+            self._multipart.close()
+
+
+def _optional_encodings(modules):
+    """The codings among {coding: (module, ...)} whose decoder module is installed."""
+    import importlib.util
+    return [coding for coding, names in modules.items()
+            if any(importlib.util.find_spec(name) is not None for name in names)]
+
+
+def _scrub_headers(headers):
+    return {k: (SCRUBBED if k.lower() in _SECRET_HEADERS else v) for k, v in (headers or {}).items()}
+
+
+class CassetteResponse:
+    """A response served from a cassette, optionally paced like the original."""
+
+    def __init__(self, status_code, headers, lines, speed=0, elapsed=0):
+        self.status_code = status_code
+        self.headers = headers
+        self._lines = lines
+        self._speed = speed
+        # Line offsets are measured from the request; the headers took this long
+        self._elapsed = elapsed
+        self._closed = False
+
+    @property
+    def content(self):
+        return "\n".join(text for _, text in self._lines).encode("utf-8")
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return fastjson.loads(self.content)
+
+    def iter_lines(self):
+        start = time.monotonic()
+        for offset, text in self._lines:
+            if self._closed:
+                return
+            if self._speed:
+                delay = (offset - self._elapsed) / self._speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            yield text.encode("utf-8")
+
+    def iter_content(self, chunk_size=None):
+        for line in self.iter_lines():
+            yield line + b"\n"
+
+    def close(self):
+        self._closed = True
+
+
+class _RecordingResponse:
+    """Wraps a live streamed response and writes it to the cassette once it has been read."""
+
+    def __init__(self, response, entry, recorder, started):
+        self._response = response
+        self._entry = entry
+        self._recorder = recorder
+        self._started = started
+        self._written = False
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def _finish(self):
+        if not self._written:
+            self._written = True
+            self._recorder.write(self._entry)
+
+    def iter_lines(self):
+        try:
+            for line in self._response.iter_lines():
+                text = line.decode("utf-8", errors="replace") if isinstance(line, bytes) else line
+                self._entry["lines"].append([round(time.monotonic() - self._started, 4), text])
+                yield line
+        finally:
+            self._finish()
+
+    def iter_content(self, chunk_size=None):
+        for line in self.iter_lines():
+            yield (line if isinstance(line, bytes) else line.encode("utf-8")) + b"\n"
+
+    def close(self):
+        self._finish()
+        self._response.close()
+
+
+class RecordingTransport(Transport):
+    """
+    Passes requests through to another transport and appends each
+    request/response pair, with timing, to a JSONL cassette file.
+    Cookies and authorization headers are scrubbed.
+    """
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self.accept_encoding = inner.accept_encoding
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        # Held while writing a line, so close() can't pull the fd out from under a write
+        self._write_lock = threading.Lock()
+
+    def write(self, entry):
+        """
+        Append entry as one line. A line normally goes out in a single
+        O_APPEND write, so other processes' lines don't interleave with it;
+        a short write is continued until the whole line is written. Entries
+        arriving after close() are dropped.
+        """
+        data = (fastjson.dumps(entry) + "\n").encode("utf-8")
+        with self._write_lock:
+            if self._fd is None:
+                return
+            while data:
+                data = data[os.write(self._fd, data):]
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        started = time.monotonic()
+        response = self.inner.request(method, url, headers=headers, data=data, files=files,
+                                      timeout=timeout, stream=stream)
+        entry = {
+            "method": method,
+            "url": url,
+            "request_headers": _scrub_headers(headers),
+            "request_body": data if isinstance(data, str) else None,
+            "status": response.status_code,
+            "headers": _scrub_headers(dict(response.headers)),
+            "elapsed": round(time.monotonic() - started, 4),
+            "lines": []
+        }
+        if stream:
+            return _RecordingResponse(response, entry, self, started)
+
+        text = response.content.decode("utf-8", errors="replace")
+        entry["lines"] = [[entry["elapsed"], line] for line in text.split("\n")]
+        self.write(entry)
+        return response
+
+    def close(self):
+        self.inner.close()
+        with self._write_lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class ReplayTransport(Transport):
+    """
+    Serves responses from a cassette instead of the network.
+
+    Requests are matched by method and URL, in recorded order; if there is no
+    exact match, UUIDs in the URL are treated as wildcards. The last matching
+    entry is reused once its recordings run out. speed=0 replays instantly,
+    1 at the recorded pace and 2 twice as fast.
+    """
+
+    def __init__(self, path, speed=0):
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._fuzzy = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = fastjson.loads(line)
+                    self._entries.setdefault((entry["method"], entry["url"]), []).append(entry)
+                    self._fuzzy.setdefault((entry["method"], _UUID_RE.sub("*", entry["url"])), []).append(entry)
+        self._used = {}
+
+    def _next(self, key, table):
+        entries = table.get(key)
+        if not entries:
+            return None
+        index = self._used.get(key, 0)
+        self._used[key] = index + 1
+        return entries[min(index, len(entries) - 1)]
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        with self._lock:
+            entry = (self._next((method, url), self._entries)
+                     or self._next((method, _UUID_RE.sub("*", url)), self._fuzzy))
+        if entry is None:
+            raise Exception(f"Connection error. No recorded response for {method} {url} in the cassette.")
+
+        if self.speed and entry.get("elapsed"):
+            time.sleep(entry["elapsed"] / self.speed)
+        return CassetteResponse(entry["status"], entry["headers"], entry["lines"], self.speed,
+                                entry.get("elapsed", 0))
+
+
+class RebaseTransport(Transport):
+    """Sends requests meant for https://claude.ai to another base URL, such as a local stub."""
+
+    ORIGIN = "https://claude.ai"
+
+    def __init__(self, inner, base_url):
+        self.inner = inner
+        self.accept_encoding = inner.accept_encoding
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, url, headers=None, data=None, files=None, timeout=30, stream=False):
+        if url.startswith(self.ORIGIN):
+            url = self.base_url + url[len(self.ORIGIN):]
+        return self.inner.request(method, url, headers=headers, data=data, files=files,
+                                  timeout=timeout, stream=stream)
+
+    def close(self):
+        self.inner.close()
+
+
+BACKENDS = {
+    "curl": CurlTransport,
+    "httpx": HttpxTransport,
+    "requests": RequestsTransport
+}
+
+
+def build_transport(proxy=None, backend=None, record=True):
+    """
+    Create the transport for a client: the named backend (curl by default,
+    or $CLAUDE_TRANSPORT), wrapped by the record/replay environment settings.
+    With record=False the caller wraps it with recorded() itself, as a
+    hedged client does outside the hedge.
+    """
+    replay = os.environ.get("CLAUDE_REPLAY")
+    if replay:
+        return ReplayTransport(replay, speed=float(os.environ.get("CLAUDE_REPLAY_SPEED") or 0))
+
+    backend = backend or os.environ.get("CLAUDE_TRANSPORT") or "curl"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown transport backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+    transport = BACKENDS[backend](proxy=proxy)
+    return recorded(transport) if record else transport
+
+
+def recorded(transport):
+    """Wrap transport in a RecordingTransport when $CLAUDE_RECORD names a cassette."""
+    record = os.environ.get("CLAUDE_RECORD")
+    if record:
+        return RecordingTransport(transport, record)
+    return transport
@@ -40,6 +40,10 @@ setup(
         'rich>=12.0.0',
         'pyyaml>=6.0',
     ],
+    extras_require={
+        'images': ['Pillow>=9.0'],
+        'json': ['msgspec>=0.18'],
+    },
     python_requires=">=3.7",
     entry_points={
         'console_scripts': [